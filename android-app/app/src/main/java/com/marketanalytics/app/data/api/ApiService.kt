@@ -29,14 +29,17 @@ interface ApiService {
     suspend fun deleteProduct(@Path("id") id: Int): Response<Map<String, String>>
     
     @POST("api/products/{id}/parse")
-    suspend fun parseProduct(@Path("id") id: Int): Response<ParseResult>
+    suspend fun parseProduct(@Path("id") id: Int): Response<ParseJobStarted>
+    
+    @GET("api/products/{id}/status")
+    suspend fun getParsingStatus(@Path("id") id: Int): Response<ParsingStatus>
     
     @GET("api/products/{id}/reviews")
     suspend fun getReviews(
         @Path("id") productId: Int,
         @Query("limit") limit: Int? = null,
-        @Query("offset") offset: Int? = null
-    ): Response<List<Review>>
+        @Query("cursor") cursor: String? = null
+    ): Response<ReviewPage>
     
     // ==================== ANALYTICS ====================
     
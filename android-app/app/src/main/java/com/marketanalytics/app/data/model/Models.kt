@@ -71,12 +71,51 @@ data class Review(
     val summary: String?
 )
 
-data class ParseResult(
-    val message: String,
-    @SerializedName("parsed_count")
-    val parsedCount: Int,
+data class ReviewPage(
+    val items: List<Review>,
+    @SerializedName("next_cursor")
+    val nextCursor: String?,
+    @SerializedName("has_more")
+    val hasMore: Boolean
+)
+
+// POST /parse answers 202 right away; progress and result come from /status
+data class ParseJob(
+    @SerializedName("job_id")
+    val jobId: Int,
+    val status: String,
+    val mode: String?,
+    val strategy: String?,
+    @SerializedName("pages_fetched")
+    val pagesFetched: Int,
+    @SerializedName("reviews_found")
+    val reviewsFound: Int,
     @SerializedName("new_reviews")
-    val newReviews: Int
+    val newReviews: Int,
+    @SerializedName("duplicates_skipped")
+    val duplicatesSkipped: Int,
+    val error: String?
+) {
+    val isFinished: Boolean
+        get() = status == "completed" || status == "error"
+}
+
+data class ParseJobStarted(
+    val message: String,
+    @SerializedName("job_id")
+    val jobId: Int,
+    val status: String
+)
+
+data class ParsingStatus(
+    @SerializedName("product_id")
+    val productId: Int,
+    val status: String,
+    @SerializedName("last_parsed_at")
+    val lastParsedAt: String?,
+    @SerializedName("reviews_count")
+    val reviewsCount: Int,
+    val job: ParseJob?
 )
 
 // ==================== ANALYTICS ====================
@@ -84,7 +84,7 @@ class ProductRepository {
         }
     }
     
-    suspend fun parseProduct(id: Int): ApiResult<ParseResult> {
+    suspend fun parseProduct(id: Int): ApiResult<ParseJobStarted> {
         return try {
             val response = RetrofitClient.getApiService().parseProduct(id)
             handleResponse(response)
@@ -93,9 +93,18 @@ class ProductRepository {
         }
     }
     
-    suspend fun getReviews(productId: Int, limit: Int? = null, offset: Int? = null): ApiResult<List<Review>> {
+    suspend fun getParsingStatus(id: Int): ApiResult<ParsingStatus> {
         return try {
-            val response = RetrofitClient.getApiService().getReviews(productId, limit, offset)
+            val response = RetrofitClient.getApiService().getParsingStatus(id)
+            handleResponse(response)
+        } catch (e: Exception) {
+            ApiResult.Error(e.message ?: "Network error")
+        }
+    }
+    
+    suspend fun getReviews(productId: Int, limit: Int? = null, cursor: String? = null): ApiResult<ReviewPage> {
+        return try {
+            val response = RetrofitClient.getApiService().getReviews(productId, limit, cursor)
             handleResponse(response)
         } catch (e: Exception) {
             ApiResult.Error(e.message ?: "Network error")
@@ -35,6 +35,8 @@ fun AppNavigation(viewModel: MainViewModel) {
     val createProductState by viewModel.createProductState.collectAsState()
     val parsingState by viewModel.parsingState.collectAsState()
     val reviews by viewModel.reviews.collectAsState()
+    val hasMoreReviews by viewModel.hasMoreReviews.collectAsState()
+    val loadingMoreReviews by viewModel.loadingMoreReviews.collectAsState()
     val analytics by viewModel.analytics.collectAsState()
     val summary by viewModel.summary.collectAsState()
     val analyzeState by viewModel.analyzeState.collectAsState()
@@ -111,9 +113,12 @@ fun AppNavigation(viewModel: MainViewModel) {
                 productId = productId,
                 product = selectedProduct,
                 reviews = reviews,
+                hasMoreReviews = hasMoreReviews,
+                loadingMoreReviews = loadingMoreReviews,
                 parsingState = parsingState,
                 onLoadProduct = { viewModel.loadProduct(productId) },
                 onLoadReviews = { viewModel.loadReviews(productId) },
+                onLoadMoreReviews = { viewModel.loadMoreReviews(productId) },
                 onParse = { viewModel.parseProduct(productId) },
                 onNavigateToAnalytics = {
                     val productName = (selectedProduct as? com.marketanalytics.app.data.model.ApiResult.Success)
@@ -31,9 +31,12 @@ fun ProductDetailScreen(
     productId: Int,
     product: ApiResult<Product>?,
     reviews: ApiResult<List<Review>>?,
-    parsingState: ApiResult<ParseResult>?,
+    hasMoreReviews: Boolean,
+    loadingMoreReviews: Boolean,
+    parsingState: ApiResult<ParseJob>?,
     onLoadProduct: () -> Unit,
     onLoadReviews: () -> Unit,
+    onLoadMoreReviews: () -> Unit,
     onParse: () -> Unit,
     onNavigateToAnalytics: () -> Unit,
     onDelete: () -> Unit,
@@ -183,8 +186,11 @@ fun ProductDetailScreen(
                 ProductDetailContent(
                     product = product.data,
                     reviews = reviews,
+                    hasMoreReviews = hasMoreReviews,
+                    loadingMoreReviews = loadingMoreReviews,
                     parsingState = parsingState,
                     onParse = onParse,
+                    onLoadMoreReviews = onLoadMoreReviews,
                     onNavigateToAnalytics = onNavigateToAnalytics,
                     modifier = Modifier.padding(padding)
                 )
@@ -207,11 +213,17 @@ fun ProductDetailScreen(
 private fun ProductDetailContent(
     product: Product,
     reviews: ApiResult<List<Review>>?,
-    parsingState: ApiResult<ParseResult>?,
+    hasMoreReviews: Boolean,
+    loadingMoreReviews: Boolean,
+    parsingState: ApiResult<ParseJob>?,
     onParse: () -> Unit,
+    onLoadMoreReviews: () -> Unit,
     onNavigateToAnalytics: () -> Unit,
     modifier: Modifier = Modifier
 ) {
+    val parsingInProgress = parsingState is ApiResult.Loading ||
+        (parsingState is ApiResult.Success && !parsingState.data.isFinished)
+    
     LazyColumn(
         modifier = modifier.fillMaxSize(),
         contentPadding = PaddingValues(16.dp),
@@ -227,14 +239,14 @@ private fun ProductDetailContent(
                 Button(
                     onClick = onParse,
                     modifier = Modifier.weight(1f),
-                    enabled = product.parsingStatus != "parsing" && parsingState !is ApiResult.Loading,
+                    enabled = product.parsingStatus != "parsing" && !parsingInProgress,
                     colors = ButtonDefaults.buttonColors(
                         containerColor = ElectricCyan,
                         disabledContainerColor = ElectricCyan.copy(alpha = 0.3f)
                     ),
                     shape = RoundedCornerShape(12.dp)
                 ) {
-                    if (parsingState is ApiResult.Loading || product.parsingStatus == "parsing") {
+                    if (parsingInProgress || product.parsingStatus == "parsing") {
                         CircularProgressIndicator(
                             modifier = Modifier.size(20.dp),
                             color = DeepNavy,
@@ -275,37 +287,18 @@ private fun ProductDetailContent(
             }
         }
         
-        // Parsing result
+        // Parsing progress and result
         when (val parsing = parsingState) {
             is ApiResult.Loading -> {
+                item { ParsingProgressCard("Парсинг отзывов...") }
+            }
+            is ApiResult.Success -> if (!parsing.data.isFinished) {
                 item {
-                    Card(
-                        modifier = Modifier.fillMaxWidth(),
-                        shape = RoundedCornerShape(16.dp),
-                        colors = CardDefaults.cardColors(containerColor = SurfaceCard)
-                    ) {
-                        Row(
-                            modifier = Modifier
-                                .fillMaxWidth()
-                                .padding(20.dp),
-                            horizontalArrangement = Arrangement.Center,
-                            verticalAlignment = Alignment.CenterVertically
-                        ) {
-                            CircularProgressIndicator(
-                                color = ElectricCyan,
-                                modifier = Modifier.size(24.dp),
-                                strokeWidth = 2.dp
-                            )
-                            Spacer(modifier = Modifier.width(12.dp))
-                            Text(
-                                text = "Парсинг отзывов...",
-                                color = IceWhite
-                            )
-                        }
-                    }
+                    ParsingProgressCard(
+                        "Парсинг отзывов... Страниц: ${parsing.data.pagesFetched} | Найдено: ${parsing.data.reviewsFound}"
+                    )
                 }
-            }
-            is ApiResult.Success -> {
+            } else {
                 item {
                     Card(
                         modifier = Modifier.fillMaxWidth(),
@@ -328,13 +321,13 @@ private fun ProductDetailContent(
                             )
                             Column {
                                 Text(
-                                    text = parsing.data.message,
+                                    text = "Парсинг завершен",
                                     style = MaterialTheme.typography.bodyMedium,
                                     fontWeight = FontWeight.Medium,
                                     color = MintGreen
                                 )
                                 Text(
-                                    text = "Новых: ${parsing.data.newReviews} | Всего: ${parsing.data.parsedCount}",
+                                    text = "Новых: ${parsing.data.newReviews} | Найдено: ${parsing.data.reviewsFound}",
                                     style = MaterialTheme.typography.bodySmall,
                                     color = MintGreen.copy(alpha = 0.8f)
                                 )
@@ -467,6 +460,22 @@ private fun ProductDetailContent(
                     items(reviews.data) { review ->
                         ReviewCard(review = review)
                     }
+                    if (hasMoreReviews) {
+                        item {
+                            Box(
+                                modifier = Modifier.fillMaxWidth(),
+                                contentAlignment = Alignment.Center
+                            ) {
+                                if (loadingMoreReviews) {
+                                    CircularProgressIndicator(color = ElectricCyan)
+                                } else {
+                                    TextButton(onClick = onLoadMoreReviews) {
+                                        Text("Показать еще", color = ElectricCyan)
+                                    }
+                                }
+                            }
+                        }
+                    }
                 }
             }
             null -> {
@@ -490,6 +499,34 @@ private fun ProductDetailContent(
     }
 }
 
+@Composable
+private fun ParsingProgressCard(text: String) {
+    Card(
+        modifier = Modifier.fillMaxWidth(),
+        shape = RoundedCornerShape(16.dp),
+        colors = CardDefaults.cardColors(containerColor = SurfaceCard)
+    ) {
+        Row(
+            modifier = Modifier
+                .fillMaxWidth()
+                .padding(20.dp),
+            horizontalArrangement = Arrangement.Center,
+            verticalAlignment = Alignment.CenterVertically
+        ) {
+            CircularProgressIndicator(
+                color = ElectricCyan,
+                modifier = Modifier.size(24.dp),
+                strokeWidth = 2.dp
+            )
+            Spacer(modifier = Modifier.width(12.dp))
+            Text(
+                text = text,
+                color = IceWhite
+            )
+        }
+    }
+}
+
 @Composable
 private fun ReviewCard(review: Review) {
     Card(
@@ -7,6 +7,8 @@ import com.marketanalytics.app.data.api.RetrofitClient
 import com.marketanalytics.app.data.model.*
 import com.marketanalytics.app.data.repository.ProductRepository
 import com.marketanalytics.app.data.repository.SettingsRepository
+import kotlinx.coroutines.Job
+import kotlinx.coroutines.delay
 import kotlinx.coroutines.flow.*
 import kotlinx.coroutines.launch
 
@@ -35,12 +37,22 @@ class MainViewModel(application: Application) : AndroidViewModel(application) {
     private val _createProductState = MutableStateFlow<ApiResult<Product>?>(null)
     val createProductState: StateFlow<ApiResult<Product>?> = _createProductState.asStateFlow()
     
-    private val _parsingState = MutableStateFlow<ApiResult<ParseResult>?>(null)
-    val parsingState: StateFlow<ApiResult<ParseResult>?> = _parsingState.asStateFlow()
+    // Parse job: Success with an unfinished job while it runs, finished job or Error at the end
+    private val _parsingState = MutableStateFlow<ApiResult<ParseJob>?>(null)
+    val parsingState: StateFlow<ApiResult<ParseJob>?> = _parsingState.asStateFlow()
+    private var parsingPoll: Job? = null
     
     private val _reviews = MutableStateFlow<ApiResult<List<Review>>?>(null)
     val reviews: StateFlow<ApiResult<List<Review>>?> = _reviews.asStateFlow()
     
+    // Cursor of the next reviews page (null - all pages loaded)
+    private val _reviewsCursor = MutableStateFlow<String?>(null)
+    val hasMoreReviews: StateFlow<Boolean> = _reviewsCursor.map { it != null }
+        .stateIn(viewModelScope, SharingStarted.Eagerly, false)
+    
+    private val _loadingMoreReviews = MutableStateFlow(false)
+    val loadingMoreReviews: StateFlow<Boolean> = _loadingMoreReviews.asStateFlow()
+    
     // Analytics State
     private val _analytics = MutableStateFlow<ApiResult<AnalyticsResponse>?>(null)
     val analytics: StateFlow<ApiResult<AnalyticsResponse>?> = _analytics.asStateFlow()
@@ -173,26 +185,75 @@ class MainViewModel(application: Application) : AndroidViewModel(application) {
     }
     
     fun parseProduct(id: Int) {
-        viewModelScope.launch {
+        parsingPoll?.cancel()
+        parsingPoll = viewModelScope.launch {
             _parsingState.value = ApiResult.Loading
-            _parsingState.value = repository.parseProduct(id)
+            val started = repository.parseProduct(id)
+            if (started is ApiResult.Error) {
+                _parsingState.value = started
+                return@launch
+            }
+            val jobId = (started as ApiResult.Success).data.jobId
             
-            // Reload product and reviews after parsing
-            if (_parsingState.value is ApiResult.Success) {
+            // The job runs in the background: poll /status until it finishes
+            while (true) {
+                delay(PARSE_POLL_INTERVAL_MS)
+                val status = repository.getParsingStatus(id)
+                if (status is ApiResult.Error) {
+                    _parsingState.value = status
+                    return@launch
+                }
+                val job = (status as ApiResult.Success).data.job?.takeIf { it.jobId == jobId } ?: continue
+                if (!job.isFinished) {
+                    _parsingState.value = ApiResult.Success(job)
+                    continue
+                }
+                _parsingState.value = if (job.status == "error") {
+                    ApiResult.Error(job.error ?: "Ошибка парсинга")
+                } else {
+                    ApiResult.Success(job)
+                }
+                // Reload product and reviews after parsing
                 loadProduct(id)
                 loadReviews(id)
+                return@launch
             }
         }
     }
     
     fun clearParsingState() {
+        parsingPoll?.cancel()
+        parsingPoll = null
         _parsingState.value = null
     }
     
-    fun loadReviews(productId: Int, limit: Int? = null, offset: Int? = null) {
+    fun loadReviews(productId: Int, limit: Int = REVIEWS_PAGE_SIZE) {
         viewModelScope.launch {
             _reviews.value = ApiResult.Loading
-            _reviews.value = repository.getReviews(productId, limit, offset)
+            _reviewsCursor.value = null
+            _reviews.value = when (val page = repository.getReviews(productId, limit)) {
+                is ApiResult.Success -> {
+                    _reviewsCursor.value = page.data.nextCursor
+                    ApiResult.Success(page.data.items)
+                }
+                is ApiResult.Error -> page
+                is ApiResult.Loading -> page
+            }
+        }
+    }
+    
+    fun loadMoreReviews(productId: Int, limit: Int = REVIEWS_PAGE_SIZE) {
+        val cursor = _reviewsCursor.value ?: return
+        val loaded = (_reviews.value as? ApiResult.Success)?.data ?: return
+        if (_loadingMoreReviews.value) return
+        viewModelScope.launch {
+            _loadingMoreReviews.value = true
+            val page = repository.getReviews(productId, limit, cursor)
+            if (page is ApiResult.Success) {
+                _reviewsCursor.value = page.data.nextCursor
+                _reviews.value = ApiResult.Success(loaded + page.data.items)
+            }
+            _loadingMoreReviews.value = false
         }
     }
     
@@ -253,9 +314,17 @@ class MainViewModel(application: Application) : AndroidViewModel(application) {
     fun clearProductStates() {
         _selectedProduct.value = null
         _reviews.value = null
+        _reviewsCursor.value = null
+        parsingPoll?.cancel()
+        parsingPoll = null
         _parsingState.value = null
         _analytics.value = null
         _summary.value = null
         _analyzeState.value = null
     }
+    
+    companion object {
+        const val REVIEWS_PAGE_SIZE = 50
+        const val PARSE_POLL_INTERVAL_MS = 2000L
+    }
 }
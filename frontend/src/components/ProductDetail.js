@@ -15,6 +15,7 @@ import { useAuth } from '../context/AuthContext';
 import './ProductDetail.css';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+const REVIEWS_PAGE_SIZE = 50;
 
 const ProductDetail = () => {
   const { productId } = useParams();
@@ -23,6 +24,8 @@ const ProductDetail = () => {
   const [analytics, setAnalytics] = useState(null);
   const [summary, setSummary] = useState(null);
   const [reviews, setReviews] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [loadingSummary, setLoadingSummary] = useState(false);
   const [loadingReviews, setLoadingReviews] = useState(false);
@@ -68,13 +71,18 @@ const ProductDetail = () => {
     }
   };
 
+  // Отзывы загружаются постранично: первая страница, дальше - по курсору
+  const fetchReviewsPage = (cursor) =>
+    axios.get(`${API_URL}/api/products/${productId}/reviews`, {
+      params: { limit: REVIEWS_PAGE_SIZE, ...(cursor ? { cursor } : {}) },
+    });
+
   const fetchReviews = async () => {
     setLoadingReviews(true);
     try {
-      const response = await axios.get(
-        `${API_URL}/api/products/${productId}/reviews`
-      );
-      setReviews(response.data);
+      const response = await fetchReviewsPage(null);
+      setReviews(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Ошибка загрузки отзывов:', error);
     } finally {
@@ -82,6 +90,20 @@ const ProductDetail = () => {
     }
   };
 
+  const fetchMoreReviews = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await fetchReviewsPage(nextCursor);
+      setReviews((loaded) => [...loaded, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Ошибка загрузки отзывов:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleParse = async () => {
     try {
       await axios.post(`${API_URL}/api/products/${productId}/parse`);
@@ -246,7 +268,7 @@ const ProductDetail = () => {
 
         <div className="card">
           <div className="reviews-header">
-            <h2>Отзывы ({reviews.length})</h2>
+            <h2>Отзывы ({reviews.length}{nextCursor ? '+' : ''})</h2>
             <button onClick={fetchReviews} className="btn btn-secondary" disabled={loadingReviews}>
               {loadingReviews ? 'Загрузка...' : 'Обновить'}
             </button>
@@ -294,6 +316,15 @@ const ProductDetail = () => {
                   )}
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  onClick={fetchMoreReviews}
+                  className="btn btn-secondary load-more"
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Загрузка...' : 'Показать еще'}
+                </button>
+              )}
             </div>
           )}
         </div>
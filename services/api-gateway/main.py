@@ -1,6 +1,6 @@
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import httpx
 import os
 from typing import Optional
@@ -166,6 +166,96 @@ async def products_proxy_root(request: Request, user: dict = Depends(verify_toke
             )
 
 
+@app.post("/api/products/import")
+async def products_import_proxy(request: Request, user: dict = Depends(verify_token)):
+    """Импорт товаров из CSV/NDJSON: тело передается сервису парсера потоком, без разбора JSON"""
+    url = f"{PARSER_SERVICE_URL}/products/import"
+    query = str(request.url.query)
+    if query:
+        url += f"?{query}"
+    
+    headers = {"X-User-Id": str(user.get("user_id"))}
+    if request.headers.get("content-type"):
+        headers["Content-Type"] = request.headers["content-type"]
+    
+    async with httpx.AsyncClient() as client:
+        try:
+            response = await client.post(
+                url,
+                content=request.stream(),
+                headers=headers,
+                timeout=300.0
+            )
+            try:
+                content = response.json()
+            except:
+                content = {"detail": response.text or "Ошибка сервера"}
+            
+            return JSONResponse(
+                status_code=response.status_code,
+                content=content
+            )
+        except httpx.RequestError as e:
+            return JSONResponse(
+                status_code=503,
+                content={"detail": f"Сервис парсера недоступен: {str(e)}"}
+            )
+
+
+@app.get("/api/products/{product_id}/export")
+async def products_export_proxy(request: Request, product_id: int, user: dict = Depends(verify_token)):
+    """Выгрузка отзывов NDJSON/CSV: ответ сервиса парсера передается клиенту потоком, без буферизации"""
+    url = f"{PARSER_SERVICE_URL}/products/{product_id}/export"
+    query = str(request.url.query)
+    if query:
+        url += f"?{query}"
+    
+    # Клиент живет, пока идет передача тела; закрывается по окончании потока
+    client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+    try:
+        response = await client.send(
+            client.build_request("GET", url, headers={"X-User-Id": str(user.get("user_id"))}),
+            stream=True
+        )
+    except httpx.RequestError as e:
+        await client.aclose()
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Сервис парсера недоступен: {str(e)}"}
+        )
+    
+    if response.status_code != 200:
+        # Ошибки (404, 400) - короткий JSON, его можно прочитать целиком
+        await response.aread()
+        await response.aclose()
+        await client.aclose()
+        try:
+            content = response.json()
+        except:
+            content = {"detail": response.text or "Ошибка сервера"}
+        return JSONResponse(status_code=response.status_code, content=content)
+    
+    async def body():
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+            await client.aclose()
+    
+    headers = {
+        name: response.headers[name]
+        for name in ("content-disposition", "content-encoding")
+        if name in response.headers
+    }
+    return StreamingResponse(
+        body(),
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type"),
+        headers=headers
+    )
+
+
 @app.api_route("/api/products/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def products_proxy(request: Request, path: str, user: dict = Depends(verify_token)):
     """Проксирование запросов к сервису парсера"""
@@ -0,0 +1,144 @@
+"""
+Автоматическое обновление отзывов
+Фоновый поток периодически находит товары, у которых last_parsed_at старше их интервала
+обновления, и ставит их парсинг в планировщик с фоновым приоритетом.
+
+Интервал зависит от скорости появления отзывов: товар обновляется, когда на нем ожидается
+около AUTO_REFRESH_TARGET_NEW_REVIEWS новых отзывов, но не чаще AUTO_REFRESH_MIN_HOURS и
+не реже AUTO_REFRESH_MAX_HOURS. Детерминированный джиттер по id товара разносит товары,
+добавленные одновременно, по времени. Товары, которые еще ни разу не парсились, не трогаются -
+первый парсинг запускает пользователь.
+"""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
+import logging
+import os
+import threading
+from sqlalchemy import func, or_
+
+from database import SessionLocal, Product, Review
+from jobs import create_job, active_job
+from crawl_scheduler import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+AUTO_REFRESH_ENABLED = os.getenv("AUTO_REFRESH_ENABLED", "true").lower() == "true"
+# Как часто искать товары, которые пора обновить (секунды)
+AUTO_REFRESH_CHECK_SECONDS = int(os.getenv("AUTO_REFRESH_CHECK_SECONDS", "300"))
+AUTO_REFRESH_MIN_HOURS = float(os.getenv("AUTO_REFRESH_MIN_HOURS", "1"))
+AUTO_REFRESH_MAX_HOURS = float(os.getenv("AUTO_REFRESH_MAX_HOURS", "168"))
+# Сколько новых отзывов должно накопиться к следующему обновлению
+AUTO_REFRESH_TARGET_NEW_REVIEWS = float(os.getenv("AUTO_REFRESH_TARGET_NEW_REVIEWS", "5"))
+# Окно, по которому считается скорость появления отзывов (дни)
+AUTO_REFRESH_VELOCITY_DAYS = int(os.getenv("AUTO_REFRESH_VELOCITY_DAYS", "30"))
+# Разброс интервала: +-10% по умолчанию
+AUTO_REFRESH_JITTER = float(os.getenv("AUTO_REFRESH_JITTER", "0.1"))
+# Сколько товаров ставить в очередь за одну проверку
+AUTO_REFRESH_BATCH = int(os.getenv("AUTO_REFRESH_BATCH", "50"))
+
+
+def review_velocity(db, product_ids: List[int], days: int = AUTO_REFRESH_VELOCITY_DAYS) -> Dict[int, float]:
+    """Отзывов в сутки за последние days дней по каждому товару (одним запросом)"""
+    if not product_ids:
+        return {}
+    window_start = datetime.utcnow() - timedelta(days=days)
+    rows = db.query(Review.product_id, func.count(Review.id)).filter(
+        Review.product_id.in_(product_ids),
+        Review.date >= window_start
+    ).group_by(Review.product_id).all()
+    return {product_id: count / days for product_id, count in rows}
+
+
+def _jitter_factor(product_id: int) -> float:
+    """Множитель интервала в [1 - JITTER, 1 + JITTER], постоянный для товара"""
+    digest = hashlib.sha1(str(product_id).encode()).digest()
+    fraction = int.from_bytes(digest[:4], "big") / 0xFFFFFFFF
+    return 1 + AUTO_REFRESH_JITTER * (2 * fraction - 1)
+
+
+def refresh_interval(product_id: int, reviews_per_day: float) -> timedelta:
+    """Интервал обновления товара по скорости появления отзывов, с джиттером"""
+    if reviews_per_day > 0:
+        hours = AUTO_REFRESH_TARGET_NEW_REVIEWS / reviews_per_day * 24
+    else:
+        hours = AUTO_REFRESH_MAX_HOURS
+    hours = min(max(hours, AUTO_REFRESH_MIN_HOURS), AUTO_REFRESH_MAX_HOURS)
+    return timedelta(hours=hours * _jitter_factor(product_id))
+
+
+def due_products(db, now: Optional[datetime] = None) -> List[Tuple[Product, float]]:
+    """
+    Товары, которые пора обновить, от самых просроченных
+
+    Returns:
+        [(товар, во сколько раз превышен интервал), ...]
+    """
+    now = now or datetime.utcnow()
+    products = db.query(Product).filter(
+        or_(Product.parsing_status != "parsing", Product.parsing_status.is_(None)),
+        Product.last_parsed_at.isnot(None)
+    ).all()
+    velocity = review_velocity(db, [p.id for p in products])
+
+    due = []
+    for product in products:
+        interval = refresh_interval(product.id, velocity.get(product.id, 0.0))
+        overdue = (now - product.last_parsed_at) / interval
+        if overdue >= 1:
+            due.append((product, overdue))
+    due.sort(key=lambda item: item[1], reverse=True)
+    return due
+
+
+class AutoRefresher:
+    """Фоновый поток автообновления"""
+
+    def __init__(self, scheduler, check_seconds: int = AUTO_REFRESH_CHECK_SECONDS):
+        self.scheduler = scheduler
+        self.check_seconds = check_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="auto-refresh", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"⏰ Автообновление включено: проверка раз в {self.check_seconds} с, "
+            f"интервал {AUTO_REFRESH_MIN_HOURS}-{AUTO_REFRESH_MAX_HOURS} ч"
+        )
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.check_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка автообновления: {e}")
+
+    def run_once(self) -> int:
+        """Поставить в очередь товары, которые пора обновить; возвращает их количество"""
+        db = SessionLocal()
+        try:
+            queued = []
+            for product, _ in due_products(db)[:AUTO_REFRESH_BATCH]:
+                if active_job(db, product.id):
+                    continue
+                queued.append((product, create_job(db, product)))
+            db.commit()
+
+            for rank, (product, job) in enumerate(queued):
+                self.scheduler.enqueue(job.id, product.marketplace, priority=PRIORITY_BACKGROUND + rank)
+            if queued:
+                logger.info(f"⏰ Автообновление: в очереди {len(queued)} товаров")
+            return len(queued)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
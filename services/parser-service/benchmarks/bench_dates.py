@@ -0,0 +1,107 @@
+"""
+Бенчмарк разбора дат отзывов: исходный _parse_date парсеров (словарь месяцев и
+re.search по нескомпилированным шаблонам на каждый вызов) против parsers.dates
+с предкомпилированными шаблонами и LRU-кешем
+
+Запуск:
+    python benchmarks/bench_dates.py --calls 200000 --unique 400
+
+Строки дат на странице отзывов сильно повторяются, поэтому --unique задает, сколько
+различных строк встречается среди --calls вызовов
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Добавляем путь к модулям сервиса
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.dates import MONTHS, parse_review_date, cache_info, _parse_spec
+
+
+def legacy_parse_date(date_text: str) -> datetime:
+    """Исходная реализация из wildberries_parser.py"""
+    try:
+        patterns = [
+            r'(\d{1,2})\.(\d{1,2})\.(\d{4})',
+            r'(\d{4})-(\d{2})-(\d{2})',
+            r'(\d{1,2})\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\s+(\d{4})',
+        ]
+        months = {
+            'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
+            'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
+            'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
+        }
+        for pattern in patterns:
+            match = re.search(pattern, date_text.lower())
+            if match:
+                if len(match.groups()) == 3:
+                    if match.group(2) in months:
+                        day, month_name, year = match.groups()
+                        return datetime(int(year), months[month_name], int(day))
+                    parts = list(match.groups())
+                    if len(parts[0]) == 4:
+                        return datetime(int(parts[0]), int(parts[1]), int(parts[2]))
+                    return datetime(int(parts[2]), int(parts[1]), int(parts[0]))
+    except:
+        pass
+    return datetime.now()
+
+
+def sample_dates(unique: int, seed: int = 42):
+    """Строки дат в форматах, которые встречаются на страницах маркетплейсов"""
+    rng = random.Random(seed)
+    month_names = list(MONTHS)
+    base = datetime(2024, 1, 1)
+    formats = [
+        lambda d: f"{d.day} {month_names[d.month - 1]} {d.year}",
+        lambda d: f"{d.day} {month_names[d.month - 1]}",
+        lambda d: d.strftime("%d.%m.%Y"),
+        lambda d: d.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        lambda d: f"{rng.randint(2, 20)} дней назад",
+        lambda d: "вчера",
+    ]
+    return [rng.choice(formats)(base + timedelta(days=rng.randint(0, 700))) for _ in range(unique)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--calls", type=int, default=200000, help="количество вызовов")
+    arg_parser.add_argument("--unique", type=int, default=400, help="различных строк дат")
+    args = arg_parser.parse_args()
+
+    rng = random.Random(7)
+    pool = sample_dates(args.unique)
+    texts = [rng.choice(pool) for _ in range(args.calls)]
+    print(f"📊 {args.calls} вызовов, {len(set(texts))} различных строк")
+
+    methods = {
+        "legacy": legacy_parse_date,
+        "dates": parse_review_date,
+    }
+    for name, parse in methods.items():
+        started = time.perf_counter()
+        parsed = sum(1 for text in texts if parse(text) is not None)
+        elapsed = time.perf_counter() - started
+        print(f"{name:>7}: {elapsed:7.3f} с ({args.calls / elapsed:10.0f} вызовов/с), дат {parsed}")
+
+    # Цена разбора при промахе кеша - та же функция без lru_cache
+    cold = [text.lower() for text in sample_dates(20000, seed=1)]
+    started = time.perf_counter()
+    for text in cold:
+        legacy_parse_date(text)
+    legacy_cold = time.perf_counter() - started
+    started = time.perf_counter()
+    for text in cold:
+        _parse_spec.__wrapped__(text)
+    dates_cold = time.perf_counter() - started
+    print(f"без повторов: legacy {len(cold) / legacy_cold:9.0f} вызовов/с, dates {len(cold) / dates_cold:9.0f} вызовов/с")
+    print(f"кеш: {cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Бенчмарк разбора HTML страницы с отзывами: исходный путь (html.parser и soup.select
+на каждый селектор), BeautifulSoup с объединенным селектором и lxml с одним
+скомпилированным XPath-выражением на все селекторы
+
+Запуск:
+    python benchmarks/bench_html.py --reviews 2000
+    python benchmarks/bench_html.py --pages /tmp/saved_pages
+
+С --pages разбираются сохраненные страницы маркетплейсов (*.html, например
+/tmp/wb_page_before.html от парсера Wildberries), иначе генерируется синтетическая
+страница с вложенной разметкой отзывов и шумом вокруг (--nesting - сколько
+совпадающих с селекторами оберток вокруг каждого отзыва)
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+# Добавляем путь к модулям сервиса
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from parsers.html_backend import parse_html
+from parsers.html_reviews import extract_reviews
+
+SELECTORS = [
+    'div[class*="feedback"]',
+    'div[class*="review"]',
+    'div[class*="comment"]',
+    '[data-feedback-id]',
+    'article',
+    '.feedback-item',
+    '.review-item'
+]
+
+SKIP_WORDS = ['отзыв', 'оценка', 'рейтинг', 'cookie']
+
+WORDS = (
+    "отличный товар качество доставка быстрая упаковка цена рекомендую "
+    "соответствует описанию размер подошел брак вернул продавец спасибо"
+).split()
+
+
+def synthetic_page(count: int, nesting: int = 1, seed: int = 42) -> str:
+    """Страница с count отзывами, вложенными в обертки, и служебными блоками вокруг"""
+    rng = random.Random(seed)
+    parts = ['<html><head><script>var state = {"x": 1};</script><style>.a{}</style></head><body>']
+    for i in range(200):
+        parts.append(f'<div class="menu-item"><a href="/c/{i}">Категория {i}</a></div>')
+    parts.append('<section class="product-feedbacks"><div class="feedbacks-list">')
+    for i in range(count):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        rating = rng.randint(1, 5)
+        stars = "".join(
+            f'<span class="star{" star--fill" if s < rating else ""}"></span>' for s in range(5)
+        )
+        parts.append(
+            '<div class="feedback-wrapper">' * nesting +
+            f'<div class="feedback-item" data-feedback-id="{i}">'
+            f'<div class="feedback__header"><strong class="feedback__author">Покупатель {i}</strong>'
+            f'<span class="feedback__date">{rng.randint(1, 28)} марта 2024</span></div>'
+            f'<div class="feedback__rating">{stars}</div>'
+            f'<p class="feedback__text">{text} покупка номер {i} очень подробно.</p>'
+            f'<div class="feedback__actions"><button>Полезно</button></div></div>' +
+            '</div>' * nesting
+        )
+    parts.append('</div></section>')
+    for i in range(500):
+        parts.append(f'<div class="footer-link"><span>Ссылка {i}</span></div>')
+    parts.append('</body></html>')
+    return "".join(parts)
+
+
+def legacy_extract(html: str) -> int:
+    """Исходный путь: html.parser, отдельный select на каждый селектор, get_text по контейнерам"""
+    soup = BeautifulSoup(html, 'html.parser')
+    containers = []
+    for selector in SELECTORS:
+        containers.extend(soup.select(selector))
+    seen = set()
+    for container in containers:
+        text = container.get_text(separator=' ', strip=True)
+        if len(text) >= 30:
+            text = ' '.join(
+                line.strip() for line in text.split('\n')
+                if len(line.strip()) > 15 and not any(skip in line.lower() for skip in SKIP_WORDS)
+            )
+            if len(text) >= 20:
+                seen.add(hash(text[:100]))
+        container.find(['strong', 'b', 'span'], class_=lambda x: x and 'author' in str(x).lower())
+        container.find_all(['span', 'div', 'i'], class_=lambda x: x and 'star' in str(x).lower())
+        container.find(['time', 'span', 'div'], class_=lambda x: x and 'date' in str(x).lower())
+    return len(seen)
+
+
+def backend_extract(backend: str):
+    def run(html: str) -> int:
+        return len(extract_reviews(parse_html(html, backend), SELECTORS, lambda _: datetime(2024, 3, 1)))
+    return run
+
+
+METHODS = {
+    "legacy": legacy_extract,
+    "bs4": backend_extract("bs4"),
+    "lxml": backend_extract("lxml"),
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--reviews", type=int, default=2000, help="отзывов на синтетической странице")
+    arg_parser.add_argument("--nesting", type=int, default=1, help="оберток вокруг каждого отзыва")
+    arg_parser.add_argument("--pages", help="каталог с сохраненными *.html страницами")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="повторов на метод (берется лучший)")
+    arg_parser.add_argument("--methods", default="legacy,bs4,lxml", help="методы через запятую")
+    args = arg_parser.parse_args()
+
+    if args.pages:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages, "*.html"))):
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                pages.append(f.read())
+        if not pages:
+            sys.exit(f"❌ В {args.pages} нет *.html страниц")
+    else:
+        pages = [synthetic_page(args.reviews, args.nesting)]
+    size_mb = sum(len(p.encode("utf-8")) for p in pages) / 1024 / 1024
+    print(f"📊 Страниц: {len(pages)}, {size_mb:.1f} МБ HTML")
+
+    # Логи extract_reviews не нужны в замерах
+    devnull = open(os.devnull, "w")
+    for method in args.methods.split(","):
+        method = method.strip()
+        best = None
+        found = 0
+        for _ in range(args.repeat):
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                started = time.perf_counter()
+                found = sum(METHODS[method](page) for page in pages)
+                elapsed = time.perf_counter() - started
+            finally:
+                sys.stdout = stdout
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{method:>7}: {best:8.3f} с ({size_mb / best:6.2f} МБ/с), отзывов {found}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Бенчмарк сохранения отзывов: ORM (SELECT на каждый отзыв + add_all),
+INSERT ... ON CONFLICT пачками и COPY через staging-таблицу
+
+Запуск (нужна PostgreSQL из DATABASE_URL):
+    python benchmarks/bench_ingest.py --rows 100000
+
+ORM-путь квадратичный (каждый SELECT сравнивает Text без индекса), поэтому
+по умолчанию он гоняется на первых --orm-rows отзывах
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Добавляем путь к модулям сервиса
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine, SessionLocal, Base, Product, Review
+from reviews_store import save_reviews
+from bulk_ingest import copy_reviews
+
+WORDS = (
+    "отличный товар качество доставка быстрая упаковка цена рекомендую "
+    "соответствует описанию размер подошел брак вернул продавец спасибо"
+).split()
+
+
+def synthetic_reviews(count: int, seed: int = 42):
+    """Синтетические отзывы со случайным текстом и датой"""
+    rng = random.Random(seed)
+    base_date = datetime(2024, 1, 1)
+    reviews = []
+    for i in range(count):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        reviews.append({
+            "author": f"Покупатель {i}",
+            "rating": rng.randint(1, 5),
+            "text": f"{text} #{i}",
+            "date": base_date + timedelta(minutes=i)
+        })
+    return reviews
+
+
+def orm_path(db, product_id, reviews_data):
+    """Исходный путь: проверка дубликата запросом на каждый отзыв и add_all"""
+    new_reviews = []
+    for review_data in reviews_data:
+        existing = db.query(Review).filter(
+            Review.product_id == product_id,
+            Review.text == review_data["text"],
+            Review.date == review_data["date"]
+        ).first()
+        if not existing:
+            new_reviews.append(Review(
+                product_id=product_id,
+                author=review_data.get("author"),
+                rating=review_data.get("rating"),
+                text=review_data["text"],
+                date=review_data["date"]
+            ))
+    db.add_all(new_reviews)
+    return len(new_reviews), len(reviews_data) - len(new_reviews)
+
+
+METHODS = {
+    "orm": orm_path,
+    "insert": save_reviews,
+    "copy": copy_reviews,
+}
+
+
+def run(method: str, reviews_data):
+    db = SessionLocal()
+    product = Product(
+        user_id=0,
+        name=f"bench-{method}",
+        url=f"bench://ingest/{method}/{time.time()}",
+        marketplace="benchmark"
+    )
+    db.add(product)
+    db.commit()
+    try:
+        started = time.perf_counter()
+        inserted, skipped = METHODS[method](db, product.id, reviews_data)
+        db.commit()
+        first = time.perf_counter() - started
+
+        # Повторная загрузка тех же отзывов - все должны оказаться дубликатами
+        started = time.perf_counter()
+        re_inserted, _ = METHODS[method](db, product.id, reviews_data)
+        db.commit()
+        second = time.perf_counter() - started
+
+        print(
+            f"{method:>7}: {first:8.2f} с ({len(reviews_data) / first:9.0f} отзывов/с), "
+            f"новых {inserted}, повторно {second:8.2f} с (новых {re_inserted})"
+        )
+    finally:
+        db.query(Review).filter(Review.product_id == product.id).delete()
+        db.delete(product)
+        db.commit()
+        db.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--rows", type=int, default=100000, help="количество синтетических отзывов")
+    arg_parser.add_argument("--orm-rows", type=int, default=10000, help="сколько отзывов грузить ORM-путем")
+    arg_parser.add_argument("--methods", default="orm,insert,copy", help="методы через запятую")
+    args = arg_parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    reviews_data = synthetic_reviews(args.rows)
+    print(f"📊 Загрузка {args.rows} синтетических отзывов")
+    for method in args.methods.split(","):
+        method = method.strip()
+        if method == "orm" and args.orm_rows < args.rows:
+            print(f"   (orm - только первые {args.orm_rows})")
+            run(method, reviews_data[:args.orm_rows])
+        else:
+            run(method, reviews_data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Сквозной бенчмарк стратегий парсинга на записанных ответах маркетплейсов (без сети)
+
+Запуск:
+    # 1. Запись: каждая стратегия маркетплейса выполняется вживую, ответы сохраняются в архив
+    python benchmarks/bench_parsers.py record --archive fixtures/market.zip \\
+        https://www.wildberries.ru/catalog/12345678/detail.aspx https://www.ozon.ru/product/123456789/
+
+    # 2. Воспроизведение: время, CPU и память на каждую стратегию, сверка числа отзывов с записью
+    python benchmarks/bench_parsers.py run --archive fixtures/market.zip --repeat 3
+    python benchmarks/bench_parsers.py run --archive fixtures/market.zip --strategies api,selenium
+
+Стратегии берутся из parsers.registry (SimpleWildberriesParser, SimpleOzonParser,
+SimpleYandexMarketParser и Selenium-парсеры). При воспроизведении time.sleep парсеров
+отключается (--keep-sleeps возвращает), поэтому время - это работа парсера, а не ожидание.
+Selenium воспроизводится на уровне драйвера (см. parsers/replay.py), браузер не запускается;
+Playwright запускает браузер, но все запросы страницы отдаются из архива.
+Память - пик аллокаций Python (tracemalloc) в отдельном прогревочном проходе; память
+libxml2 и браузера в нее не входит.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+from parsers import registry  # noqa: E402
+from parsers import replay  # noqa: E402
+from parsers.http_cache import marketplace_for_url  # noqa: E402
+
+
+def run_strategy(entry, url: str):
+    """Один запуск стратегии: (отзывы или None, ошибка)"""
+    try:
+        parser = entry.parser_cls()
+        reviews = getattr(parser, entry.method)(url)
+        return reviews, None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def selected_entries(marketplace: str, strategies):
+    entries = registry.parsers_for(marketplace)
+    if strategies:
+        entries = [e for e in entries if e.strategy in strategies]
+    return entries
+
+
+def record(args):
+    strategies = set(args.strategies.split(",")) if args.strategies else None
+    meta = {"recorded_at": datetime.utcnow().isoformat(), "products": [], "expected": {}}
+    with replay.recording(args.archive, meta) as archive:
+        for url in args.urls:
+            marketplace = marketplace_for_url(url)
+            if not marketplace:
+                print(f"⚠️ Маркетплейс не определен, пропускаю: {url}")
+                continue
+            meta["products"].append({"url": url, "marketplace": marketplace})
+            for entry in selected_entries(marketplace, strategies):
+                started = time.perf_counter()
+                reviews, error = run_strategy(entry, url)
+                count = len(reviews) if reviews is not None else None
+                meta["expected"][f"{url} {entry.strategy}"] = count
+                print(f"📼 {marketplace}/{entry.strategy}: {count} отзывов за "
+                      f"{time.perf_counter() - started:.1f} с{' (' + error + ')' if error else ''}")
+    print(f"✅ Архив {args.archive}: {archive.stats['recorded']} ответов")
+
+
+def measure(entry, url: str):
+    started_wall = time.perf_counter()
+    started_cpu = time.process_time()
+    reviews, error = run_strategy(entry, url)
+    return {
+        "wall": time.perf_counter() - started_wall,
+        "cpu": time.process_time() - started_cpu,
+        "reviews": len(reviews) if reviews is not None else None,
+        "error": error,
+    }
+
+
+def run(args):
+    archive = replay.FixtureArchive.load(args.archive)
+    strategies = set(args.strategies.split(",")) if args.strategies else None
+    products = archive.meta.get("products", [])
+    expected = archive.meta.get("expected", {})
+    if not products:
+        sys.exit("❌ В архиве нет товаров (запишите его командой record)")
+
+    if not args.keep_sleeps:
+        time.sleep = lambda seconds: None
+
+    results = {}
+    with replay.replaying(archive):
+        for repeat in range(args.repeat + 1):
+            for product in products:
+                for entry in selected_entries(product["marketplace"], strategies):
+                    archive.rewind()
+                    key = (product["url"], entry)
+                    if repeat == 0:
+                        # Прогрев (импорты, кеши) и пиковая память Python в отдельном проходе
+                        tracemalloc.start()
+                        measure(entry, product["url"])
+                        results[key] = {"runs": [], "peak_mb": tracemalloc.get_traced_memory()[1] / 1024 / 1024}
+                        tracemalloc.stop()
+                        continue
+                    results[key]["runs"].append(measure(entry, product["url"]))
+
+    print(f"📊 {args.archive}: {len(products)} товаров, повторов {args.repeat}, "
+          f"ответов воспроизведено {archive.stats['replayed']}, без фикстуры {archive.stats['missed']}")
+    print(f"{'маркетплейс/стратегия':<28} {'парсер':<28} {'время, мс':>10} {'CPU, мс':>9} "
+          f"{'память, МБ':>11} {'отзывы':>7}")
+    regressions = 0
+    for (url, entry), result in results.items():
+        runs = result["runs"]
+        wall = statistics.median(r["wall"] for r in runs) * 1000
+        cpu = statistics.median(r["cpu"] for r in runs) * 1000
+        reviews = runs[-1]["reviews"]
+        recorded = expected.get(f"{url} {entry.strategy}")
+        mark = ""
+        if reviews != recorded:
+            regressions += 1
+            mark = f"  ⚠️ при записи {recorded}"
+        if runs[-1]["error"]:
+            mark += f"  ❌ {runs[-1]['error']}"
+        print(f"{entry.marketplace + '/' + entry.strategy:<28} {entry.parser_cls.__name__:<28} "
+              f"{wall:10.1f} {cpu:9.1f} {result['peak_mb']:11.1f} {str(reviews):>7}{mark}")
+    if regressions:
+        print(f"⚠️ Число отзывов расходится с записью: {regressions}")
+        sys.exit(1)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="запись ответов маркетплейсов в архив")
+    record_parser.add_argument("urls", nargs="+", help="URL товаров")
+
+    run_parser = commands.add_parser("run", help="бенчмарк на записанных ответах")
+    run_parser.add_argument("--repeat", type=int, default=3, help="замеров на стратегию (берется медиана)")
+    run_parser.add_argument("--keep-sleeps", action="store_true", help="не отключать time.sleep в парсерах")
+
+    for sub in (record_parser, run_parser):
+        sub.add_argument("--archive", required=True, help="zip-архив фикстур")
+        sub.add_argument("--strategies", default="", help="стратегии через запятую (по умолчанию все)")
+
+    args = arg_parser.parse_args()
+    if args.command == "record":
+        record(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Бенчмарк холодного старта parser-service: время импорта модуля в свежем интерпретаторе,
+число загруженных модулей и пиковая память
+
+Запуск:
+    python benchmarks/bench_startup.py                     # import main
+    python benchmarks/bench_startup.py --module strategies # без FastAPI в окружении
+    python benchmarks/bench_startup.py --load wildberries  # + первая загрузка парсеров маркетплейса
+
+Парсеры (Selenium, undetected_chromedriver, Playwright, cloudscraper, fake_useragent)
+загружаются реестром parsers.registry при первом обращении к маркетплейсу; --load
+показывает, сколько стоит это первое обращение, а --load all - прежний старт, когда
+все парсеры импортировались сразу
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter() - started
+loaded = 0.0
+if {load!r}:
+    from parsers import registry
+    started = time.perf_counter()
+    if {load!r} == "all":
+        registry.load_all()
+    else:
+        registry.load_marketplace({load!r})
+    loaded = time.perf_counter() - started
+print(json.dumps({{
+    "import": imported,
+    "load": loaded,
+    "modules": len(sys.modules),
+    "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def probe(module: str, load: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, load=load)],
+        cwd=SERVICE_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"❌ Импорт {module} не удался:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--module", default="main", help="импортируемый модуль сервиса")
+    arg_parser.add_argument("--load", default="", help="маркетплейс, парсеры которого загрузить после импорта (или all)")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="запусков интерпретатора (берется медиана)")
+    args = arg_parser.parse_args()
+
+    runs = [probe(args.module, args.load) for _ in range(args.repeat)]
+    imported = statistics.median(r["import"] for r in runs)
+    print(f"📊 import {args.module}: {imported * 1000:7.0f} мс, модулей {runs[0]['modules']}, "
+          f"память {statistics.median(r['maxrss_mb'] for r in runs):.0f} МБ")
+    if args.load:
+        loaded = statistics.median(r["load"] for r in runs)
+        print(f"   загрузка парсеров {args.load}: {loaded * 1000:7.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Массовая загрузка отзывов через PostgreSQL COPY
+Отзывы потоком пишутся во временную staging-таблицу (copy_expert из буфера в памяти)
+и сливаются в reviews одной операцией INSERT ... SELECT ... ON CONFLICT DO NOTHING
+"""
+from typing import Dict, Iterable, Iterator, List, Tuple
+import csv
+import io
+import logging
+import os
+from sqlalchemy.orm import Session
+
+from reviews_store import review_rows, save_reviews
+
+logger = logging.getLogger(__name__)
+
+# С какого размера пачки выгоднее COPY, чем INSERT ... VALUES
+COPY_THRESHOLD = int(os.getenv("BULK_COPY_THRESHOLD", "5000"))
+# Сколько строк держим в буфере в памяти на один COPY
+COPY_CHUNK_SIZE = int(os.getenv("BULK_COPY_CHUNK_SIZE", "50000"))
+
+COLUMNS = ("product_id", "author", "rating", "text", "date", "content_hash", "created_at")
+_COLUMN_LIST = ", ".join(COLUMNS)
+
+CREATE_STAGING_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS reviews_staging (
+        product_id INTEGER,
+        author VARCHAR,
+        rating INTEGER,
+        text TEXT,
+        date TIMESTAMP,
+        content_hash VARCHAR(64),
+        created_at TIMESTAMP
+    ) ON COMMIT DROP
+"""
+COPY_SQL = f"COPY reviews_staging ({_COLUMN_LIST}) FROM STDIN WITH (FORMAT csv)"
+MERGE_SQL = f"""
+    INSERT INTO reviews ({_COLUMN_LIST})
+    SELECT {_COLUMN_LIST} FROM reviews_staging
+    ON CONFLICT (product_id, content_hash) DO NOTHING
+"""
+
+
+def _chunks(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_buffer(rows: List[Dict]) -> io.StringIO:
+    """CSV для COPY: None пишется пустым полем без кавычек, что COPY читает как NULL"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row["product_id"],
+            row["author"],
+            row["rating"],
+            row["text"],
+            row["date"].isoformat(),
+            row["content_hash"],
+            row["created_at"].isoformat()
+        ])
+    buffer.seek(0)
+    return buffer
+
+
+def copy_reviews(db: Session, product_id: int, reviews_data: Iterable[Dict]) -> Tuple[int, int]:
+    """
+    Загрузка отзывов через COPY в staging-таблицу и слияние в reviews
+
+    Работает в транзакции сессии db - фиксирует изменения вызывающий код.
+
+    Returns:
+        (количество новых отзывов, количество пропущенных дубликатов)
+    """
+    cursor = db.connection().connection.cursor()
+    inserted = 0
+    total = 0
+    try:
+        cursor.execute(CREATE_STAGING_SQL)
+        for chunk in _chunks(reviews_data, COPY_CHUNK_SIZE):
+            total += len(chunk)
+            cursor.copy_expert(COPY_SQL, _csv_buffer(review_rows(product_id, chunk)))
+            cursor.execute(MERGE_SQL)
+            inserted += cursor.rowcount
+            cursor.execute("TRUNCATE reviews_staging")
+    finally:
+        cursor.close()
+    return inserted, total - inserted
+
+
+def ingest_reviews(db: Session, product_id: int, reviews_data: List[Dict]) -> Tuple[int, int]:
+    """Сохранение отзывов: крупные пачки через COPY, небольшие - через INSERT ... VALUES"""
+    if len(reviews_data) >= COPY_THRESHOLD:
+        logger.info(f"📦 Загрузка {len(reviews_data)} отзывов через COPY")
+        return copy_reviews(db, product_id, reviews_data)
+    return save_reviews(db, product_id, reviews_data)
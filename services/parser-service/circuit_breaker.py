@@ -0,0 +1,149 @@
+"""
+Circuit breaker для стратегий парсинга
+Для каждой пары (маркетплейс, стратегия) хранится окно последних запусков. Если доля успешных
+в окне упала ниже порога или подряд идут неудачи, стратегия отключается (open) на время
+охлаждения и не тратит таймауты. После охлаждения один запуск пропускается как проба
+(half_open): успех возвращает стратегию в работу, неудача снова отключает ее с удвоенным
+охлаждением.
+"""
+from typing import Dict, Optional, Tuple
+from collections import deque
+from datetime import datetime
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+# Порог доли успешных запусков в окне, ниже которого стратегия отключается
+BREAKER_MIN_SUCCESS_RATE = float(os.getenv("BREAKER_MIN_SUCCESS_RATE", "0.5"))
+BREAKER_CONSECUTIVE_FAILURES = int(os.getenv("BREAKER_CONSECUTIVE_FAILURES", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "300"))
+BREAKER_MAX_COOLDOWN_SECONDS = float(os.getenv("BREAKER_MAX_COOLDOWN_SECONDS", "3600"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Состояние одной стратегии одного маркетплейса"""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)  # (успех, длительность в секундах)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = BREAKER_COOLDOWN_SECONDS
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[datetime] = None
+        self.last_failure_at: Optional[datetime] = None
+
+    def allow(self) -> bool:
+        """Можно ли запускать стратегию сейчас (в half_open - только одну пробу за раз)"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == HALF_OPEN:
+                if self.probe_in_flight:
+                    return False
+                self.probe_in_flight = True
+            return True
+
+    def record(self, ok: bool, elapsed: float, error: Optional[str] = None) -> str:
+        """Учесть результат запуска; возвращает новое состояние"""
+        with self._lock:
+            self.outcomes.append((ok, elapsed))
+            if ok:
+                self.consecutive_failures = 0
+                self.last_success_at = datetime.utcnow()
+                if self.state != CLOSED:
+                    logger.info(f"🔌 Стратегия {self.name} снова работает")
+                    self.state = CLOSED
+                    self.cooldown = BREAKER_COOLDOWN_SECONDS
+                    # Старые неудачи не должны сразу снова разомкнуть цепь
+                    self.outcomes.clear()
+                    self.outcomes.append((ok, elapsed))
+            else:
+                self.consecutive_failures += 1
+                self.last_error = error
+                self.last_failure_at = datetime.utcnow()
+                if self.state == HALF_OPEN:
+                    self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN_SECONDS)
+                    self._open()
+                elif self.state == CLOSED and self._should_open():
+                    self._open()
+            self.probe_in_flight = False
+            return self.state
+
+    def release(self):
+        """Запуск отменен без результата (проиграл гонку) - проба снова доступна"""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def _success_rate(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return sum(1 for ok, _ in self.outcomes if ok) / len(self.outcomes)
+
+    def _should_open(self) -> bool:
+        if self.consecutive_failures >= BREAKER_CONSECUTIVE_FAILURES:
+            return True
+        return len(self.outcomes) >= BREAKER_MIN_CALLS and self._success_rate() < BREAKER_MIN_SUCCESS_RATE
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(f"🔌 Стратегия {self.name} отключена на {self.cooldown:.0f} с: {self.last_error}")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = sorted(elapsed for ok, elapsed in self.outcomes if ok)
+            success_rate = self._success_rate()
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "calls": len(self.outcomes),
+                "success_rate": round(success_rate, 3) if success_rate is not None else None,
+                "consecutive_failures": self.consecutive_failures,
+                "latency_p50": round(latencies[len(latencies) // 2], 2) if latencies else None,
+                "latency_max": round(latencies[-1], 2) if latencies else None,
+                "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+                "last_error": self.last_error,
+                "last_success_at": self.last_success_at.isoformat() if self.last_success_at else None,
+                "last_failure_at": self.last_failure_at.isoformat() if self.last_failure_at else None,
+            }
+
+
+class BreakerRegistry:
+    """Circuit breaker'ы по ключу (маркетплейс, стратегия)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, marketplace: str, strategy: str) -> CircuitBreaker:
+        key = (marketplace, strategy)
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(f"{marketplace}/{strategy}")
+            return self._breakers[key]
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict]]:
+        with self._lock:
+            items = list(self._breakers.items())
+        result: Dict[str, Dict[str, Dict]] = {}
+        for (marketplace, strategy), breaker in sorted(items):
+            result.setdefault(marketplace, {})[strategy] = breaker.snapshot()
+        return result
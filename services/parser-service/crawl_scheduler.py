@@ -0,0 +1,217 @@
+"""
+Планировщик обхода товаров
+Все задачи парсинга проходят через планировщик: он выдает их в пул JobQueue по приоритету,
+соблюдая для каждого маркетплейса лимит частоты запусков (token bucket) и число одновременных
+парсингов. Лимиты задаются переменными окружения, например:
+    CRAWL_RATE_WILDBERRIES=30        # запусков парсинга в минуту
+    CRAWL_CONCURRENCY_WILDBERRIES=3  # одновременных парсингов
+"""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+from database import Product
+
+logger = logging.getLogger(__name__)
+
+# Лимиты по умолчанию: (запусков в минуту, одновременных парсингов).
+# Ozon и Яндекс.Маркет парсятся браузером и агрессивнее банят, Wildberries отдает API
+DEFAULT_LIMITS = {
+    "wildberries": (30, 3),
+    "ozon": (6, 1),
+    "yandex-market": (6, 1),
+}
+FALLBACK_LIMITS = (10, 1)
+
+# Приоритет ручного запуска - выше любого обхода; фоновое автообновление - ниже всех
+PRIORITY_MANUAL = 0
+PRIORITY_BACKGROUND = 1_000_000
+
+CRAWL_ORDERS = ("stale", "views")
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в минуту, не больше capacity накопленных"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """Через сколько секунд появится токен"""
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class MarketplaceLimiter:
+    """Лимиты одного маркетплейса: частота запусков и число одновременных парсингов"""
+
+    def __init__(self, rate_per_minute: float, max_concurrent: int):
+        self.bucket = TokenBucket(rate_per_minute)
+        self.max_concurrent = max_concurrent
+        self.running = 0
+
+    def has_slot(self) -> bool:
+        return self.running < self.max_concurrent
+
+    def try_acquire(self) -> bool:
+        if not self.has_slot() or not self.bucket.try_acquire():
+            return False
+        self.running += 1
+        return True
+
+    def release(self):
+        self.running = max(0, self.running - 1)
+
+
+def limiter_from_env(marketplace: str) -> MarketplaceLimiter:
+    rate, concurrency = DEFAULT_LIMITS.get(marketplace, FALLBACK_LIMITS)
+    suffix = marketplace.upper().replace("-", "_")
+    rate = float(os.getenv(f"CRAWL_RATE_{suffix}", rate))
+    concurrency = int(os.getenv(f"CRAWL_CONCURRENCY_{suffix}", concurrency))
+    return MarketplaceLimiter(rate, concurrency)
+
+
+def crawl_order(products: List[Product], order: str = "stale") -> List[Product]:
+    """
+    Порядок обхода товаров
+
+    stale - сначала давно не парсившиеся (никогда - в первую очередь), при равенстве популярные;
+    views - сначала самые просматриваемые, при равенстве давно не парсившиеся
+    """
+    def staleness(product: Product) -> datetime:
+        return product.last_parsed_at or datetime.min
+
+    if order == "views":
+        return sorted(products, key=lambda p: (-(p.view_count or 0), staleness(p)))
+    return sorted(products, key=lambda p: (staleness(p), -(p.view_count or 0)))
+
+
+class CrawlScheduler:
+    """
+    Диспетчер задач парсинга перед JobQueue
+
+    Задачи ждут в очередях по маркетплейсам (куча по приоритету); поток-диспетчер отдает в пул
+    самую приоритетную задачу среди маркетплейсов, у которых есть свободный слот и токен.
+    Общее число выданных задач не превышает числа потоков пула, чтобы приоритет не терялся
+    в FIFO-очереди executor'а.
+    """
+
+    def __init__(self, job_queue, max_running: Optional[int] = None):
+        self.job_queue = job_queue
+        self.max_running = max_running or job_queue.max_workers
+        self._limiters: Dict[str, MarketplaceLimiter] = {}
+        self._pending: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._queued_ids = set()
+        self._running = 0
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._dispatch_loop, name="crawl-scheduler", daemon=True)
+        self._thread.start()
+
+    def _limiter(self, marketplace: str) -> MarketplaceLimiter:
+        if marketplace not in self._limiters:
+            self._limiters[marketplace] = limiter_from_env(marketplace)
+        return self._limiters[marketplace]
+
+    def enqueue(self, job_id: int, marketplace: str, priority: int = PRIORITY_MANUAL) -> bool:
+        """Добавить задачу в очередь (меньше priority - раньше); False - задача уже в очереди"""
+        with self._cond:
+            if job_id in self._queued_ids:
+                return False
+            self._queued_ids.add(job_id)
+            self._limiter(marketplace)
+            heapq.heappush(self._pending.setdefault(marketplace, []), (priority, next(self._counter), job_id))
+            self._cond.notify()
+        return True
+
+    def _next_job(self) -> Tuple[Optional[Tuple[int, str]], Optional[float]]:
+        """Выбор задачи для запуска: (job_id, маркетплейс) и время до следующей проверки"""
+        if self._running >= self.max_running:
+            return None, None
+        best = None
+        wait = None
+        for marketplace, heap in self._pending.items():
+            if not heap:
+                continue
+            limiter = self._limiters[marketplace]
+            if not limiter.has_slot():
+                continue
+            token_wait = limiter.bucket.wait_time()
+            if token_wait > 0:
+                wait = token_wait if wait is None else min(wait, token_wait)
+                continue
+            if best is None or heap[0] < self._pending[best][0]:
+                best = marketplace
+        if best is None:
+            return None, wait
+        limiter = self._limiters[best]
+        if not limiter.try_acquire():
+            return None, 0.05
+        _, _, job_id = heapq.heappop(self._pending[best])
+        self._queued_ids.discard(job_id)
+        self._running += 1
+        return (job_id, best), None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    job, wait = self._next_job()
+                    if job:
+                        break
+                    self._cond.wait(timeout=wait)
+            job_id, marketplace = job
+            if not self.job_queue.submit(job_id, on_done=lambda mp=marketplace: self._release(mp)):
+                self._release(marketplace)
+
+    def _release(self, marketplace: str):
+        with self._cond:
+            self._limiters[marketplace].release()
+            self._running = max(0, self._running - 1)
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "max_running": self.max_running,
+                "marketplaces": {
+                    marketplace: {
+                        "pending": len(self._pending.get(marketplace, [])),
+                        "running": limiter.running,
+                        "max_concurrent": limiter.max_concurrent,
+                        "rate_per_minute": round(limiter.bucket.rate * 60, 2),
+                    }
+                    for marketplace, limiter in self._limiters.items()
+                }
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
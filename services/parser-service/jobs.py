@@ -0,0 +1,229 @@
+"""
+Фоновые задачи парсинга
+Задача сохраняется в таблицу parse_jobs и выполняется в пуле потоков, HTTP-запрос не ждет
+окончания парсинга. Прогресс (страницы, отзывы, стратегия) держится в памяти и периодически
+сбрасывается в БД, чтобы его видел /products/{id}/status
+"""
+from typing import Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import os
+import threading
+import time
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Product, ParseJob
+
+logger = logging.getLogger(__name__)
+
+# Сколько парсингов выполняется одновременно
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "4"))
+# Как часто прогресс записывается в БД (секунды)
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PARSE_PROGRESS_FLUSH_SECONDS", "2"))
+# Сколько раз задача перезапускается после рестарта сервиса, прежде чем считается ошибочной
+PARSE_MAX_ATTEMPTS = int(os.getenv("PARSE_MAX_ATTEMPTS", "3"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Поля прогресса, которые парсеры передают в колбэк, и соответствующие колонки parse_jobs
+_PROGRESS_COLUMNS = {
+    "strategy": "strategy",
+    "pages": "pages_fetched",
+    "reviews": "reviews_found",
+}
+
+
+class ProgressReporter:
+    """Колбэк прогресса для одной задачи: обновляет снимок в памяти и раз в интервал пишет в БД"""
+
+    def __init__(self, job_id: int, snapshot: Dict, flush_interval: float = PROGRESS_FLUSH_SECONDS):
+        self.job_id = job_id
+        self.snapshot = snapshot
+        self.flush_interval = flush_interval
+        self._last_flush = 0.0
+
+    def __call__(self, **progress):
+        for key, value in progress.items():
+            if key in _PROGRESS_COLUMNS and value is not None:
+                self.snapshot[key] = value
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        values = {
+            column: self.snapshot[key]
+            for key, column in _PROGRESS_COLUMNS.items()
+            if key in self.snapshot
+        }
+        self._last_flush = time.monotonic()
+        if not values:
+            return
+        db = SessionLocal()
+        try:
+            db.query(ParseJob).filter(ParseJob.id == self.job_id).update(values)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Не удалось сохранить прогресс задачи {self.job_id}: {e}")
+        finally:
+            db.close()
+
+
+class JobQueue:
+    """
+    Пул потоков для задач парсинга
+
+    runner(job_id, progress) выполняет задачу целиком (статусы, сохранение отзывов);
+    progress - ProgressReporter, который нужно передать парсеру.
+    """
+
+    def __init__(self, runner: Callable[[int, ProgressReporter], None], max_workers: int = PARSE_WORKERS):
+        self._runner = runner
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parse-job")
+        self._lock = threading.Lock()
+        self._progress: Dict[int, Dict] = {}
+
+    def submit(self, job_id: int, on_done: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Поставить задачу в пул (False - она уже выполняется в этом процессе)
+
+        on_done вызывается после завершения задачи, в том числе с ошибкой
+        """
+        with self._lock:
+            if job_id in self._progress:
+                return False
+            self._progress[job_id] = {}
+        self._executor.submit(self._run, job_id, on_done)
+        logger.info(f"📥 Задача парсинга {job_id} поставлена в очередь")
+        return True
+
+    def progress(self, job_id: int) -> Optional[Dict]:
+        """Актуальный прогресс задачи из памяти (None - задача не выполняется в этом процессе)"""
+        with self._lock:
+            snapshot = self._progress.get(job_id)
+            return dict(snapshot) if snapshot is not None else None
+
+    def _run(self, job_id: int, on_done: Optional[Callable[[], None]] = None):
+        with self._lock:
+            snapshot = self._progress[job_id]
+        reporter = ProgressReporter(job_id, snapshot)
+        try:
+            self._runner(job_id, reporter)
+        except Exception as e:
+            logger.error(f"❌ Задача парсинга {job_id} завершилась с необработанной ошибкой: {e}")
+        finally:
+            with self._lock:
+                self._progress.pop(job_id, None)
+            if on_done:
+                on_done()
+
+    def shutdown(self, wait: bool = False):
+        """Остановка пула: задачи из очереди отменяются и будут перезапущены при следующем старте"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def create_job(db: Session, product: Product, full: bool = False) -> ParseJob:
+    """Новая задача парсинга товара (коммит - на вызывающем коде)"""
+    job = ParseJob(product_id=product.id, full=full, status="queued")
+    db.add(job)
+    product.parsing_status = "parsing"
+    return job
+
+
+def active_job(db: Session, product_id: int) -> Optional[ParseJob]:
+    """Незавершенная задача парсинга товара, если есть"""
+    return db.query(ParseJob).filter(
+        ParseJob.product_id == product_id,
+        ParseJob.status.in_(ACTIVE_STATUSES)
+    ).order_by(ParseJob.id.desc()).first()
+
+
+def recent_completed_job(db: Session, product_id: int, max_age_seconds: float) -> Optional[ParseJob]:
+    """Задача товара, успешно завершенная не раньше max_age_seconds назад"""
+    if max_age_seconds <= 0:
+        return None
+    return db.query(ParseJob).filter(
+        ParseJob.product_id == product_id,
+        ParseJob.status == "completed",
+        ParseJob.finished_at >= datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    ).order_by(ParseJob.id.desc()).first()
+
+
+def latest_job(db: Session, product_id: int) -> Optional[ParseJob]:
+    """Последняя задача парсинга товара"""
+    return db.query(ParseJob).filter(
+        ParseJob.product_id == product_id
+    ).order_by(ParseJob.id.desc()).first()
+
+
+def job_to_dict(job: ParseJob, live_progress: Optional[Dict] = None) -> Dict:
+    """Задача в виде ответа API (прогресс из памяти свежее записанного в БД)"""
+    live_progress = live_progress or {}
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "mode": job.mode,
+        "strategy": live_progress.get("strategy", job.strategy),
+        "pages_fetched": live_progress.get("pages", job.pages_fetched or 0),
+        "reviews_found": live_progress.get("reviews", job.reviews_found or 0),
+        "new_reviews": job.new_reviews or 0,
+        "duplicates_skipped": job.duplicates_skipped or 0,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def recover_stale_jobs(scheduler) -> int:
+    """
+    Восстановление после рестарта: задачи queued/running прерваны вместе с процессом.
+    Задачи с оставшимися попытками снова передаются планировщику, остальные помечаются ошибкой;
+    товары, зависшие в статусе parsing без активной задачи, сбрасываются в idle.
+
+    Returns:
+        количество перезапущенных задач
+    """
+    db = SessionLocal()
+    requeued = []  # (job_id, маркетплейс)
+    try:
+        for job in db.query(ParseJob).filter(ParseJob.status.in_(ACTIVE_STATUSES)).all():
+            product = db.query(Product).filter(Product.id == job.product_id).first()
+            if product and (job.attempts or 0) < PARSE_MAX_ATTEMPTS:
+                job.status = "queued"
+                product.parsing_status = "parsing"
+                requeued.append((job.id, product.marketplace))
+            else:
+                job.status = "error"
+                job.error = "Задача прервана перезапуском сервиса"
+                job.finished_at = datetime.utcnow()
+                if product:
+                    product.parsing_status = "error"
+        db.flush()
+
+        orphaned = db.query(Product).filter(
+            Product.parsing_status == "parsing",
+            ~Product.id.in_(
+                db.query(ParseJob.product_id).filter(ParseJob.status.in_(ACTIVE_STATUSES))
+            )
+        ).all()
+        for product in orphaned:
+            product.parsing_status = "idle"
+        db.commit()
+
+        if orphaned:
+            logger.info(f"🔄 Сброшен зависший статус parsing у {len(orphaned)} товаров")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Ошибка восстановления задач парсинга: {e}")
+        return 0
+    finally:
+        db.close()
+
+    for job_id, marketplace in requeued:
+        scheduler.enqueue(job_id, marketplace)
+    if requeued:
+        logger.info(f"🔄 Перезапущено прерванных задач парсинга: {len(requeued)}")
+    return len(requeued)
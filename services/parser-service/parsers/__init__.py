@@ -1,10 +1,23 @@
 """
 Парсеры для различных маркетплейсов
+Классы парсеров импортируются лениво при первом обращении (parsers.OzonParser),
+чтобы импорт пакета не тянул Selenium и Playwright; см. также parsers.registry
 """
-from .wildberries_parser import WildberriesParser
-from .ozon_parser import OzonParser
-from .yandex_market_parser import YandexMarketParser
-from .base_parser import BaseParser
+import importlib
+
+_LAZY_ATTRS = {
+    'WildberriesParser': '.wildberries_parser',
+    'OzonParser': '.ozon_parser',
+    'YandexMarketParser': '.yandex_market_parser',
+    'BaseParser': '.base_parser',
+}
 
 __all__ = ['WildberriesParser', 'OzonParser', 'YandexMarketParser', 'BaseParser']
 
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
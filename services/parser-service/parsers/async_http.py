@@ -0,0 +1,124 @@
+"""
+Общий асинхронный HTTP-клиент для API-стратегий парсеров
+Один httpx.AsyncClient (HTTP/2, пул keep-alive соединений на каждый хост) работает в
+отдельном потоке с event loop'ом. Стратегии выполняются в обычных потоках, поэтому
+запросы отправляются в этот loop через submit/run и возвращают concurrent.futures.Future:
+сотни запросов в полете не требуют сотни потоков.
+"""
+from typing import Any, Awaitable, Optional
+import asyncio
+import concurrent.futures
+import importlib.util
+import logging
+import os
+import threading
+
+import httpx
+
+from .sessions import user_agents
+
+logger = logging.getLogger(__name__)
+
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", "200"))
+ASYNC_HTTP_MAX_KEEPALIVE = int(os.getenv("ASYNC_HTTP_MAX_KEEPALIVE", "50"))
+ASYNC_HTTP_TIMEOUT_SECONDS = float(os.getenv("ASYNC_HTTP_TIMEOUT_SECONDS", "15"))
+ASYNC_HTTP2 = os.getenv("ASYNC_HTTP2", "true").lower() in ("1", "true", "yes")
+
+# httpx поддерживает HTTP/2 только с пакетом h2 (extra httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+async def _rotate_user_agent(request: httpx.Request):
+    """Новый User-Agent из каталога на каждый запрос, если вызывающий код не задал свой"""
+    if request.headers.get('User-Agent', '').startswith('python-httpx/'):
+        request.headers['User-Agent'] = user_agents().random
+
+
+class AsyncHttp:
+    """Event loop в фоновом потоке и общий httpx.AsyncClient"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._in_flight = 0
+
+    def _start(self):
+        if self._loop is not None:
+            return
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="async-http", daemon=True)
+            thread.start()
+            http2 = ASYNC_HTTP2 and HTTP2_AVAILABLE
+            if ASYNC_HTTP2 and not HTTP2_AVAILABLE:
+                logger.warning("⚠️ Пакет h2 не установлен, API-запросы идут по HTTP/1.1")
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=ASYNC_HTTP_MAX_KEEPALIVE
+                ),
+                timeout=ASYNC_HTTP_TIMEOUT_SECONDS,
+                headers={
+                    'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+                },
+                event_hooks={'request': [_rotate_user_agent]},
+                follow_redirects=True
+            )
+            self._loop, self._thread = loop, thread
+            logger.info(f"🌐 Асинхронный HTTP-клиент запущен (HTTP/2: {http2})")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Клиент для использования внутри корутин, отправленных через submit/run"""
+        self._start()
+        return self._client
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """Запуск корутины в фоновом loop'е; future.cancel() отменяет запрос"""
+        self._start()
+
+        async def tracked():
+            self._in_flight += 1
+            try:
+                return await coro
+            finally:
+                self._in_flight -= 1
+        return asyncio.run_coroutine_threadsafe(tracked(), self._loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Синхронное выполнение корутины из обычного потока"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "started": self._loop is not None,
+            "in_flight": self._in_flight,
+            "http2": ASYNC_HTTP2 and HTTP2_AVAILABLE,
+            "max_connections": ASYNC_HTTP_MAX_CONNECTIONS,
+        }
+
+    def close(self):
+        """Закрытие клиента и остановка loop'а (при остановке сервиса)"""
+        with self._lock:
+            loop, client = self._loop, self._client
+            self._loop = self._thread = self._client = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка закрытия HTTP-клиента: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+async_http = AsyncHttp()
@@ -2,43 +2,151 @@
 Базовый класс для парсеров маркетплейсов
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import Callable, Iterator, List, Dict, Optional
+from datetime import datetime, timezone
+import threading
 import time
 import random
-from fake_useragent import UserAgent
-import cloudscraper
+from .sessions import user_agents, get_scraper
+from .http_cache import html_page, http_cache
+from .replay import replay_driver, wrap_driver
+from .registry import NoResult
+from .scroll import REVIEW_SELECTORS, ScrollResult, load_reviews
+
+
+# JS-функция: самая старая дата среди видимых на странице отзывов (ISO или null).
+# Понимает атрибут datetime, "26 ноября 2024", "26 ноября", "26.11.2024", "сегодня", "вчера"
+OLDEST_REVIEW_DATE_JS = """
+() => {
+    const months = {'января': 0, 'февраля': 1, 'марта': 2, 'апреля': 3, 'мая': 4, 'июня': 5,
+                    'июля': 6, 'августа': 7, 'сентября': 8, 'октября': 9, 'ноября': 10, 'декабря': 11};
+    const now = new Date();
+    const parse = (raw) => {
+        const text = (raw || '').toLowerCase().trim();
+        if (!text) return null;
+        if (text.includes('сегодня')) return new Date(now.getFullYear(), now.getMonth(), now.getDate());
+        if (text.includes('вчера')) return new Date(now.getFullYear(), now.getMonth(), now.getDate() - 1);
+        let m = text.match(/(\\d{1,2})\\.(\\d{1,2})\\.(\\d{4})/);
+        if (m) return new Date(+m[3], +m[2] - 1, +m[1]);
+        m = text.match(/(\\d{1,2})\\s+([а-яё]+)(?:\\s+(\\d{4}))?/);
+        if (m && m[2] in months) {
+            const d = new Date(m[3] ? +m[3] : now.getFullYear(), months[m[2]], +m[1]);
+            if (!m[3] && d > now) d.setFullYear(d.getFullYear() - 1);
+            return d;
+        }
+        const iso = Date.parse(text);
+        return isNaN(iso) ? null : new Date(iso);
+    };
+    let oldest = null;
+    document.querySelectorAll('time, [class*="date"]').forEach(el => {
+        const d = parse(el.getAttribute('datetime')) || parse(el.innerText || el.textContent);
+        if (d && (!oldest || d < oldest)) oldest = d;
+    });
+    return oldest ? oldest.toISOString() : null;
+}
+"""
+
+
+# JS-функция: метаданные товара с открытой страницы - название, цена, средний рейтинг и число
+# отзывов. Сначала schema.org Product из JSON-LD, затем og:title и микроразметка itemprop.
+# Страница открыта на отзывах, где h1 - заголовок вроде "Отзывы о товаре", поэтому h1 не используется
+PRODUCT_INFO_JS = """
+() => {
+    const number = (value) => {
+        if (value === null || value === undefined) return null;
+        const m = String(value).replace(/[\\s\\u00a0\\u2009]/g, '').replace(',', '.').match(/\\d+(\\.\\d+)?/);
+        return m ? parseFloat(m[0]) : null;
+    };
+    const products = [];
+    const collect = (node) => {
+        if (!node || typeof node !== 'object') return;
+        if (Array.isArray(node)) { node.forEach(collect); return; }
+        const type = node['@type'];
+        if (type === 'Product' || (Array.isArray(type) && type.includes('Product'))) products.push(node);
+        if (node['@graph']) collect(node['@graph']);
+    };
+    document.querySelectorAll('script[type="application/ld+json"]').forEach(script => {
+        try { collect(JSON.parse(script.textContent)); } catch (e) {}
+    });
+    const info = {};
+    const product = products[0];
+    if (product) {
+        info.name = product.name;
+        const offer = Array.isArray(product.offers) ? product.offers[0] : product.offers;
+        if (offer) info.price = number(offer.price ?? offer.lowPrice);
+        const aggregate = product.aggregateRating;
+        if (aggregate) {
+            info.rating = number(aggregate.ratingValue);
+            info.reviews_count = number(aggregate.reviewCount ?? aggregate.ratingCount);
+        }
+    }
+    const meta = (selector) => {
+        const el = document.querySelector(selector);
+        return el ? (el.getAttribute('content') || el.textContent) : null;
+    };
+    if (!info.name) info.name = meta('meta[property="og:title"]');
+    if (info.price == null) info.price = number(meta('[itemprop="price"], meta[property="product:price:amount"]'));
+    if (info.rating == null) info.rating = number(meta('[itemprop="ratingValue"]'));
+    if (info.reviews_count == null) info.reviews_count = number(meta('[itemprop="reviewCount"]'));
+    return info;
+}
+"""
+
+
+def clean_product_info(raw: Optional[Dict]) -> Dict:
+    """Проверка метаданных товара: только заполненные и правдоподобные поля"""
+    info = {}
+    if not raw:
+        return info
+    name = (raw.get("name") or "").strip()
+    # Заголовок страницы отзывов ("Отзывы о ...", "Отзывы покупателей") - не название товара
+    if name and len(name) <= 500 and not name.lower().startswith("отзыв"):
+        info["name"] = " ".join(name.split())
+    try:
+        if raw.get("price") is not None and float(raw["price"]) > 0:
+            info["price"] = float(raw["price"])
+        if raw.get("rating") is not None and 0 < float(raw["rating"]) <= 5:
+            info["rating"] = round(float(raw["rating"]), 2)
+        if raw.get("reviews_count") is not None and int(raw["reviews_count"]) >= 0:
+            info["reviews_count"] = int(raw["reviews_count"])
+    except (TypeError, ValueError):
+        pass
+    return info
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Приведение даты к наивному UTC (так даты хранятся в БД)"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 
 class BaseParser(ABC):
     """Базовый класс для всех парсеров"""
     
+    # Колбэк прогресса парсинга: вызывается с полями strategy, pages, reviews
+    progress_callback: Optional[Callable[..., None]] = None
+    # Событие отмены: установлено, если парсинг больше не нужен (другая стратегия уже справилась)
+    cancel_event: Optional[threading.Event] = None
+    
     def __init__(self):
-        self.ua = UserAgent()
-        self.scraper = cloudscraper.create_scraper(
-            browser={
-                'browser': 'chrome',
-                'platform': 'windows',
-                'desktop': True
-            }
-        )
+        # Метаданные товара, собранные попутно с отзывами (см. _capture_product)
+        self.product_info: Dict = {}
+        # Дошла ли прокрутка до отзывов старше since (см. _load_reviews и _browser_result)
+        self.since_reached = False
+        # Каталог User-Agent'ов и cloudscraper общие для процесса (см. sessions.py),
+        # User-Agent страниц - свой у каждого запуска парсера
+        self.ua = user_agents()
+        self.user_agent = self.ua.random
+        self.scraper = get_scraper()
         self.session = self.scraper
-        self._setup_session()
-    
-    def _setup_session(self):
-        """Настройка сессии с обходом блокировок"""
-        self.session.headers.update({
-            'User-Agent': self.ua.random,
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0',
-        })
+    
+    def _start_driver(self):
+        """Запуск Selenium через _init_driver; при записи/воспроизведении фикстур - через replay"""
+        self.driver = replay_driver()
+        if self.driver is None:
+            self._init_driver()
+            self.driver = wrap_driver(self.driver)
     
     def _random_delay(self, min_sec: float = 1.0, max_sec: float = 3.0):
         """Случайная задержка для имитации человеческого поведения"""
@@ -48,8 +156,12 @@ class BaseParser(ABC):
         """Получение страницы с повторными попытками"""
         for attempt in range(retries):
             try:
-                self._random_delay(1, 2)
-                response = self.session.get(url, timeout=30)
+                # Задержка только перед сетевым запросом: свежий ответ из кеша отдается сразу
+                response = http_cache.get(
+                    self.session, url, headers={'User-Agent': self.user_agent}, timeout=30,
+                    before_request=lambda: self._random_delay(1, 2),
+                    validate=html_page
+                )
                 response.raise_for_status()
                 return response.text
             except Exception as e:
@@ -59,13 +171,100 @@ class BaseParser(ABC):
                 time.sleep(2 ** attempt)  # Экспоненциальная задержка
         return None
     
+    def _report_progress(self, **progress):
+        """Сообщить о прогрессе парсинга (strategy, pages, reviews), если задан колбэк"""
+        if not self.progress_callback:
+            return
+        try:
+            self.progress_callback(**progress)
+        except Exception as e:
+            print(f"⚠️ Ошибка колбэка прогресса: {e}")
+    
+    def _report_product(self, info: Dict):
+        """Сообщить метаданные товара (name, price, rating, reviews_count) через progress(product=...)"""
+        info = clean_product_info(info)
+        if info:
+            self.product_info.update(info)
+            self._report_progress(product=info)
+    
+    def _capture_product(self, evaluate) -> Dict:
+        """
+        Метаданные товара с уже открытой страницы отзывов - без отдельного запуска браузера
+        
+        evaluate - scroll.playwright_evaluate(page) или scroll.selenium_evaluate(driver)
+        """
+        try:
+            self._report_product(evaluate(PRODUCT_INFO_JS))
+        except Exception as e:
+            print(f"⚠️ Не удалось получить данные товара со страницы: {e}")
+        return self.product_info
+    
+    def _cancelled(self) -> bool:
+        """Отменен ли парсинг (циклы прокрутки и постраничного обхода проверяют это на каждом шаге)"""
+        return bool(self.cancel_event and self.cancel_event.is_set())
+    
+    def _load_reviews(self, evaluate, marketplace: str, strategy: str, since: Optional[datetime] = None) -> ScrollResult:
+        """
+        Адаптивная подгрузка отзывов на открытой странице (см. scroll.py)
+        
+        evaluate - scroll.playwright_evaluate(page) или scroll.selenium_evaluate(driver)
+        """
+        reached_since = None
+        if since:
+            reached_since = lambda: self._reached_since(evaluate(OLDEST_REVIEW_DATE_JS), since)
+        result = load_reviews(
+            evaluate,
+            REVIEW_SELECTORS[marketplace],
+            reached_since=reached_since,
+            cancelled=self._cancelled,
+            on_step=lambda step, count: self._report_progress(strategy=strategy, pages=step)
+        )
+        self.since_reached = result.reason == "since"
+        return result
+    
+    def _reached_since(self, oldest_iso: Optional[str], since: Optional[datetime]) -> bool:
+        """Загружены ли уже отзывы старше границы инкрементального парсинга"""
+        if not since or not oldest_iso:
+            return False
+        try:
+            oldest = datetime.fromisoformat(oldest_iso.replace('Z', '+00:00'))
+        except ValueError:
+            return False
+        return to_naive_utc(oldest) < to_naive_utc(since)
+    
+    def _browser_result(self, reviews: Optional[List[Dict]], since: Optional[datetime]) -> Optional[List[Dict]]:
+        """
+        Итог браузерного парсинга: отзывы новее since или None, если отзывы не получены
+        
+        Пустой список означает "новых отзывов нет" и сдвигает границу инкрементального
+        парсинга, поэтому он возвращается, только если страница действительно дошла до
+        отзывов старше since. Пустая или заблокированная страница - None (NoResult),
+        чтобы сработал следующий способ и breaker учел неудачу.
+        """
+        if not reviews and not (since and self.since_reached):
+            return None
+        # Отзывы на странице есть, но все старше since - граница тоже достигнута
+        return self._filter_since(reviews or [], since)
+    
+    def _filter_since(self, reviews: List[Dict], since: Optional[datetime]) -> List[Dict]:
+        """
+        Отбрасывание отзывов не новее границы инкрементального парсинга
+        Отзывы без даты остаются: повторы отсекает уникальный хеш содержимого при сохранении
+        """
+        if not since:
+            return reviews
+        since = to_naive_utc(since)
+        return [r for r in reviews if r["date"] is None or to_naive_utc(r["date"]) >= since]
+    
     @abstractmethod
-    def parse_reviews(self, url: str) -> List[Dict]:
+    def parse_reviews(self, url: str, since: Optional[datetime] = None) -> List[Dict]:
         """
         Парсинг отзывов с маркетплейса
         
         Args:
             url: URL товара
+            since: если указана, нужны только отзывы новее этой даты -
+                обход страниц прекращается, как только встречаются более старые
             
         Returns:
             Список словарей с отзывами:
@@ -73,11 +272,29 @@ class BaseParser(ABC):
                 'author': str,
                 'rating': int,
                 'text': str,
-                'date': datetime
+                'date': Optional[datetime]  # None - дата на странице не найдена
             }, ...]
         """
         pass
     
+    def stream_reviews(self, method: str, url: str, since: Optional[datetime] = None) -> Iterator[List[Dict]]:
+        """
+        Отзывы пачками по мере обработки страниц
+        
+        Если у парсера есть потоковый вариант метода (parse_reviews_api -> iter_reviews_api),
+        пачки идут из него; иначе весь результат метода отдается одной пачкой.
+        Отсутствие результата (None или пустой список при полном парсинге) - NoResult.
+        """
+        stream = getattr(self, method.replace("parse_", "iter_", 1), None)
+        if stream is not None:
+            yield from stream(url, since=since)
+            return
+        reviews = getattr(self, method)(url, since=since)
+        if reviews is None or (not reviews and since is None):
+            raise NoResult(f"{type(self).__name__}.{method}: отзывы не получены")
+        if reviews:
+            yield reviews
+    
     @abstractmethod
     def get_product_name(self, url: str) -> Optional[str]:
         """Получение названия товара"""
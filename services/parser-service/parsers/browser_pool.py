@@ -0,0 +1,496 @@
+"""
+Пул процессов-воркеров для браузерного парсинга (Playwright, Selenium)
+Браузер запускается не в процессе сервиса, а в отдельном воркере; задачи и результаты
+(пачки отзывов, прогресс) передаются через очереди multiprocessing. Фоновый монитор
+следит за каждым воркером вместе со всеми его дочерними процессами (Chrome, chromedriver):
+при превышении RSS или времени задачи воркер убивается целиком (группа процессов),
+после BROWSER_WORKER_MAX_TASKS задач или простоя - перезапускается. Зависший браузер
+стоит одного воркера, а не памяти сервиса. Учет ресурсов - по /proc (Linux).
+BROWSER_POOL_WARM_WORKERS воркеров держатся запущенными заранее, каждый с прогретым Chromium
+(см. warm_browser.py), - браузерная стратегия стартует без холодного запуска браузера.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from datetime import datetime
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BROWSER_POOL_ENABLED = os.getenv("BROWSER_POOL_ENABLED", "true").lower() in ("1", "true", "yes")
+# Стратегии, которые выполняются в воркерах
+BROWSER_STRATEGIES = set(filter(None, os.getenv("BROWSER_STRATEGIES", "playwright,selenium").split(",")))
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+# Сколько воркеров держать запущенными заранее (с прогретым браузером), даже без задач
+BROWSER_POOL_WARM_WORKERS = int(os.getenv("BROWSER_POOL_WARM_WORKERS", "1"))
+# Потолок памяти воркера вместе с браузером (МБ)
+BROWSER_WORKER_MAX_RSS_MB = float(os.getenv("BROWSER_WORKER_MAX_RSS_MB", "1536"))
+# Предельное время одной задачи (секунды)
+BROWSER_TASK_TIMEOUT_SECONDS = float(os.getenv("BROWSER_TASK_TIMEOUT_SECONDS", "600"))
+# Предельное время вызова метода парсера через call() (название товара), если не задано явно
+BROWSER_CALL_TIMEOUT_SECONDS = float(os.getenv("BROWSER_CALL_TIMEOUT_SECONDS", "90"))
+# После скольких задач воркер перезапускается
+BROWSER_WORKER_MAX_TASKS = int(os.getenv("BROWSER_WORKER_MAX_TASKS", "20"))
+# Простаивающий дольше воркер останавливается (освобождает память)
+BROWSER_WORKER_IDLE_SECONDS = float(os.getenv("BROWSER_WORKER_IDLE_SECONDS", "300"))
+# Сколько ждать завершения отмененной задачи, прежде чем убить воркер
+BROWSER_CANCEL_GRACE_SECONDS = float(os.getenv("BROWSER_CANCEL_GRACE_SECONDS", "15"))
+BROWSER_POOL_SAMPLE_SECONDS = 1.0
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class BrowserWorkerError(Exception):
+    """Воркер упал, убит по бюджету или задача не выполнена"""
+
+
+# --- учет ресурсов по /proc ---
+
+def _read_stat(pid: int) -> Optional[List[str]]:
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # Имя процесса в скобках может содержать пробелы
+    return data[data.rindex(")") + 2:].split()
+
+
+def _process_tree(root_pid: int) -> List[int]:
+    """Процесс и все его потомки"""
+    children: Dict[int, List[int]] = {}
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return [root_pid]
+    for pid in pids:
+        fields = _read_stat(pid)
+        if fields:
+            children.setdefault(int(fields[1]), []).append(pid)
+    tree, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def _tree_usage(pids: List[int]) -> Dict[str, float]:
+    """RSS (МБ) и процессорное время (с) группы процессов"""
+    rss_pages = 0
+    ticks = 0
+    alive = 0
+    for pid in pids:
+        fields = _read_stat(pid)
+        if not fields:
+            continue
+        alive += 1
+        # utime, stime, cutime, cstime - поля 14-17, rss - поле 24 (счет с 1, после имени - с 3)
+        ticks += sum(int(v) for v in fields[11:15])
+        rss_pages += int(fields[21])
+    return {
+        "rss_mb": rss_pages * _PAGE_SIZE / 1024 / 1024,
+        "cpu_seconds": ticks / _CLOCK_TICKS,
+        "processes": alive,
+    }
+
+
+# --- процесс воркера ---
+
+def _close_parser(parser):
+    """Явное закрытие браузера парсера (не полагаясь на __del__)"""
+    driver = getattr(parser, "driver", None)
+    if driver:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+def _worker_main(tasks, results, cancel, warm: bool = False):
+    """Цикл воркера: задача -> сообщения progress/batch -> done"""
+    # Своя группа процессов: при убийстве воркера вместе с ним завершается браузер
+    os.setsid()
+    from parsers.registry import NoResult
+    from parsers import warm_browser
+    if warm:
+        warm_browser.start()
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            warm_browser.stop()
+            return
+        kind, task_id, module, class_name, method, args, kwargs = task
+        parser = None
+        try:
+            parser = getattr(importlib.import_module(module), class_name)()
+            parser.cancel_event = cancel
+            parser.progress_callback = lambda **progress: results.put(("progress", task_id, progress))
+            value = None
+            if kind == "stream":
+                for batch in parser.stream_reviews(method, *args, **kwargs):
+                    results.put(("batch", task_id, batch))
+                    if cancel.is_set():
+                        break
+            else:
+                value = getattr(parser, method)(*args, **kwargs)
+            results.put(("done", task_id, (None, False, value)))
+        except NoResult as e:
+            results.put(("done", task_id, (str(e), True, None)))
+        except Exception as e:
+            results.put(("done", task_id, (f"{type(e).__name__}: {e}", False, None)))
+        finally:
+            _close_parser(parser)
+
+
+# --- пул ---
+
+class _Worker:
+    def __init__(self, context, number: int, warm: bool = False):
+        self.number = number
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.cancel = context.Event()
+        self.process = context.Process(
+            target=_worker_main, args=(self.tasks, self.results, self.cancel, warm),
+            name=f"browser-worker-{number}", daemon=True
+        )
+        self.process.start()
+        self.started_at = time.monotonic()
+        self.state = "idle"  # idle, busy, retired
+        self.tasks_done = 0
+        self.task: Optional[str] = None
+        self.task_started: Optional[float] = None
+        self.idle_since = time.monotonic()
+        self.kill_reason: Optional[str] = None
+        self.usage = {"rss_mb": 0.0, "cpu_seconds": 0.0, "processes": 1}
+        self.peak_rss_mb = 0.0
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def alive(self) -> bool:
+        return self.kill_reason is None and self.process.is_alive()
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "worker": self.number,
+            "pid": self.pid,
+            "state": self.state,
+            "alive": self.alive(),
+            "tasks_done": self.tasks_done,
+            "task": self.task,
+            "task_seconds": round(now - self.task_started, 1) if self.task_started else None,
+            "uptime_seconds": round(now - self.started_at, 1),
+            "rss_mb": round(self.usage["rss_mb"], 1),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "cpu_seconds": round(self.usage["cpu_seconds"], 1),
+            "processes": self.usage["processes"],
+        }
+
+
+class BrowserPool:
+    """Пул воркеров: stream() - отзывы пачками, call() - вызов метода парсера (название товара)"""
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, enabled: bool = BROWSER_POOL_ENABLED,
+                 warm_workers: int = BROWSER_POOL_WARM_WORKERS):
+        self.size = max(1, size)
+        self.enabled = enabled
+        self.warm_workers = min(max(0, warm_workers), self.size)
+        # Прогретый Chromium нужен только Playwright-стратегиям
+        self.warm_browser = "playwright" in BROWSER_STRATEGIES
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._numbers = itertools.count(1)
+        self._task_ids = itertools.count(1)
+        self._available = threading.Condition()
+        self._monitor: Optional[threading.Thread] = None
+        self._closed = False
+        self.counters = {"spawned": 0, "recycled": 0, "idle_stopped": 0, "killed_rss": 0,
+                         "killed_timeout": 0, "killed_cancel": 0, "crashed": 0, "tasks": 0}
+
+    def handles(self, strategy: str) -> bool:
+        """Выполняется ли стратегия в воркерах пула"""
+        return self.enabled and strategy in BROWSER_STRATEGIES
+
+    # --- жизненный цикл воркеров ---
+
+    def _start_monitor(self):
+        if self._monitor is None:
+            self._monitor = threading.Thread(target=self._monitor_loop, name="browser-pool-monitor", daemon=True)
+            self._monitor.start()
+
+    def _spawn(self) -> _Worker:
+        """Новый воркер (вызывается под self._available)"""
+        worker = _Worker(self._context, next(self._numbers), warm=self.warm_browser)
+        self.counters["spawned"] += 1
+        logger.info(f"🧰 Запущен браузерный воркер #{worker.number} (pid {worker.pid})")
+        self._workers.append(worker)
+        return worker
+
+    def _ensure_warm(self):
+        """Дозапуск простаивающих воркеров до warm_workers (после перезапусков и падений)"""
+        with self._available:
+            if self._closed or not self.enabled:
+                return
+            self._workers = [w for w in self._workers if w.state != "retired"]
+            while len(self._workers) < self.size and \
+                    sum(1 for w in self._workers if w.state == "idle" and w.alive()) < self.warm_workers:
+                self._spawn()
+                self._available.notify()
+
+    def prewarm(self):
+        """Запуск заранее прогретых воркеров (при старте сервиса)"""
+        if self.enabled and self.warm_workers:
+            self._start_monitor()
+            self._ensure_warm()
+
+    def _acquire(self, cancel_event=None) -> _Worker:
+        with self._available:
+            if self._closed:
+                raise BrowserWorkerError("Пул браузерных воркеров остановлен")
+            self._start_monitor()
+            while True:
+                self._workers = [w for w in self._workers if w.state != "retired"]
+                for worker in self._workers:
+                    if worker.state == "idle" and worker.alive():
+                        worker.state = "busy"
+                        return worker
+                if len(self._workers) < self.size:
+                    worker = self._spawn()
+                    worker.state = "busy"
+                    return worker
+                if cancel_event is not None and cancel_event.is_set():
+                    raise BrowserWorkerError("Задача отменена до запуска")
+                self._available.wait(timeout=0.5)
+
+    def _release(self, worker: _Worker):
+        with self._available:
+            worker.task = worker.task_started = None
+            worker.idle_since = time.monotonic()
+            if not worker.alive():
+                if worker.kill_reason is None:
+                    self.counters["crashed"] += 1
+                self._retire(worker, stop=False)
+            elif worker.tasks_done >= BROWSER_WORKER_MAX_TASKS:
+                self.counters["recycled"] += 1
+                logger.info(f"♻️ Браузерный воркер #{worker.number} перезапускается после {worker.tasks_done} задач")
+                self._retire(worker)
+            else:
+                worker.state = "idle"
+            self._available.notify()
+
+    def _retire(self, worker: _Worker, stop: bool = True):
+        """Воркер больше не получает задач; stop - мягкая остановка (с добиванием в фоне)"""
+        worker.state = "retired"
+        if stop and worker.process.is_alive():
+            try:
+                worker.tasks.put(None)
+            except Exception:
+                pass
+            threading.Thread(target=self._join_or_kill, args=(worker,), daemon=True).start()
+
+    def _join_or_kill(self, worker: _Worker):
+        worker.process.join(timeout=10)
+        if worker.process.is_alive():
+            self._kill(worker, "stop")
+
+    def _kill(self, worker: _Worker, reason: str):
+        """Убийство воркера вместе со всеми дочерними процессами"""
+        if worker.kill_reason is None:
+            worker.kill_reason = reason
+        pids = _process_tree(worker.pid)
+        try:
+            os.killpg(worker.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        worker.process.join(timeout=5)
+
+    def _monitor_loop(self):
+        while not self._closed:
+            time.sleep(BROWSER_POOL_SAMPLE_SECONDS)
+            with self._available:
+                workers = list(self._workers)
+            now = time.monotonic()
+            for worker in workers:
+                if worker.state == "retired" or not worker.process.is_alive():
+                    continue
+                try:
+                    worker.usage = _tree_usage(_process_tree(worker.pid))
+                except Exception as e:
+                    logger.warning(f"⚠️ Не удалось получить ресурсы воркера #{worker.number}: {e}")
+                    continue
+                worker.peak_rss_mb = max(worker.peak_rss_mb, worker.usage["rss_mb"])
+                reason = None
+                if worker.usage["rss_mb"] > BROWSER_WORKER_MAX_RSS_MB:
+                    reason = "rss"
+                elif worker.task_started and now - worker.task_started > BROWSER_TASK_TIMEOUT_SECONDS:
+                    reason = "timeout"
+                if reason:
+                    logger.warning(
+                        f"💀 Браузерный воркер #{worker.number} убит ({reason}): "
+                        f"RSS {worker.usage['rss_mb']:.0f} МБ, задача {worker.task}"
+                    )
+                    self.counters[f"killed_{reason}"] += 1
+                    self._kill(worker, reason)
+                    continue
+                if worker.state == "idle" and now - worker.idle_since > BROWSER_WORKER_IDLE_SECONDS:
+                    with self._available:
+                        idle = sum(1 for w in self._workers if w.state == "idle" and w.alive())
+                        if worker.state == "idle" and idle > self.warm_workers:
+                            self.counters["idle_stopped"] += 1
+                            self._retire(worker)
+            self._ensure_warm()
+
+    # --- выполнение задач ---
+
+    def _messages(self, worker: _Worker, task_id: int, cancel_event=None,
+                  timeout: Optional[float] = None) -> Iterator[tuple]:
+        """
+        Сообщения задачи от воркера; отмена передается воркеру, смерть воркера - исключение
+        timeout - срок ожидания итога задачи (секунды), по истечении - BrowserWorkerError
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                raise BrowserWorkerError(f"Задача в воркере #{worker.number} не завершилась за {timeout:g} с")
+            if cancel_event is not None and cancel_event.is_set() and not worker.cancel.is_set():
+                worker.cancel.set()
+            try:
+                kind, message_task, payload = worker.results.get(timeout=0.5)
+            except queue.Empty:
+                if not worker.alive():
+                    reason = worker.kill_reason or f"код выхода {worker.process.exitcode}"
+                    raise BrowserWorkerError(f"Браузерный воркер #{worker.number} остановлен: {reason}")
+                continue
+            except (EOFError, OSError) as e:
+                raise BrowserWorkerError(f"Связь с воркером #{worker.number} потеряна: {e}")
+            if message_task == task_id:
+                yield kind, payload
+
+    def _submit(self, kind: str, parser_cls, method: str, args: tuple, kwargs: dict, label: str, cancel_event):
+        worker = self._acquire(cancel_event)
+        task_id = next(self._task_ids)
+        worker.cancel.clear()
+        worker.task = label
+        worker.task_started = time.monotonic()
+        worker.tasks_done += 1
+        self.counters["tasks"] += 1
+        worker.tasks.put((kind, task_id, parser_cls.__module__, parser_cls.__qualname__, method, args, kwargs))
+        return worker, task_id
+
+    def _finish(self, worker: _Worker, task_id: int, finished: bool,
+                grace: float = BROWSER_CANCEL_GRACE_SECONDS):
+        """Освобождение воркера; незавершенная задача отменяется, зависшая - вместе с воркером"""
+        if not finished and worker.alive():
+            worker.cancel.set()
+            deadline = time.monotonic() + grace
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        kind, message_task, _ = worker.results.get(timeout=0.5)
+                    except queue.Empty:
+                        if not worker.alive():
+                            break
+                        continue
+                    if message_task == task_id and kind == "done":
+                        finished = True
+                        break
+            except (EOFError, OSError):
+                pass
+            if not finished and worker.alive():
+                self.counters["killed_cancel"] += 1
+                self._kill(worker, "cancel")
+        self._release(worker)
+
+    def stream(self, parser_cls, method: str, url: str, since: Optional[datetime] = None,
+               progress=None, cancel_event=None) -> Iterator[List[Dict]]:
+        """Отзывы пачками от parser_cls.stream_reviews(method, url, since) в воркере"""
+        from .registry import NoResult
+
+        worker, task_id = self._submit(
+            "stream", parser_cls, method, (url,), {"since": since}, f"{parser_cls.__name__}.{method} {url}", cancel_event
+        )
+        finished = False
+        try:
+            for kind, payload in self._messages(worker, task_id, cancel_event):
+                if kind == "progress":
+                    if progress:
+                        progress(**payload)
+                elif kind == "batch":
+                    yield payload
+                elif kind == "done":
+                    finished = True
+                    error, no_result, _ = payload
+                    if error:
+                        raise NoResult(error) if no_result else BrowserWorkerError(error)
+                    return
+        finally:
+            self._finish(worker, task_id, finished)
+
+    def call(self, parser_cls, method: str, *args, timeout: Optional[float] = BROWSER_CALL_TIMEOUT_SECONDS) -> Any:
+        """
+        Вызов метода парсера в воркере (например, get_product_name)
+        Не уложившийся в timeout вызов - BrowserWorkerError; воркер убивается сразу:
+        такие методы не проверяют отмену, ждать их нет смысла
+        """
+        worker, task_id = self._submit("call", parser_cls, method, args, {}, f"{parser_cls.__name__}.{method}", None)
+        finished = False
+        try:
+            for kind, payload in self._messages(worker, task_id, timeout=timeout):
+                if kind == "done":
+                    finished = True
+                    error, _, value = payload
+                    if error:
+                        raise BrowserWorkerError(error)
+                    return value
+        finally:
+            self._finish(worker, task_id, finished, grace=0)
+
+    def stats(self) -> Dict:
+        with self._available:
+            workers = [w.snapshot() for w in self._workers if w.state != "retired"]
+            counters = dict(self.counters)
+        return {
+            "enabled": self.enabled,
+            "strategies": sorted(BROWSER_STRATEGIES),
+            "size": self.size,
+            "warm_workers": self.warm_workers,
+            "limits": {
+                "max_rss_mb": BROWSER_WORKER_MAX_RSS_MB,
+                "task_timeout_seconds": BROWSER_TASK_TIMEOUT_SECONDS,
+                "max_tasks": BROWSER_WORKER_MAX_TASKS,
+                "idle_seconds": BROWSER_WORKER_IDLE_SECONDS,
+            },
+            "workers": workers,
+            **counters,
+        }
+
+    def close(self):
+        """Остановка всех воркеров (при остановке сервиса)"""
+        with self._available:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers = []
+            self._available.notify_all()
+        for worker in workers:
+            if worker.process.is_alive():
+                self._kill(worker, "shutdown")
+
+
+browser_pool = BrowserPool()
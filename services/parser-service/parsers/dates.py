@@ -0,0 +1,152 @@
+"""
+Разбор дат отзывов для всех маркетплейсов
+Понимает ISO ("2024-11-26T10:00:00Z"), "26.11.2024", "2024-11-26", "26 ноября 2024",
+"26 ноября" (год - ближайший не в будущем), "сегодня", "вчера", "позавчера",
+"только что" и "3 дня назад" / "неделю назад" / "2 часа назад".
+
+Даты на странице сильно повторяются, поэтому результат разбора строки кешируется (LRU).
+В кеше хранится не готовая дата, а ее описание (абсолютная дата, день и месяц без года или
+смещение назад), а привязка к текущему времени делается при каждом вызове, так что
+"вчера" остается правильным и после полуночи.
+"""
+from typing import Optional, Tuple, Union
+from datetime import datetime, timedelta
+from functools import lru_cache
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+DATE_CACHE_SIZE = int(os.getenv("DATE_CACHE_SIZE", "4096"))
+
+MONTHS = {
+    'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
+    'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
+    'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
+}
+
+_ISO_PREFIX_RE = re.compile(r'^\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}')
+_DMY_RE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})')  # 26.11.2024
+_YMD_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')  # 2024-11-26
+_TEXT_RE = re.compile(r'(\d{1,2})\s+(' + '|'.join(MONTHS) + r')(?:\s+(\d{4}))?')  # 26 ноября [2024]
+_RELATIVE_RE = re.compile(
+    r'(?:(\d+)\s+)?(минут[уы]?|час(?:а|ов)?|день|дн(?:я|ей)|недел[юиь]|месяц(?:а|ев)?|год(?:а)?|лет)\s+назад'
+)
+
+# Смещения "N единиц назад"; для единиц от дня и крупнее время отбрасывается
+_UNITS = (
+    ('минут', timedelta(minutes=1), False),
+    ('час', timedelta(hours=1), False),
+    ('день', timedelta(days=1), True),
+    ('дн', timedelta(days=1), True),
+    ('недел', timedelta(weeks=1), True),
+    ('месяц', timedelta(days=30), True),
+    ('год', timedelta(days=365), True),
+    ('лет', timedelta(days=365), True),
+)
+
+_DAYS_AGO_WORDS = (('позавчера', 2), ('вчера', 1), ('сегодня', 0))
+
+# Описание даты: абсолютная дата, (месяц, день) без года или (смещение, до начала дня)
+DateSpec = Union[datetime, Tuple[int, int], Tuple[timedelta, bool]]
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_spec(text: str) -> Optional[DateSpec]:
+    """Разбор нормализованной строки (без привязки к текущему времени)"""
+    try:
+        if _ISO_PREFIX_RE.match(text):
+            return datetime.fromisoformat(text.upper().replace('Z', '+00:00'))
+
+        match = _DMY_RE.search(text)
+        if match:
+            day, month, year = match.groups()
+            return datetime(int(year), int(month), int(day))
+
+        match = _YMD_RE.search(text)
+        if match:
+            year, month, day = match.groups()
+            return datetime(int(year), int(month), int(day))
+
+        match = _TEXT_RE.search(text)
+        if match:
+            day, month_name, year = match.groups()
+            if year:
+                return datetime(int(year), MONTHS[month_name], int(day))
+            # Проверяем, что такой день вообще бывает (29 февраля - в високосном году)
+            datetime(2000, MONTHS[month_name], int(day))
+            return MONTHS[month_name], int(day)
+    except ValueError:
+        return None
+
+    for word, days in _DAYS_AGO_WORDS:
+        if word in text:
+            return timedelta(days=days), True
+    if 'только что' in text:
+        return timedelta(0), False
+
+    match = _RELATIVE_RE.search(text)
+    if match:
+        count = int(match.group(1) or 1)
+        unit = match.group(2)
+        for prefix, step, whole_days in _UNITS:
+            if unit.startswith(prefix):
+                return step * count, whole_days
+
+    logger.warning(f"⚠️ Не удалось распознать дату: {text!r}")
+    return None
+
+
+def parse_review_date(date_text: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Дата отзыва из текста или None, если формат не распознан
+
+    Args:
+        now: текущее время для относительных дат (по умолчанию datetime.now())
+    """
+    if not date_text:
+        return None
+    spec = _parse_spec(' '.join(date_text.lower().split()))
+    if spec is None or isinstance(spec, datetime):
+        return spec
+
+    now = now or datetime.now()
+    first, second = spec
+    if isinstance(first, int):
+        month, day = first, second
+        year = now.year
+        # 29 февраля без года - ближайший прошедший високосный год
+        while True:
+            try:
+                candidate = datetime(year, month, day)
+            except ValueError:
+                year -= 1
+                continue
+            if candidate <= now:
+                return candidate
+            year -= 1
+    offset, whole_days = first, second
+    moment = now - offset
+    if whole_days:
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment
+
+
+def review_date(*date_texts: Optional[str], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Дата отзыва из первого распознанного текста (текст элемента, затем атрибут datetime)
+
+    None - даты на странице нет. Время парсинга вместо нее не подставляется: дата входит
+    в хеш содержимого отзыва, и повторный парсинг давал бы новые хеши (см. review_content_hash)
+    """
+    for date_text in date_texts:
+        date = parse_review_date(date_text, now) if date_text else None
+        if date:
+            return date
+    return None
+
+
+def cache_info():
+    """Статистика LRU-кеша разбора дат (hits, misses, currsize)"""
+    return _parse_spec.cache_info()
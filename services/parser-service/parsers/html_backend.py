@@ -0,0 +1,266 @@
+"""
+DOM-бэкенды для разбора HTML страниц с отзывами
+lxml (по умолчанию) строит дерево на C и выбирает контейнеры одним скомпилированным
+XPath-выражением на все селекторы сразу (один проход по дереву); BeautifulSoup
+остается запасным вариантом.
+Бэкенд выбирается переменной HTML_PARSER_BACKEND (lxml или bs4).
+
+Оба бэкенда отдают узлы с одинаковым интерфейсом (text, find, find_all, text_lengths, get,
+parent, key, name, classes), поэтому код извлечения отзывов от бэкенда не зависит.
+Поддерживаемые селекторы: tag, .class, tag.class, [attr], [attr="v"], [attr*="v"], [attr^="v"]
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+from functools import lru_cache
+import os
+import re
+
+from bs4 import BeautifulSoup
+from bs4.element import CData, NavigableString, Tag
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    etree = None
+    lxml_html = None
+
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "lxml").lower()
+
+_SELECTOR_RE = re.compile(
+    r'^(?P<tag>[a-zA-Z][\w-]*|\*)?'
+    r'(?:\.(?P<cls>[\w-]+))?'
+    r'(?:\[(?P<attr>[\w-]+)(?:(?P<op>[*^]?=)"(?P<value>[^"]*)")?\])?$'
+)
+
+_UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_LOWER = "abcdefghijklmnopqrstuvwxyz"
+
+
+def _xpath_literal(value: str) -> str:
+    if '"' not in value:
+        return f'"{value}"'
+    return "concat(" + ", '\"', ".join(f'"{part}"' for part in value.split('"')) + ")"
+
+
+def css_to_predicate(selector: str) -> str:
+    """Перевод простого CSS-селектора в XPath-условие для текущего узла"""
+    match = _SELECTOR_RE.match(selector.strip())
+    if not match or not any(match.group(g) for g in ("tag", "cls", "attr")):
+        raise ValueError(f"Неподдерживаемый селектор: {selector}")
+    conditions = []
+    tag = match.group("tag")
+    if tag and tag != "*":
+        conditions.append(f"self::{tag}")
+    if match.group("cls"):
+        conditions.append(
+            f"contains(concat(' ', normalize-space(@class), ' '), {_xpath_literal(' ' + match.group('cls') + ' ')})"
+        )
+    attr = match.group("attr")
+    if attr:
+        op, value = match.group("op"), match.group("value")
+        if not op:
+            conditions.append(f"@{attr}")
+        elif op == "=":
+            conditions.append(f"@{attr}={_xpath_literal(value)}")
+        elif op == "*=":
+            conditions.append(f"contains(@{attr}, {_xpath_literal(value)})")
+        else:
+            conditions.append(f"starts-with(@{attr}, {_xpath_literal(value)})")
+    return " and ".join(conditions) or "true()"
+
+
+@lru_cache(maxsize=64)
+def _compiled_union(selectors: Tuple[str, ...]):
+    """
+    Один проход по дереву на все селекторы: //*[условие1 or условие2 ...]
+    Узлы в порядке документа и без повторов, без слияния множеств как у XPath-объединения "|"
+    """
+    return etree.XPath("//*[" + " or ".join(f"({css_to_predicate(s)})" for s in selectors) + "]")
+
+
+@lru_cache(maxsize=256)
+def _compiled_find(tags: Tuple[str, ...], class_contains: Tuple[str, ...]):
+    tag_test = " or ".join(f"self::{tag}" for tag in tags) if tags else "true()"
+    expr = f"descendant::*[{tag_test}]"
+    if class_contains:
+        lowered = f"translate(@class, '{_UPPER}', '{_LOWER}')"
+        expr += "[" + " or ".join(f"contains({lowered}, {_xpath_literal(s.lower())})" for s in class_contains) + "]"
+    return etree.XPath(expr)
+
+
+_SKIP_TEXT_TAGS = frozenset(("script", "style"))
+
+# Текст узла без содержимого script/style и комментариев (как get_text у BeautifulSoup)
+_TEXT_XPATH = etree.XPath(".//text()[not(parent::script) and not(parent::style)]") if etree is not None else None
+
+
+class LxmlNode:
+    __slots__ = ("element",)
+
+    def __init__(self, element):
+        self.element = element
+
+    def text(self, separator: str = " ", strip: bool = True) -> str:
+        strings = _TEXT_XPATH(self.element)
+        if strip:
+            return separator.join(s for s in (s.strip() for s in strings) if s)
+        return separator.join(strings)
+
+    def find(self, tags: Sequence[str], class_contains: Sequence[str] = ()) -> Optional["LxmlNode"]:
+        found = _compiled_find(tuple(tags), tuple(class_contains))(self.element)
+        return LxmlNode(found[0]) if found else None
+
+    def find_all(self, tags: Sequence[str], class_contains: Sequence[str] = ()) -> List["LxmlNode"]:
+        return [LxmlNode(el) for el in _compiled_find(tuple(tags), tuple(class_contains))(self.element)]
+
+    def get(self, attr: str, default: Optional[str] = None) -> Optional[str]:
+        return self.element.get(attr, default)
+
+    def parent(self) -> Optional["LxmlNode"]:
+        parent = self.element.getparent()
+        return LxmlNode(parent) if parent is not None else None
+
+    def text_lengths(self, tags: Sequence[str]) -> List[Tuple["LxmlNode", int]]:
+        """
+        Длины text(separator='') всех потомков с тегами из tags за один обход снизу вверх
+        (вместо отдельного text() на каждый вложенный элемент)
+        """
+        wanted = set(tags)
+        lengths = {}
+        result = []
+        # iter() отдает узлы в прямом порядке, обратный порядок - дети раньше родителей
+        for el in reversed(list(self.element.iter())):
+            if not isinstance(el.tag, str):
+                continue  # комментарии и инструкции не входят в текст
+            total = 0
+            if el.tag not in _SKIP_TEXT_TAGS:
+                total = len(el.text.strip()) if el.text else 0
+                for child in el:
+                    total += lengths.pop(child, 0)
+                    if child.tail:
+                        total += len(child.tail.strip())
+            lengths[el] = total
+            if el.tag in wanted and el is not self.element:
+                result.append((LxmlNode(el), total))
+        result.reverse()
+        return result
+
+    @property
+    def key(self):
+        return self.element
+
+    @property
+    def name(self) -> str:
+        return self.element.tag if isinstance(self.element.tag, str) else ""
+
+    @property
+    def classes(self) -> str:
+        return (self.element.get("class") or "").lower()
+
+
+# Строки, которые BeautifulSoup.get_text включает в текст (без комментариев и script/style)
+_TEXT_STRING_TYPES = (NavigableString, CData)
+
+
+@lru_cache(maxsize=256)
+def _class_regex(class_contains: Tuple[str, ...]):
+    """Фильтр class_ для BeautifulSoup: одна регулярка вместо lambda на каждый элемент"""
+    return re.compile("|".join(re.escape(s) for s in class_contains), re.IGNORECASE)
+
+
+class Bs4Node:
+    __slots__ = ("tag",)
+
+    def __init__(self, tag):
+        self.tag = tag
+
+    def text(self, separator: str = " ", strip: bool = True) -> str:
+        return self.tag.get_text(separator=separator, strip=strip)
+
+    @staticmethod
+    def _class_filter(class_contains: Sequence[str]):
+        return _class_regex(tuple(class_contains)) if class_contains else None
+
+    def find(self, tags: Sequence[str], class_contains: Sequence[str] = ()) -> Optional["Bs4Node"]:
+        kwargs = {"class_": self._class_filter(class_contains)} if class_contains else {}
+        found = self.tag.find(list(tags) or True, **kwargs)
+        return Bs4Node(found) if found else None
+
+    def find_all(self, tags: Sequence[str], class_contains: Sequence[str] = ()) -> List["Bs4Node"]:
+        kwargs = {"class_": self._class_filter(class_contains)} if class_contains else {}
+        return [Bs4Node(t) for t in self.tag.find_all(list(tags) or True, **kwargs)]
+
+    def get(self, attr: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.tag.get(attr, default)
+        return " ".join(value) if isinstance(value, list) else value
+
+    def parent(self) -> Optional["Bs4Node"]:
+        return Bs4Node(self.tag.parent) if self.tag.parent is not None else None
+
+    def text_lengths(self, tags: Sequence[str]) -> List[Tuple["Bs4Node", int]]:
+        """Длины text(separator='') потомков с тегами из tags за один обход снизу вверх"""
+        wanted = set(tags)
+        lengths = {}
+        result = []
+        for el in reversed(list(self.tag.descendants)):
+            if not isinstance(el, Tag):
+                continue
+            total = 0
+            if el.name not in _SKIP_TEXT_TAGS:
+                for child in el.contents:
+                    if isinstance(child, Tag):
+                        total += lengths.pop(id(child), 0)
+                    elif type(child) in _TEXT_STRING_TYPES:
+                        total += len(child.strip())
+            lengths[id(el)] = total
+            if el.name in wanted:
+                result.append((Bs4Node(el), total))
+        result.reverse()
+        return result
+
+    @property
+    def key(self):
+        # Tag.__hash__ сериализует поддерево, поэтому ключ - идентичность объекта
+        return id(self.tag)
+
+    @property
+    def name(self) -> str:
+        return self.tag.name or ""
+
+    @property
+    def classes(self) -> str:
+        return " ".join(self.tag.get("class", [])).lower()
+
+
+class LxmlDocument:
+    backend = "lxml"
+
+    def __init__(self, html: str):
+        self.root = lxml_html.fromstring(html) if html and html.strip() else lxml_html.fromstring("<html></html>")
+
+    def select(self, selectors: Iterable[str]) -> List[LxmlNode]:
+        return [LxmlNode(el) for el in _compiled_union(tuple(selectors))(self.root)]
+
+    def find_all(self, tags: Sequence[str], class_contains: Sequence[str] = ()) -> List[LxmlNode]:
+        return LxmlNode(self.root).find_all(tags, class_contains)
+
+
+class Bs4Document:
+    backend = "bs4"
+
+    def __init__(self, html: str):
+        self.soup = BeautifulSoup(html or "", "html.parser")
+
+    def select(self, selectors: Iterable[str]) -> List[Bs4Node]:
+        # Список селекторов через запятую - один проход soupsieve, узлы без повторов
+        return [Bs4Node(t) for t in self.soup.select(", ".join(selectors))]
+
+    def find_all(self, tags: Sequence[str], class_contains: Sequence[str] = ()) -> List[Bs4Node]:
+        return Bs4Node(self.soup).find_all(tags, class_contains)
+
+
+def parse_html(html: str, backend: Optional[str] = None):
+    """Разбор HTML выбранным бэкендом (без lxml - всегда BeautifulSoup)"""
+    backend = (backend or HTML_PARSER_BACKEND).lower()
+    if backend == "lxml" and lxml_html is not None:
+        return LxmlDocument(html)
+    return Bs4Document(html)
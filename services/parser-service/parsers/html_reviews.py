@@ -0,0 +1,248 @@
+"""
+Извлечение отзывов из HTML страницы
+Общая логика для парсеров Wildberries, Ozon и Яндекс.Маркета: контейнеры ищутся одним
+проходом по всем селекторам, из вложенных друг в друга остаются самые глубокие, в которых
+отзыв еще целый, из каждого достаются текст, автор, рейтинг и дата. Текст контейнера
+считается один раз.
+Работает поверх любого бэкенда из html_backend.
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+from datetime import datetime
+import re
+
+from .dates import parse_review_date
+
+_RATING_TEXT_RE = re.compile(r'(\d+)\s*(звезд|star|⭐)', re.IGNORECASE)
+
+
+def _clean_text(text: str, skip_words: Sequence[str]) -> str:
+    """Строки длиннее 15 символов без служебных слов"""
+    clean_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if len(line) > 15 and not any(skip in line.lower() for skip in skip_words):
+            clean_lines.append(line)
+    return ' '.join(clean_lines)
+
+
+# Короче этого контейнер не разбирается как отзыв
+MIN_CONTAINER_TEXT = 30
+
+
+def _is_list(children: List, lengths: Dict) -> bool:
+    """Есть ли среди совпавших детей повторяющиеся карточки с текстом длиной с отзыв"""
+    by_signature = {}
+    for child in children:
+        by_signature.setdefault((child.name, child.classes), []).append(child)
+    for group in by_signature.values():
+        if len(group) > 1 and sum(1 for c in group if lengths.get(c.key, 0) >= MIN_CONTAINER_TEXT) > 1:
+            return True
+    return False
+
+
+def _text_lengths(containers: List, parent_of: Dict) -> Dict:
+    """
+    Длины text(separator='') всех совпадений: по одному обходу text_lengths на каждое
+    верхнее совпадение вместо отдельного text() на каждый вложенный узел
+    """
+    matched = {c.key for c in containers}
+    names = {c.name for c in containers}
+    lengths = {}
+    for container in containers:
+        if parent_of[container.key] is not None:
+            continue
+        lengths[container.key] = len(container.text(separator=''))
+        for node, length in container.text_lengths(names):
+            if node.key in matched:
+                lengths[node.key] = length
+    return lengths
+
+
+def innermost(containers: List, keep_attrs: Sequence[str] = ()) -> List:
+    """
+    Непересекающиеся контейнеры отзывов - самые глубокие, в которых отзыв еще целый
+
+    Совпадение, внутри которого несколько совпадений с одинаковой сигнатурой (тег + классы)
+    и текстом длиной с отзыв, считается списком отзывов, как и совпадение со списком внутри:
+    такие отбрасываются, а разбираются совпадения внутри них. Обертка, весь текст которой
+    лежит в единственном вложенном совпадении, тоже пропускается - берется вложенное
+    (если у обертки нет атрибутов из keep_attrs, например рейтинга). Остальные совпадения
+    берутся целиком, а совпадения внутри них (feedback__text, feedback__date и т.п.) -
+    это части того же отзыва и отдельно не разбираются.
+
+    Ближайший совпавший предок находится подъемом по дереву с запоминанием пройденного
+    пути, поэтому каждый узел посещается не больше одного раза.
+    """
+    matched = {c.key: c for c in containers}
+    nearest = {}  # key узла -> key ближайшего совпавшего предка (None - нет такого)
+    parent_of = {}
+    for container in containers:
+        path = []
+        node = container.parent()
+        while node is not None and node.key not in matched and node.key not in nearest:
+            path.append(node.key)
+            node = node.parent()
+        if node is None:
+            found = None
+        elif node.key in matched:
+            found = node.key
+        else:
+            found = nearest[node.key]
+        for key in path:
+            nearest[key] = found
+        parent_of[container.key] = found
+
+    children = {}
+    for container in containers:
+        parent = parent_of[container.key]
+        if parent is not None:
+            children.setdefault(parent, []).append(container)
+    lengths = _text_lengths(containers, parent_of) if children else {}
+
+    # containers в порядке документа: обратный порядок - потомки раньше предков
+    multiple = {}  # key -> внутри несколько отзывов (список или список глубже)
+    for container in reversed(containers):
+        items = children.get(container.key, [])
+        multiple[container.key] = bool(items) and (
+            any(multiple[c.key] for c in items) or _is_list(items, lengths)
+        )
+
+    def passes_through(container) -> bool:
+        if multiple[container.key]:
+            return True
+        items = children.get(container.key, [])
+        return (
+            len(items) == 1
+            and lengths.get(items[0].key) == lengths.get(container.key)
+            and not any(container.get(attr) for attr in keep_attrs)
+        )
+
+    covered = {}
+    result = []
+    for container in containers:
+        parent = parent_of[container.key]
+        is_covered = parent is not None and (covered[parent] or not passes_through(matched[parent]))
+        covered[container.key] = is_covered
+        if not is_covered and not passes_through(container):
+            result.append(container)
+    return result
+
+
+def _longest_paragraph(container) -> str:
+    # Длины всех абзацев за один обход, текст собирается только у самого длинного
+    best, best_length = None, MIN_CONTAINER_TEXT
+    for p, length in container.text_lengths(['p', 'div', 'span']):
+        if length > best_length:
+            best, best_length = p, length
+    return best.text(separator='') if best is not None else ""
+
+
+def _author(container, author_classes: Sequence[str]) -> str:
+    author = "Аноним"
+    author_elem = container.find(['strong', 'b', 'span'], author_classes)
+    if not author_elem:
+        author_elem = container.find(['strong', 'b'])
+    if author_elem:
+        author = author_elem.text(separator='')
+        if len(author) > 50:  # Слишком длинное - не имя
+            author = "Аноним"
+    return author
+
+
+def _rating(container, rating_attr: Optional[str], full_text: str) -> int:
+    rating = 0
+    if rating_attr:
+        try:
+            rating = int(container.get(rating_attr) or 0)
+        except ValueError:
+            pass
+    if not rating:
+        stars = container.find_all(['span', 'div', 'i'], ['star'])
+        if stars:
+            rating = len([s for s in stars if 'fill' in s.classes or 'active' in s.classes])
+    if not rating:
+        rating_match = _RATING_TEXT_RE.search(full_text)
+        if rating_match:
+            rating = int(rating_match.group(1))
+    return rating
+
+
+def _date(container, parse_date: Callable[[str], Optional[datetime]]) -> Optional[datetime]:
+    date_elem = container.find(['time', 'span', 'div'], ['date'])
+    if not date_elem:
+        date_elem = container.find(['time'])
+    if date_elem:
+        # Текст элемента, а если он не распознан - атрибут datetime
+        for date_text in (date_elem.text(separator=''), date_elem.get('datetime')):
+            date = parse_date(date_text) if date_text else None
+            if date:
+                return date
+    return None
+
+
+def extract_reviews(
+    document,
+    selectors: Sequence[str],
+    parse_date: Callable[[str], Optional[datetime]] = parse_review_date,
+    skip_words: Sequence[str] = ('отзыв', 'оценка', 'рейтинг', 'cookie'),
+    author_classes: Sequence[str] = ('author', 'user'),
+    rating_attr: Optional[str] = None,
+    longest_paragraph: bool = False,
+    containers: Optional[List] = None
+) -> List[Dict]:
+    """
+    Отзывы из контейнеров, найденных по селекторам (или переданных в containers)
+
+    Из вложенных друг в друга контейнеров разбираются самые глубокие с целым отзывом (см. innermost).
+
+    Args:
+        document: документ из html_backend.parse_html
+        skip_words: строки с этими словами считаются служебными
+        author_classes: подстроки класса элемента с автором
+        parse_date: разбор даты из текста (None - не распознана, тогда и дата отзыва None)
+        rating_attr: атрибут контейнера с рейтингом (data-rating у Ozon)
+        longest_paragraph: текст отзыва - самый длинный абзац контейнера, а не весь текст
+    """
+    if containers is None:
+        containers = document.select(selectors)
+    containers = innermost(containers, keep_attrs=(rating_attr,) if rating_attr else ())
+    print(f"🔍 Найдено {len(containers)} потенциальных контейнеров отзывов")
+
+    reviews = []
+    seen_texts = set()
+    for container in containers:
+        try:
+            # Строки элементов через '\n': _clean_text отбрасывает служебные строки по одной,
+            # а при склейке пробелом весь отзыв становился одной строкой со словом "оценка"
+            full_text = container.text(separator='\n')
+            if longest_paragraph:
+                review_text = _longest_paragraph(container)
+                if not review_text or len(review_text) < 20:
+                    review_text = full_text
+            else:
+                if len(full_text) < MIN_CONTAINER_TEXT:
+                    continue
+                review_text = full_text
+
+            review_text = _clean_text(review_text, skip_words)
+            if len(review_text) < 20:
+                continue
+
+            # Проверяем дубликаты
+            text_hash = hash(review_text[:100])
+            if text_hash in seen_texts:
+                continue
+            seen_texts.add(text_hash)
+
+            reviews.append({
+                "author": _author(container, author_classes),
+                "rating": _rating(container, rating_attr, full_text),
+                "text": review_text,
+                "date": _date(container, parse_date)
+            })
+        except Exception as e:
+            print(f"⚠️ Ошибка парсинга контейнера: {e}")
+            continue
+
+    print(f"✅ Распарсено {len(reviews)} уникальных отзывов")
+    return reviews
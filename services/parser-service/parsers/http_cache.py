@@ -0,0 +1,327 @@
+"""
+Дисковый кеш HTTP-ответов маркетплейсов с условной перепроверкой
+Тело ответа хранится сжатым (gzip), рядом - метаданные (ETag, Last-Modified, время
+сохранения). Ключ - URL с параметрами запроса. Пока запись свежее TTL маркетплейса, запрос
+не отправляется вовсе; устаревшая запись перепроверяется с If-None-Match/If-Modified-Since,
+и при 304 тело берется из кеша. Кешируются только успешные GET-ответы без Cache-Control: no-store,
+которые принял валидатор вызывающего кода (validate): страница капчи или заглушка антибота
+тоже приходит с кодом 200 и иначе отдавалась бы из кеша весь TTL.
+"""
+from typing import Callable, Dict, Optional, Tuple
+from datetime import datetime
+from urllib.parse import urlencode, urlparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+HTTP_CACHE_DIR = os.getenv(
+    "HTTP_CACHE_DIR", os.path.join(os.getenv("PARSER_STATE_DIR", "/tmp/parser-state"), "http-cache")
+)
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "512"))
+# Запись считается свежей столько секунд; переопределяется HTTP_CACHE_TTL_<МАРКЕТПЛЕЙС>
+HTTP_CACHE_TTL_SECONDS = float(os.getenv("HTTP_CACHE_TTL_SECONDS", "300"))
+DEFAULT_TTLS = {"wildberries": 300, "ozon": 600, "yandex-market": 600}
+# Проверка размера кеша раз в столько записей
+_PRUNE_EVERY = 200
+
+# Признаки страницы капчи/антибота вместо запрошенного содержимого (в нижнем регистре)
+BLOCK_PAGE_MARKERS = (
+    "showcaptcha", "smartcaptcha", "checking your browser", "cf-chl-",
+    "доступ ограничен", "подозрительная активность", "вы не робот",
+)
+
+_HOST_MARKETPLACES = (
+    ("wildberries.ru", "wildberries"),
+    ("wb.ru", "wildberries"),
+    ("ozon.ru", "ozon"),
+    ("market.yandex.ru", "yandex-market"),
+)
+
+
+def marketplace_for_url(url: str) -> Optional[str]:
+    host = (urlparse(url).hostname or "").lower()
+    for suffix, marketplace in _HOST_MARKETPLACES:
+        if host == suffix or host.endswith("." + suffix):
+            return marketplace
+    return None
+
+
+def ttl_for(marketplace: Optional[str]) -> float:
+    """TTL маркетплейса: HTTP_CACHE_TTL_WILDBERRIES и т.п., иначе значение по умолчанию"""
+    if marketplace:
+        env_name = "HTTP_CACHE_TTL_" + marketplace.upper().replace("-", "_")
+        value = os.getenv(env_name)
+        if value:
+            return float(value)
+        if marketplace in DEFAULT_TTLS:
+            return float(DEFAULT_TTLS[marketplace])
+    return HTTP_CACHE_TTL_SECONDS
+
+
+def json_object(response) -> bool:
+    """Валидатор для API: тело - JSON-объект (не HTML-заглушка и не обрезанный ответ)"""
+    try:
+        return isinstance(json.loads(response.content), dict)
+    except (ValueError, TypeError):
+        return False
+
+
+def html_page(response) -> bool:
+    """Валидатор для HTML-страниц: непустая страница без признаков капчи/антибота"""
+    text = (response.text or "").lower()
+    return bool(text.strip()) and not any(marker in text for marker in BLOCK_PAGE_MARKERS)
+
+
+def cache_key(url: str, params: Optional[Dict] = None) -> str:
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    return hashlib.sha256(f"GET {url}?{query}".encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """Ответ из кеша с минимальным общим интерфейсом requests/httpx"""
+
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str], url: str,
+                 from_cache: bool = False, encoding: Optional[str] = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+        self.from_cache = from_cache
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        """В кеше только успешные ответы"""
+
+
+class HttpCache:
+    """Хранилище ответов и статистика попаданий"""
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR, enabled: bool = HTTP_CACHE_ENABLED):
+        self.directory = directory
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stores_since_prune = 0
+        self.stats_counters = {
+            "fresh_hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "errors": 0, "rejected": 0
+        }
+
+    # --- хранилище ---
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".json", base + ".gz"
+
+    def load(self, key: str) -> Optional[Dict]:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with gzip.open(body_path, "rb") as f:
+                meta["content"] = f.read()
+            return meta
+        except (OSError, ValueError, EOFError):
+            return None
+
+    def save(self, key: str, url: str, response_headers, content: bytes, encoding: Optional[str]):
+        if "no-store" in (response_headers.get("cache-control") or "").lower():
+            return
+        meta_path, body_path = self._paths(key)
+        meta = {
+            "url": url,
+            "stored_at": time.time(),
+            "etag": response_headers.get("etag"),
+            "last_modified": response_headers.get("last-modified"),
+            "content_type": response_headers.get("content-type"),
+            "encoding": encoding,
+        }
+        try:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            # Сначала тело, потом метаданные: без метаданных запись не читается
+            tmp_body = f"{body_path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_body, "wb", compresslevel=5) as f:
+                f.write(content)
+            os.replace(tmp_body, body_path)
+            tmp_meta = f"{meta_path}.{threading.get_ident()}.tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, meta_path)
+        except OSError as e:
+            self._count("errors")
+            logger.warning(f"⚠️ Не удалось сохранить ответ в кеш: {e}")
+            return
+        self._count("stores")
+        with self._lock:
+            self._stores_since_prune += 1
+            prune = self._stores_since_prune >= _PRUNE_EVERY
+            if prune:
+                self._stores_since_prune = 0
+        if prune:
+            self.prune()
+
+    def touch(self, key: str):
+        """Запись перепроверена (304) - снова свежая"""
+        meta_path, _ = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            meta["stored_at"] = time.time()
+            tmp_meta = f"{meta_path}.{threading.get_ident()}.tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, meta_path)
+        except (OSError, ValueError):
+            pass
+
+    def prune(self):
+        """Удаление самых старых записей, пока кеш больше HTTP_CACHE_MAX_MB"""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+        limit = HTTP_CACHE_MAX_MB * 1024 * 1024
+        if total <= limit:
+            return
+        files.sort()
+        removed = 0
+        for _, size, path in files:
+            if total <= limit * 0.9:
+                break
+            for victim in (path[:-3] + ".json", path):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        logger.info(f"🧹 Кеш HTTP: удалено {removed} старых записей")
+
+    # --- логика кеширования ---
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats_counters[name] += 1
+
+    def _prepare(self, url: str, params: Optional[Dict], headers: Optional[Dict], ttl: Optional[float]):
+        """(ключ, запись, свежая ли, заголовки запроса с условиями перепроверки)"""
+        key = cache_key(url, params)
+        entry = self.load(key)
+        request_headers = dict(headers or {})
+        if entry is None:
+            return key, None, False, request_headers
+        if ttl is None:
+            ttl = ttl_for(marketplace_for_url(url))
+        fresh = time.time() - entry["stored_at"] < ttl
+        if not fresh:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+        return key, entry, fresh, request_headers
+
+    def _from_entry(self, entry: Dict) -> CachedResponse:
+        headers = {k: v for k, v in (
+            ("content-type", entry.get("content_type")),
+            ("etag", entry.get("etag")),
+            ("last-modified", entry.get("last_modified")),
+        ) if v}
+        return CachedResponse(200, entry["content"], headers, entry["url"], from_cache=True,
+                              encoding=entry.get("encoding"))
+
+    def _handle(self, key: str, url: str, entry: Optional[Dict], response,
+                validate: Optional[Callable[[object], bool]] = None):
+        """
+        Разбор сетевого ответа: 304 - тело из кеша, 200 - сохранение, если validate принял ответ.
+        Остальные ответы возвращаются как есть, чтобы raise_for_status вызывающего
+        кода бросал привычные исключения requests/httpx
+        """
+        if response.status_code == 304 and entry is not None:
+            self.touch(key)
+            self._count("revalidated")
+            return self._from_entry(entry)
+        self._count("misses")
+        if response.status_code == 200:
+            if validate is not None and not validate(response):
+                self._count("rejected")
+                return response
+            self.save(key, url, response.headers, response.content, response.encoding)
+        return response
+
+    def get(self, session, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+            timeout: float = 30, ttl: Optional[float] = None,
+            before_request: Optional[Callable[[], None]] = None,
+            validate: Optional[Callable[[object], bool]] = None):
+        """
+        GET через requests-сессию с кешем (CachedResponse или requests.Response)
+
+        before_request вызывается только перед реальным сетевым запросом
+        (например, задержка между запросами к маркетплейсу).
+        validate(response) решает, можно ли сохранить ответ 200 (json_object, html_page);
+        отклоненный ответ возвращается вызывающему коду, но в кеш не попадает
+        """
+        if not self.enabled:
+            if before_request:
+                before_request()
+            return session.get(url, params=params, headers=headers, timeout=timeout)
+        key, entry, fresh, request_headers = self._prepare(url, params, headers, ttl)
+        if fresh:
+            self._count("fresh_hits")
+            return self._from_entry(entry)
+        if before_request:
+            before_request()
+        response = session.get(url, params=params, headers=request_headers, timeout=timeout)
+        return self._handle(key, url, entry, response, validate)
+
+    async def aget(self, client, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+                   timeout: float = 30, ttl: Optional[float] = None,
+                   validate: Optional[Callable[[object], bool]] = None):
+        """GET через httpx.AsyncClient с кешем (работа с диском - в пуле потоков; validate - как в get)"""
+        if not self.enabled:
+            return await client.get(url, params=params, headers=headers, timeout=timeout)
+        key, entry, fresh, request_headers = await asyncio.to_thread(self._prepare, url, params, headers, ttl)
+        if fresh:
+            self._count("fresh_hits")
+            return self._from_entry(entry)
+        response = await client.get(url, params=params, headers=request_headers, timeout=timeout)
+        return await asyncio.to_thread(self._handle, key, url, entry, response, validate)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+        requests_total = counters["fresh_hits"] + counters["revalidated"] + counters["misses"]
+        served = counters["fresh_hits"] + counters["revalidated"]
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory,
+            **counters,
+            "requests": requests_total,
+            # Доля запросов, тело которых не скачивалось заново (свежие + 304)
+            "hit_ratio": round(served / requests_total, 3) if requests_total else None,
+            "ttl_seconds": {m: ttl_for(m) for m in DEFAULT_TTLS},
+            "as_of": datetime.utcnow().isoformat(),
+        }
+
+
+http_cache = HttpCache()
@@ -2,15 +2,16 @@
 Улучшенный парсер для Ozon с обходом капч и блокировок
 """
 from typing import List, Dict, Optional
+from concurrent.futures import wait, FIRST_COMPLETED
 from datetime import datetime
 import re
 import json
+import os
 import time
 try:
     import requests
 except ImportError:
     requests = None
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -18,7 +19,69 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import undetected_chromedriver as uc
-from .base_parser import BaseParser
+from .html_backend import parse_html
+from .html_reviews import extract_reviews
+from .dates import review_date
+from .registry import register_parser
+from .sessions import get_session
+from .async_http import async_http
+from .http_cache import http_cache, json_object
+from .base_parser import BaseParser, to_naive_utc
+from .scroll import selenium_evaluate
+
+
+OZON_API_URL = "https://www.ozon.ru/api/composer-api.bx/page/json/v2"
+# Предел страниц API за один парсинг и сколько страниц запрашивается одновременно
+OZON_API_MAX_PAGES = int(os.getenv("OZON_API_MAX_PAGES", "50"))
+OZON_API_MAX_IN_FLIGHT = max(1, int(os.getenv("OZON_API_MAX_IN_FLIGHT", "4")))
+
+
+def _ozon_review(item: Dict) -> Optional[Dict]:
+    """Отзыв виджета в общем формате парсеров (None - без текста)"""
+    if not isinstance(item, dict):
+        return None
+    content = item.get('content') or {}
+    parts = [content.get(field) for field in ('positive', 'negative', 'comment')]
+    text = '\n'.join(part.strip() for part in parts if isinstance(part, str) and part.strip())
+    if len(text) < 10:
+        return None
+    author = item.get('author') or {}
+    name = ' '.join(filter(None, (author.get('firstName'), author.get('lastName')))) or 'Аноним'
+    published = item.get('publishedAt') or item.get('createdAt')
+    date = None
+    if isinstance(published, (int, float)):
+        date = datetime.utcfromtimestamp(published)
+    elif isinstance(published, str):
+        date = review_date(published)
+    try:
+        rating = int(content.get('score') or 0)
+    except (TypeError, ValueError):
+        rating = 0
+    return {"author": name, "rating": rating, "text": text, "date": date}
+
+
+def ozon_widget_reviews(data: Dict) -> Optional[List[Dict]]:
+    """
+    Отзывы из widgetStates ответа composer-api
+
+    widgetStates - словарь "имя виджета" -> JSON-строка состояния; отзывы лежат в списке
+    reviews виджетов с "review" в имени. None - таких виджетов в ответе нет.
+    """
+    found = None
+    for name, state in (data.get('widgetStates') or {}).items():
+        if 'review' not in name.lower():
+            continue
+        if isinstance(state, str):
+            try:
+                state = json.loads(state)
+            except ValueError:
+                continue
+        items = state.get('reviews') if isinstance(state, dict) else None
+        if not isinstance(items, list):
+            continue
+        found = found if found is not None else []
+        found.extend(review for review in map(_ozon_review, items) if review)
+    return found
 
 
 class OzonParser(BaseParser):
@@ -29,13 +92,11 @@ class OzonParser(BaseParser):
         self.driver = None
         self.session = None
         if requests:
-            self.session = requests.Session()
-            self.session.headers.update({
-                'User-Agent': self.ua.random,
+            self.session = get_session("ozon", headers={
                 'Accept': 'application/json, text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
                 'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
             })
-        self._init_driver()
+        self._start_driver()
     
     def _init_driver(self):
         """Инициализация браузера"""
@@ -120,7 +181,7 @@ class OzonParser(BaseParser):
             print(f"Ошибка получения названия Ozon: {e}")
             return None
     
-    def parse_reviews(self, url: str) -> List[Dict]:
+    def parse_reviews(self, url: str, since: Optional[datetime] = None) -> List[Dict]:
         """Парсинг отзывов с Ozon - сначала пробуем API, потом Selenium"""
         product_id = self._extract_product_id(url)
         if not product_id:
@@ -128,61 +189,113 @@ class OzonParser(BaseParser):
             return []
         
         # Пробуем через API отзывов
-        api_reviews = self._try_api_method(product_id)
-        if api_reviews and len(api_reviews) > 0:
+        api_reviews = self._try_api_method(product_id, since)
+        if api_reviews:
             print(f"✅ API метод вернул {len(api_reviews)} отзывов")
             return api_reviews
+        if api_reviews is not None and since:
+            print(f"✅ Новых отзывов с {since.isoformat()} нет")
+            return []
         
         # Если API не сработал, используем Selenium
         print("🔄 API не сработал, переключаюсь на Selenium...")
-        return self._parse_with_selenium(url, product_id)
+        return self._parse_with_selenium(url, product_id, since)
     
-    def _try_api_method(self, product_id: str) -> List[Dict]:
-        """Попытка получить отзывы через API"""
-        reviews = []
-        
-        if not self.session or not requests:
-            return reviews
+    def parse_reviews_browser(self, url: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Парсинг только через Selenium, без попытки API; None - отзывы не получены"""
+        product_id = self._extract_product_id(url)
+        if not product_id:
+            return None
+        return self._parse_with_selenium(url, product_id, since)
+    
+    async def _fetch_api_page(self, product_id: str, page: int) -> Optional[List[Dict]]:
+        """Одна страница отзывов composer-api (None - виджета отзывов в ответе нет)"""
+        params = {
+            'url': f'/product/{product_id}/',
+            'layoutContainer': 'webReviewList',
+            'page': page
+        }
+        headers = {
+            'Referer': f'https://www.ozon.ru/product/{product_id}/',
+            'Accept': 'application/json',
+        }
+        # Запрос идет через общий асинхронный клиент (HTTP/2, пул соединений) и кеш ответов
+        response = await http_cache.aget(
+            async_http.client, OZON_API_URL, params=params, headers=headers, timeout=10,
+            validate=json_object
+        )
+        response.raise_for_status()
+        return ozon_widget_reviews(response.json())
+    
+    def _try_api_method(self, product_id: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """
+        Попытка получить отзывы через API (None - API недоступен или не отдал виджет отзывов)
         
+        Страницы запрашиваются параллельно, не более OZON_API_MAX_IN_FLIGHT одновременно.
+        Обход заканчивается на первой пустой странице, на повторе уже полученной страницы
+        (API может игнорировать номер страницы) или на отзывах старше since.
+        """
+        since = to_naive_utc(since) if since else None
+        pages: Dict[int, List[Dict]] = {}
+        page_keys: Dict[int, frozenset] = {}
+        widget_found = False
+        next_page, last_page = 1, OZON_API_MAX_PAGES
+        in_flight = {}
         try:
-            # Пробуем получить отзывы через неофициальный API Ozon
-            api_url = "https://www.ozon.ru/api/composer-api.bx/page/json/v2"
-            
-            # Параметры для запроса отзывов
-            params = {
-                'url': f'/product/{product_id}/',
-                'layoutContainer': 'webReviewList',
-                'page': 1
-            }
-            
-            headers = {
-                'Referer': f'https://www.ozon.ru/product/{product_id}/',
-                'Accept': 'application/json',
-            }
-            
-            response = self.session.get(api_url, params=params, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    # Парсим структуру ответа Ozon (может отличаться)
-                    if 'widgetStates' in data:
-                        # Пробуем найти отзывы в структуре
-                        for widget in data.get('widgetStates', []):
-                            if 'review' in str(widget).lower() or 'feedback' in str(widget).lower():
-                                # Парсим отзывы из виджета
-                                pass
-                except json.JSONDecodeError:
-                    pass
+            while True:
+                while len(in_flight) < OZON_API_MAX_IN_FLIGHT and next_page <= last_page:
+                    in_flight[async_http.submit(self._fetch_api_page(product_id, next_page))] = next_page
+                    next_page += 1
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = in_flight.pop(future)
+                    reviews = future.result()
+                    if reviews is not None:
+                        widget_found = True
+                    if not reviews:
+                        last_page = min(last_page, page - 1)
+                        continue
+                    # Страницы приходят в любом порядке: повтором считается та, что с большим номером
+                    keys = frozenset((r["author"], r["text"]) for r in reviews)
+                    for other, other_keys in page_keys.items():
+                        if other_keys == keys:
+                            last_page = min(last_page, max(page, other) - 1)
+                    page_keys[page] = keys
+                    if since:
+                        newer = [r for r in reviews if r["date"] is None or to_naive_utc(r["date"]) >= since]
+                        if len(newer) < len(reviews):
+                            last_page = min(last_page, page)
+                        reviews = newer
+                    pages[page] = reviews
+                    self._report_progress(strategy="api", pages=len(pages), reviews=sum(map(len, pages.values())))
         except Exception as e:
             print(f"⚠️ API метод не сработал: {e}")
+            return None
+        finally:
+            for future in in_flight:
+                future.cancel()
         
-        return reviews
+        if not widget_found:
+            return None
+        result = []
+        seen = set()
+        for page in sorted(pages):
+            if page > last_page:
+                break
+            for review in pages[page]:
+                key = (review["author"], review["text"])
+                if key not in seen:
+                    seen.add(key)
+                    result.append(review)
+        return result
     
-    def _parse_with_selenium(self, url: str, product_id: str) -> List[Dict]:
-        """Парсинг через Selenium"""
+    def _parse_with_selenium(self, url: str, product_id: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Парсинг через Selenium; None - браузер не запустился или отзывы не получены"""
         if not self.driver:
-            return []
+            return None
         
         reviews = []
         
@@ -263,54 +376,18 @@ class OzonParser(BaseParser):
                         print(f"⚠️ Ошибка при переходе на {review_url}: {e}")
                         continue
             
+            # Название, цена и рейтинг - с той же страницы, без отдельного запуска браузера
+            self._capture_product(selenium_evaluate(self.driver))
+            
             # Прокручиваем страницу для загрузки отзывов
             print("📜 Прокручиваю страницу для загрузки отзывов...")
-            last_review_count = 0
-            no_change_iterations = 0
-            
-            for i in range(20):
-                # Прокручиваем вниз
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
-                
-                # Ждем загрузки
-                time.sleep(1)
-                
-                # Проверяем количество отзывов через JS
-                current_count = self.driver.execute_script("""
-                    return document.querySelectorAll('[data-widget="webReview"], [class*="review"], [data-review-id]').length;
-                """)
-                
-                if current_count > last_review_count:
-                    last_review_count = current_count
-                    no_change_iterations = 0
-                    print(f"📊 Найдено элементов отзывов: {current_count}")
-                else:
-                    no_change_iterations += 1
-                
-                # Ищем кнопки "Показать еще"
-                try:
-                    buttons = self.driver.find_elements(By.TAG_NAME, "button")
-                    for btn in buttons:
-                        try:
-                            if not btn.is_displayed():
-                                continue
-                            btn_text = btn.text.lower()
-                            if any(word in btn_text for word in ["показать", "загрузить", "еще", "more", "ещё", "показать еще"]):
-                                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", btn)
-                                time.sleep(0.5)
-                                self.driver.execute_script("arguments[0].click();", btn)
-                                print(f"✅ Кликнул: {btn.text}")
-                                time.sleep(4)
-                                no_change_iterations = 0
-                        except:
-                            continue
-                except:
-                    pass
-                
-                if no_change_iterations >= 5:
-                    print("✅ Загрузка завершена")
-                    break
+            loaded = self._load_reviews(selenium_evaluate(self.driver), "ozon", "selenium", since)
+            if loaded.reason == "cancelled":
+                print("⏹️ Парсинг отменен")
+            elif loaded.reason == "since":
+                print("✅ Дошли до уже загруженных отзывов")
+            else:
+                print(f"✅ Загрузка завершена: {loaded.count} элементов отзывов")
             
             # Пробуем извлечь отзывы через JavaScript
             print("🔍 Пробую извлечь отзывы через JavaScript...")
@@ -321,15 +398,17 @@ class OzonParser(BaseParser):
             else:
                 # Парсим отзывы из HTML
                 print("🔍 Парсю отзывы из HTML...")
-                soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-                reviews = self._parse_from_html(soup)
+                document = parse_html(self.driver.page_source)
+                reviews = self._parse_from_html(document)
             
-            print(f"✅ Итого найдено отзывов: {len(reviews)}")
+            reviews = self._browser_result(reviews, since)
+            print(f"✅ Итого найдено отзывов: {len(reviews or [])}")
             
         except Exception as e:
             print(f"❌ Ошибка парсинга отзывов Ozon: {e}")
             import traceback
             print(traceback.format_exc())
+            return None
         
         return reviews
     
@@ -428,7 +507,7 @@ class OzonParser(BaseParser):
                                 author: author,
                                 rating: rating,
                                 text: cleanText,
-                                date: dateText || new Date().toISOString()
+                                date: dateText
                             });
                         }
                     } catch(e) {
@@ -444,9 +523,7 @@ class OzonParser(BaseParser):
             if result:
                 for item in result:
                     try:
-                        date = datetime.now()
-                        if item.get('date'):
-                            date = self._parse_date(item['date'])
+                        date = review_date(item.get('date'))
                         
                         reviews.append({
                             "author": item.get('author', 'Аноним'),
@@ -461,153 +538,20 @@ class OzonParser(BaseParser):
         
         return reviews
     
-    def _parse_from_html(self, soup: BeautifulSoup) -> List[Dict]:
+    def _parse_from_html(self, document) -> List[Dict]:
         """Парсинг отзывов из HTML"""
-        reviews = []
-        seen_texts = set()
-        
-        # Селекторы для Ozon
-        review_selectors = [
-            '[data-widget="webReview"]',
-            '[class*="review"]',
-            '[data-review-id]',
-            '[class*="ozon-review"]',
-            'article[class*="review"]'
-        ]
-        
-        review_containers = []
-        for selector in review_selectors:
-            try:
-                elements = soup.select(selector)
-                review_containers.extend(elements)
-            except:
-                continue
-        
-        print(f"🔍 Найдено {len(review_containers)} потенциальных контейнеров отзывов")
-        
-        for container in review_containers:
-            try:
-                text = container.get_text(separator=' ', strip=True)
-                
-                if len(text) < 30:
-                    continue
-                
-                # Очищаем текст
-                lines = text.split('\n')
-                clean_lines = []
-                for line in lines:
-                    line = line.strip()
-                    if len(line) > 15 and not any(skip in line.lower() for skip in ['отзыв', 'оценка', 'рейтинг', 'cookie']):
-                        clean_lines.append(line)
-                
-                review_text = ' '.join(clean_lines)
-                
-                if len(review_text) < 20:
-                    continue
-                
-                # Проверяем дубликаты
-                text_hash = hash(review_text[:100])
-                if text_hash in seen_texts:
-                    continue
-                seen_texts.add(text_hash)
-                
-                # Автор
-                author = "Аноним"
-                author_elem = container.find(['strong', 'b', 'span'], class_=lambda x: x and ('author' in str(x).lower() or 'user' in str(x).lower() or 'name' in str(x).lower()))
-                if not author_elem:
-                    author_elem = container.find(['strong', 'b'])
-                if author_elem:
-                    author = author_elem.get_text(strip=True)
-                    if len(author) > 50:
-                        author = "Аноним"
-                
-                # Рейтинг
-                rating = 0
-                # Ищем data-rating атрибут
-                rating_attr = container.get('data-rating')
-                if rating_attr:
-                    try:
-                        rating = int(rating_attr)
-                    except:
-                        pass
-                
-                # Ищем звезды
-                if not rating:
-                    stars = container.find_all(['span', 'div', 'i'], class_=lambda x: x and 'star' in str(x).lower())
-                    if stars:
-                        filled = [s for s in stars if 'fill' in str(s.get('class', [])).lower() or 'active' in str(s.get('class', [])).lower()]
-                        rating = len(filled)
-                
-                # Ищем число рейтинга в тексте
-                if not rating:
-                    rating_match = re.search(r'(\d+)\s*(звезд|star|⭐)', container.get_text(), re.IGNORECASE)
-                    if rating_match:
-                        rating = int(rating_match.group(1))
-                
-                # Дата
-                date = datetime.now()
-                date_elem = container.find(['time', 'span', 'div'], class_=lambda x: x and 'date' in str(x).lower())
-                if not date_elem:
-                    date_elem = container.find('time')
-                if date_elem:
-                    date_text = date_elem.get_text(strip=True) or date_elem.get('datetime', '')
-                    if date_text:
-                        date = self._parse_date(date_text)
-                
-                reviews.append({
-                    "author": author,
-                    "rating": rating,
-                    "text": review_text,
-                    "date": date
-                })
-                
-            except Exception as e:
-                print(f"⚠️ Ошибка парсинга контейнера: {e}")
-                continue
-        
-        print(f"✅ Распарсено {len(reviews)} уникальных отзывов")
-        return reviews
-    
-    def _parse_date(self, date_text: str) -> datetime:
-        """Парсинг даты"""
-        try:
-            # Форматы: "26 ноября 2024", "26.11.2024", "2024-11-26", ISO format
-            patterns = [
-                r'(\d{1,2})\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\s+(\d{4})',
-                r'(\d{1,2})\.(\d{1,2})\.(\d{4})',
-                r'(\d{4})-(\d{2})-(\d{2})',
-            ]
-            
-            months = {
-                'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
-                'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
-                'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
-            }
-            
-            for pattern in patterns:
-                match = re.search(pattern, date_text.lower())
-                if match:
-                    if len(match.groups()) == 3:
-                        if match.group(2) in months:
-                            day, month_name, year = match.groups()
-                            month = months[month_name]
-                            return datetime(int(year), month, int(day))
-                        else:
-                            parts = list(match.groups())
-                            if len(parts[0]) == 4:  # YYYY-MM-DD
-                                return datetime(int(parts[0]), int(parts[1]), int(parts[2]))
-                            else:  # DD.MM.YYYY
-                                return datetime(int(parts[2]), int(parts[1]), int(parts[0]))
-            
-            # Пробуем ISO формат
-            try:
-                return datetime.fromisoformat(date_text.replace('Z', '+00:00'))
-            except:
-                pass
-        except:
-            pass
-        
-        return datetime.now()
+        return extract_reviews(
+            document,
+            [
+                '[data-widget="webReview"]',
+                '[class*="review"]',
+                '[data-review-id]',
+                '[class*="ozon-review"]',
+                'article[class*="review"]'
+            ],
+            author_classes=['author', 'user', 'name'],
+            rating_attr='data-rating'
+        )
     
     def __del__(self):
         if self.driver:
@@ -616,3 +560,5 @@ class OzonParser(BaseParser):
             except:
                 pass
 
+
+register_parser("ozon", "selenium", OzonParser, "parse_reviews_browser", hedge=False, name_order=1)
@@ -0,0 +1,136 @@
+"""
+Реестр парсеров маркетплейсов с ленивой загрузкой
+Модули парсеров тянут за собой Selenium, undetected_chromedriver, Playwright, cloudscraper
+и fake_useragent, поэтому импортируются только при первом обращении к маркетплейсу.
+Здесь перечислены только имена модулей; при импорте каждый модуль сам регистрирует свои
+парсеры через register_parser.
+"""
+from typing import Dict, List, Optional
+import importlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Модули с парсерами каждого маркетплейса
+MARKETPLACE_MODULES: Dict[str, List[str]] = {
+    "wildberries": ["parsers.simple_parsers", "parsers.wildberries_parser"],
+    "ozon": ["parsers.simple_parsers", "parsers.ozon_parser"],
+    "yandex-market": ["parsers.simple_parsers", "parsers.yandex_market_parser"],
+}
+
+# Порядок стратегий по умолчанию: быстрые и дешевые раньше
+STRATEGY_ORDER = {"api": 0, "playwright": 10, "selenium": 20}
+
+
+class NoResult(Exception):
+    """Стратегия не дала результата (API не ответил, на странице нет отзывов и т.п.)"""
+
+
+class ParserEntry:
+    """Зарегистрированный способ получения отзывов (стратегия) маркетплейса"""
+
+    def __init__(self, marketplace: str, strategy: str, parser_cls, method: str, hedge: bool,
+                 order: int, name_order: Optional[int]):
+        self.marketplace = marketplace
+        self.strategy = strategy
+        self.parser_cls = parser_cls
+        self.method = method
+        self.hedge = hedge
+        self.order = order
+        self.name_order = name_order
+
+    def __repr__(self):
+        return f"ParserEntry({self.marketplace}/{self.strategy}: {self.parser_cls.__name__}.{self.method})"
+
+
+_lock = threading.RLock()
+_entries: Dict[str, List[ParserEntry]] = {}
+_loaded_modules: Dict[str, bool] = {}  # модуль -> импортировался ли успешно
+_loaded_marketplaces = set()
+
+
+def register_parser(
+    marketplace: str,
+    strategy: str,
+    parser_cls,
+    method: str = "parse_reviews",
+    hedge: bool = True,
+    order: Optional[int] = None,
+    name_order: Optional[int] = None
+):
+    """
+    Регистрация парсера маркетплейса (вызывается модулем парсера при импорте)
+
+    Args:
+        strategy: имя стратегии (api, playwright, selenium) - ключ circuit breaker'а
+        method: метод парсера, возвращающий отзывы
+        hedge: можно ли запускать стратегию параллельно с предыдущей
+        order: место в порядке запуска (по умолчанию из STRATEGY_ORDER)
+        name_order: место среди парсеров для получения названия товара (None - не используется)
+    """
+    if order is None:
+        order = STRATEGY_ORDER.get(strategy, 100)
+    with _lock:
+        entries = _entries.setdefault(marketplace, [])
+        entries[:] = [e for e in entries if e.strategy != strategy]
+        entries.append(ParserEntry(marketplace, strategy, parser_cls, method, hedge, order, name_order))
+        entries.sort(key=lambda e: e.order)
+
+
+def _import_module(module_name: str) -> bool:
+    if module_name not in _loaded_modules:
+        try:
+            importlib.import_module(module_name)
+            _loaded_modules[module_name] = True
+        except Exception as e:
+            # Нет браузера или библиотеки - маркетплейс работает на оставшихся стратегиях
+            logger.warning(f"⚠️ Модуль парсеров {module_name} не загружен: {e}")
+            _loaded_modules[module_name] = False
+    return _loaded_modules[module_name]
+
+
+def is_supported(marketplace: str) -> bool:
+    return marketplace in MARKETPLACE_MODULES
+
+
+def load_marketplace(marketplace: str):
+    """Импорт модулей парсеров маркетплейса (один раз за время жизни процесса)"""
+    if marketplace in _loaded_marketplaces:
+        return
+    with _lock:
+        if marketplace in _loaded_marketplaces:
+            return
+        for module_name in MARKETPLACE_MODULES.get(marketplace, []):
+            _import_module(module_name)
+        _loaded_marketplaces.add(marketplace)
+        logger.info(f"🧩 Парсеры {marketplace}: {[e.strategy for e in _entries.get(marketplace, [])]}")
+
+
+def load_all():
+    for marketplace in MARKETPLACE_MODULES:
+        load_marketplace(marketplace)
+
+
+def parsers_for(marketplace: str) -> List[ParserEntry]:
+    """Стратегии маркетплейса в порядке запуска (модули загружаются при первом вызове)"""
+    load_marketplace(marketplace)
+    with _lock:
+        return list(_entries.get(marketplace, []))
+
+
+def name_entries(marketplace: str) -> List[ParserEntry]:
+    """Стратегии, парсеры которых получают название товара, в порядке попыток"""
+    entries = [e for e in parsers_for(marketplace) if e.name_order is not None]
+    return sorted(entries, key=lambda e: e.name_order)
+
+
+def name_parsers(marketplace: str) -> List:
+    """Классы парсеров для получения названия товара в порядке попыток"""
+    return [e.parser_cls for e in name_entries(marketplace)]
+
+
+def loaded_marketplaces() -> List[str]:
+    """Маркетплейсы, парсеры которых уже загружены"""
+    with _lock:
+        return [m for m in MARKETPLACE_MODULES if m in _loaded_marketplaces]
@@ -0,0 +1,421 @@
+"""
+Запись и воспроизведение ответов маркетплейсов для офлайн-бенчмарков и регрессионных проверок
+В режиме записи реальные ответы сохраняются в архив фикстур (zip), в режиме воспроизведения
+парсеры получают их из архива без обращения к сети. Перехватываются:
+  - requests.Session.send (общие сессии и cloudscraper),
+  - httpx.AsyncClient.send (API-стратегии),
+  - запросы страниц Playwright (page.route, см. attach_page),
+  - Selenium на уровне драйвера: page_source, title и результаты execute_script
+    (браузер Selenium не дает перехватывать сетевые ответы без прокси).
+Одинаковые запросы воспроизводятся в порядке записи, после конца последовательности
+повторяется последний ответ. Запрос без фикстуры ведет себя как сетевая ошибка.
+"""
+from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import hashlib
+import json
+import logging
+import os
+import threading
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+PARSER_REPLAY_MODE = os.getenv("PARSER_REPLAY_MODE", "off")  # off, record, replay
+PARSER_REPLAY_ARCHIVE = os.getenv("PARSER_REPLAY_ARCHIVE", "")
+
+ARCHIVE_VERSION = 1
+# Заголовки, которые теряют смысл после распаковки тела
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def request_key(method: str, url: str, body: Optional[bytes] = None) -> str:
+    """Ключ запроса: метод, URL с упорядоченными параметрами и хеш тела"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    key = f"{method.upper()} {urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))}"
+    if body:
+        key += " #" + hashlib.sha1(body).hexdigest()[:12]
+    return key
+
+
+def _clean_headers(headers) -> Dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS}
+
+
+class FixtureArchive:
+    """
+    Архив фикстур: index.json (ключ -> список ответов) и тела ответов в bodies/
+
+    Записи HTTP: {"status", "headers", "body"}; записи драйвера Selenium: {"value"}.
+    """
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta: Dict[str, Any] = meta or {}
+        self.entries: Dict[str, List[Dict]] = {}
+        self.bodies: Dict[str, bytes] = {}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "replayed": 0, "missed": 0}
+
+    @classmethod
+    def load(cls, path: str) -> "FixtureArchive":
+        with zipfile.ZipFile(path) as zf:
+            index = json.loads(zf.read("index.json"))
+            archive = cls(index.get("meta"))
+            archive.entries = index["entries"]
+            for name in zf.namelist():
+                if name.startswith("bodies/"):
+                    archive.bodies[name[len("bodies/"):]] = zf.read(name)
+        return archive
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with self._lock, zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            index = {"version": ARCHIVE_VERSION, "meta": self.meta, "entries": self.entries}
+            zf.writestr("index.json", json.dumps(index, ensure_ascii=False, indent=1))
+            for name, body in self.bodies.items():
+                zf.writestr("bodies/" + name, body)
+        os.replace(tmp_path, path)
+
+    def add_response(self, key: str, status: int, headers: Dict[str, str], body: bytes):
+        name = hashlib.sha1(body).hexdigest()  # одинаковые тела хранятся один раз
+        with self._lock:
+            self.bodies[name] = body
+            self.entries.setdefault(key, []).append({"status": status, "headers": headers, "body": name})
+            self.stats["recorded"] += 1
+
+    def add_value(self, key: str, value: Any):
+        with self._lock:
+            self.entries.setdefault(key, []).append({"value": value})
+            self.stats["recorded"] += 1
+
+    def next(self, key: str) -> Optional[Dict]:
+        """Следующая запись для ключа (последняя повторяется) или None"""
+        with self._lock:
+            records = self.entries.get(key)
+            if not records:
+                self.stats["missed"] += 1
+                return None
+            position = self._cursors.get(key, 0)
+            self._cursors[key] = position + 1
+            self.stats["replayed"] += 1
+            return records[min(position, len(records) - 1)]
+
+    def body(self, record: Dict) -> bytes:
+        return self.bodies[record["body"]]
+
+    def rewind(self):
+        """Воспроизведение с начала (перед очередным прогоном бенчмарка)"""
+        with self._lock:
+            self._cursors.clear()
+
+
+# --- активный режим ---
+
+_state_lock = threading.Lock()
+_mode = "off"
+_archive: Optional[FixtureArchive] = None
+_originals: Dict[str, Any] = {}
+
+
+def mode() -> str:
+    return _mode
+
+
+def active_archive() -> Optional[FixtureArchive]:
+    return _archive
+
+
+def _patch_requests():
+    import requests
+
+    original = requests.Session.send
+    _originals["requests"] = original
+
+    def send(session, request, **kwargs):
+        archive = _archive
+        if archive is None:
+            return original(session, request, **kwargs)
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        key = request_key(request.method, request.url, body)
+        if _mode == "record":
+            response = original(session, request, **kwargs)
+            archive.add_response(key, response.status_code, _clean_headers(response.headers), response.content)
+            return response
+        record = archive.next(key)
+        if record is None:
+            raise requests.ConnectionError(f"Нет фикстуры для {key}", request=request)
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.headers = requests.structures.CaseInsensitiveDict(record["headers"])
+        response._content = archive.body(record)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = "Replayed"
+        return response
+
+    requests.Session.send = send
+
+
+def _patch_httpx():
+    try:
+        import httpx
+    except ImportError:
+        return
+
+    original = httpx.AsyncClient.send
+    _originals["httpx"] = original
+
+    async def send(client, request, **kwargs):
+        archive = _archive
+        if archive is None:
+            return await original(client, request, **kwargs)
+        key = request_key(request.method, str(request.url), request.content)
+        if _mode == "record":
+            response = await original(client, request, **kwargs)
+            await response.aread()
+            archive.add_response(key, response.status_code, _clean_headers(response.headers), response.content)
+            return response
+        record = archive.next(key)
+        if record is None:
+            raise httpx.ConnectError(f"Нет фикстуры для {key}", request=request)
+        return httpx.Response(
+            record["status"], headers=record["headers"], content=archive.body(record), request=request
+        )
+
+    httpx.AsyncClient.send = send
+
+
+def _unpatch():
+    if "requests" in _originals:
+        import requests
+        requests.Session.send = _originals.pop("requests")
+    if "httpx" in _originals:
+        import httpx
+        httpx.AsyncClient.send = _originals.pop("httpx")
+
+
+def start(new_mode: str, archive: FixtureArchive):
+    """Включение записи или воспроизведения для всего процесса"""
+    global _mode, _archive
+    if new_mode not in ("record", "replay"):
+        raise ValueError(f"Неизвестный режим воспроизведения: {new_mode}")
+    from .http_cache import http_cache
+    from .browser_pool import browser_pool
+    with _state_lock:
+        if _archive is not None:
+            raise RuntimeError("Запись/воспроизведение уже запущены")
+        # Кеш ответов не должен подменять ни запись, ни воспроизведение
+        _originals["http_cache_enabled"] = http_cache.enabled
+        http_cache.enabled = False
+        # Воркеры пула - отдельные процессы без перехвата: браузерные стратегии идут в этом процессе
+        _originals["browser_pool_enabled"] = browser_pool.enabled
+        browser_pool.enabled = False
+        _patch_requests()
+        _patch_httpx()
+        _mode, _archive = new_mode, archive
+    logger.info(f"📼 Режим фикстур: {new_mode}")
+
+
+def stop():
+    global _mode, _archive
+    from .http_cache import http_cache
+    from .browser_pool import browser_pool
+    with _state_lock:
+        _unpatch()
+        http_cache.enabled = _originals.pop("http_cache_enabled", http_cache.enabled)
+        browser_pool.enabled = _originals.pop("browser_pool_enabled", browser_pool.enabled)
+        _mode, _archive = "off", None
+
+
+@contextmanager
+def recording(path: str, meta: Optional[Dict] = None):
+    """Запись всех ответов внутри блока в архив path"""
+    archive = FixtureArchive(meta)
+    start("record", archive)
+    try:
+        yield archive
+    finally:
+        stop()
+        archive.save(path)
+        logger.info(f"📼 Записано ответов: {archive.stats['recorded']} -> {path}")
+
+
+@contextmanager
+def replaying(path_or_archive):
+    """Воспроизведение ответов из архива внутри блока"""
+    archive = path_or_archive
+    if not isinstance(archive, FixtureArchive):
+        archive = FixtureArchive.load(path_or_archive)
+    start("replay", archive)
+    try:
+        yield archive
+    finally:
+        stop()
+
+
+def start_from_env():
+    """Включение по PARSER_REPLAY_MODE/PARSER_REPLAY_ARCHIVE (запись сохраняется в stop_from_env)"""
+    if PARSER_REPLAY_MODE == "off" or not PARSER_REPLAY_ARCHIVE:
+        return
+    if PARSER_REPLAY_MODE == "replay":
+        start("replay", FixtureArchive.load(PARSER_REPLAY_ARCHIVE))
+    else:
+        start("record", FixtureArchive())
+
+
+def stop_from_env():
+    archive = _archive
+    recorded = _mode == "record"
+    stop()
+    if archive is not None and recorded:
+        archive.save(PARSER_REPLAY_ARCHIVE)
+
+
+# --- Playwright ---
+
+def attach_page(page):
+    """Перехват запросов страницы Playwright (ничего не делает, если режим выключен)"""
+    archive = _archive
+    if archive is None:
+        return
+
+    def handle(route):
+        request = route.request
+        key = request_key(request.method, request.url, request.post_data_buffer)
+        if _mode == "record":
+            response = route.fetch()
+            archive.add_response(key, response.status, _clean_headers(response.headers), response.body())
+            route.fulfill(response=response)
+            return
+        record = archive.next(key)
+        if record is None:
+            route.abort("internetdisconnected")
+            return
+        route.fulfill(status=record["status"], headers=record["headers"], body=archive.body(record))
+
+    page.route("**/*", handle)
+
+
+# --- Selenium ---
+
+def _script_key(url: str, script: str, args: tuple) -> str:
+    digest = hashlib.sha1(script.encode("utf-8"))
+    if args:
+        digest.update(json.dumps(args, ensure_ascii=False).encode("utf-8"))
+    return f"DRIVER {url} script:{digest.hexdigest()[:12]}"
+
+
+def _json_args(args: tuple) -> bool:
+    """Аргументы скрипта - простые значения (а не элементы DOM)"""
+    try:
+        json.dumps(args)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _json_value(value: Any) -> Any:
+    """Результат execute_script, пригодный для архива (элементы DOM не сохраняются)"""
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return None
+
+
+class RecordingDriver:
+    """Обертка над драйвером Selenium, записывающая то, что читает парсер"""
+
+    def __init__(self, driver, archive: FixtureArchive):
+        self._driver = driver
+        self._archive = archive
+        self._url = ""
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def get(self, url: str):
+        self._url = url
+        self._driver.get(url)
+
+    @property
+    def page_source(self) -> str:
+        value = self._driver.page_source
+        self._archive.add_value(f"DRIVER {self._url} page_source", value)
+        return value
+
+    @property
+    def title(self) -> str:
+        value = self._driver.title
+        self._archive.add_value(f"DRIVER {self._url} title", value)
+        return value
+
+    def execute_script(self, script: str, *args):
+        value = self._driver.execute_script(script, *args)
+        if _json_args(args):
+            self._archive.add_value(_script_key(self._url, script, args), _json_value(value))
+        return value
+
+
+class ReplayDriver:
+    """
+    Драйвер Selenium без браузера: отдает записанные page_source, title и результаты скриптов
+
+    Элементов DOM нет: find_elements возвращает [], find_element - NoSuchElementException,
+    скрипты с элементами в аргументах (клики по элементам) ничего не делают.
+    """
+
+    def __init__(self, archive: FixtureArchive):
+        self._archive = archive
+        self.current_url = ""
+
+    def get(self, url: str):
+        self.current_url = url
+
+    def _value(self, key: str, default=None):
+        record = self._archive.next(key)
+        return default if record is None else record["value"]
+
+    @property
+    def page_source(self) -> str:
+        return self._value(f"DRIVER {self.current_url} page_source", "<html></html>")
+
+    @property
+    def title(self) -> str:
+        return self._value(f"DRIVER {self.current_url} title", "")
+
+    def execute_script(self, script: str, *args):
+        if not _json_args(args):
+            return None
+        if script.strip() == "return document.readyState":
+            return "complete"
+        return self._value(_script_key(self.current_url, script, args))
+
+    def find_elements(self, *args, **kwargs) -> list:
+        return []
+
+    def find_element(self, by=None, value=None):
+        from selenium.common.exceptions import NoSuchElementException
+        raise NoSuchElementException(f"Воспроизведение: элемент {value} недоступен")
+
+    def quit(self):
+        pass
+
+
+def replay_driver() -> Optional[ReplayDriver]:
+    """Драйвер для воспроизведения (None, если режим воспроизведения не включен)"""
+    if _mode != "replay" or _archive is None:
+        return None
+    return ReplayDriver(_archive)
+
+
+def wrap_driver(driver):
+    """Обертка драйвера для записи (в остальных режимах драйвер возвращается как есть)"""
+    if driver is None or _mode != "record" or _archive is None:
+        return driver
+    return RecordingDriver(driver, _archive)
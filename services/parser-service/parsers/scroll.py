@@ -0,0 +1,151 @@
+"""
+Адаптивная подгрузка отзывов на страницах с бесконечной прокруткой
+Вместо фиксированного числа прокруток после каждого шага (прокрутка вниз и клик по кнопке
+"Показать еще") считается число отзывов на странице. Подгрузка заканчивается, когда число
+перестает расти несколько шагов подряд, достигнута нужная дата (since) или целевое число
+отзывов. Кнопка подгрузки ищется одна: видимая, с текстом вида "Показать еще"/"Еще отзывы"
+и расположенная после последнего отзыва, а не каждая кнопка со словом "еще".
+
+Работает и с Playwright, и с Selenium через функцию evaluate(js, arg), см. playwright_evaluate
+и selenium_evaluate.
+"""
+from typing import Any, Callable, Optional
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Предельное число шагов прокрутки
+SCROLL_MAX_STEPS = int(os.getenv("SCROLL_MAX_STEPS", "60"))
+# Сколько шагов подряд без новых отзывов означает, что список закончился
+SCROLL_PATIENCE = int(os.getenv("SCROLL_PATIENCE", "3"))
+# Сколько ждать появления новых отзывов после шага (секунды) и как часто проверять
+SCROLL_SETTLE_SECONDS = float(os.getenv("SCROLL_SETTLE_SECONDS", "4"))
+SCROLL_POLL_SECONDS = 0.25
+# Достаточное число отзывов на странице (0 - без ограничения)
+SCROLL_TARGET_REVIEWS = int(os.getenv("SCROLL_TARGET_REVIEWS", "0"))
+
+# Элементы отзывов, по которым считается прогресс подгрузки
+REVIEW_SELECTORS = {
+    "wildberries": '[data-feedback-id], .feedback-item, .comments__item, [class*="feedback__item"]',
+    "ozon": '[data-widget="webReview"], [data-review-id], [class*="review-item"]',
+    "yandex-market": '[data-auto="review-item"], [data-review-id], [class*="review-item"]',
+}
+
+# Число отзывов на странице
+COUNT_REVIEWS_JS = "(selector) => document.querySelectorAll(selector).length"
+
+# Прокрутка вниз и клик по кнопке подгрузки; возвращает текст нажатой кнопки или null
+STEP_JS = r"""
+(selector) => {
+    window.scrollTo(0, document.body.scrollHeight);
+    const reviews = document.querySelectorAll(selector);
+    const last = reviews.length ? reviews[reviews.length - 1] : null;
+    const pattern = /^(показать|загрузить|смотреть)\s+(ещ[её]|больше)|^ещ[её](\s+\d+)?(\s+отзыв)?/i;
+    let control = null;
+    for (const el of document.querySelectorAll('button, a[role="button"], [role="button"]')) {
+        const label = (el.innerText || el.textContent || '').trim().replace(/\s+/g, ' ');
+        if (!label || label.length > 40 || !pattern.test(label)) continue;
+        const rect = el.getBoundingClientRect();
+        if (!rect.width || !rect.height || el.disabled) continue;
+        // Кнопка списка отзывов находится после последнего отзыва
+        if (last && !(last.compareDocumentPosition(el) & Node.DOCUMENT_POSITION_FOLLOWING)) continue;
+        control = el;
+        break;
+    }
+    if (!control) return null;
+    control.scrollIntoView({block: 'center'});
+    control.click();
+    return (control.innerText || control.textContent || '').trim();
+}
+"""
+
+
+def playwright_evaluate(page) -> Callable[[str, Any], Any]:
+    return lambda script, arg=None: page.evaluate(script, arg)
+
+
+def selenium_evaluate(driver) -> Callable[[str, Any], Any]:
+    return lambda script, arg=None: driver.execute_script(f"return ({script})(arguments[0]);", arg)
+
+
+class ScrollResult:
+    """Итог подгрузки: шагов, отзывов на странице и причина остановки"""
+
+    def __init__(self, steps: int, count: int, reason: str):
+        self.steps = steps
+        self.count = count
+        self.reason = reason
+
+    def __repr__(self):
+        return f"ScrollResult(steps={self.steps}, count={self.count}, reason={self.reason})"
+
+
+def _wait_for_growth(evaluate, selector: str, previous: int, settle: float) -> Optional[int]:
+    """Ожидание новых отзывов после шага: сразу, как только их стало больше, или до таймаута"""
+    count = previous
+    for _ in range(max(1, int(settle / SCROLL_POLL_SECONDS))):
+        time.sleep(SCROLL_POLL_SECONDS)
+        count = evaluate(COUNT_REVIEWS_JS, selector)
+        if count is None or count > previous:
+            break
+    return count
+
+
+def load_reviews(
+    evaluate: Callable[[str, Any], Any],
+    selector: str,
+    reached_since: Optional[Callable[[], bool]] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+    on_step: Optional[Callable[[int, int], None]] = None,
+    target: int = SCROLL_TARGET_REVIEWS,
+    max_steps: int = SCROLL_MAX_STEPS,
+    patience: int = SCROLL_PATIENCE,
+    settle: float = SCROLL_SETTLE_SECONDS
+) -> ScrollResult:
+    """
+    Подгрузка отзывов прокруткой и кнопкой "Показать еще" до насыщения
+
+    Args:
+        evaluate: выполнение JS-функции на странице с одним аргументом
+        selector: CSS-селектор элементов отзывов
+        reached_since: проверка, загружены ли уже отзывы старше границы инкрементального парсинга
+        cancelled: проверка отмены парсинга
+        on_step: колбэк (номер шага, отзывов на странице)
+    """
+    count = evaluate(COUNT_REVIEWS_JS, selector) or 0
+    stale = 0
+    step = 0
+    reason = "max_steps"
+    while step < max_steps:
+        if cancelled and cancelled():
+            reason = "cancelled"
+            break
+        step += 1
+        clicked = evaluate(STEP_JS, selector)
+        current = _wait_for_growth(evaluate, selector, count, settle)
+        if current is None:
+            reason = "unavailable"
+            break
+        if clicked:
+            logger.info(f"👆 Кнопка подгрузки: {clicked}")
+        if on_step:
+            on_step(step, current)
+        if current > count:
+            count = current
+            stale = 0
+        else:
+            stale += 1
+        if target and count >= target:
+            reason = "target"
+            break
+        if reached_since and reached_since():
+            reason = "since"
+            break
+        if stale >= patience:
+            reason = "saturated"
+            break
+    result = ScrollResult(step, count, reason)
+    logger.info(f"📜 Подгрузка отзывов: {result}")
+    return result
@@ -0,0 +1,170 @@
+"""
+Общие HTTP-сессии и User-Agent'ы для всех парсеров процесса
+Парсер создается на каждый запуск стратегии, поэтому сессии (пул keep-alive соединений,
+TLS, cookies) и каталог User-Agent'ов живут на уровне процесса: сессия своя у каждого
+маркетплейса и назначения, внутри нее urllib3 держит пул соединений на каждый хост.
+Создание потокобезопасно; заголовки задаются один раз при создании сессии, а User-Agent
+берется из каталога заново на каждый запрос (RotatingSession), если он не задан явно.
+"""
+from typing import Dict, List, Optional
+import itertools
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Соединений в пуле на один хост (стратегии одного маркетплейса идут параллельно)
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "16"))
+# Сколько User-Agent'ов выбирается из базы fake_useragent для ротации
+UA_CATALOG_SIZE = int(os.getenv("UA_CATALOG_SIZE", "50"))
+
+# Если fake_useragent недоступен (нет сети для загрузки базы)
+FALLBACK_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+]
+
+BROWSER_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Cache-Control': 'max-age=0',
+}
+
+
+class UserAgentCatalog:
+    """Каталог User-Agent'ов с ротацией по кругу (совместим с fake_useragent: .random)"""
+
+    def __init__(self, agents: List[str]):
+        self.agents = agents
+        self._cycle = itertools.cycle(agents)
+        self._lock = threading.Lock()
+
+    @property
+    def random(self) -> str:
+        with self._lock:
+            return next(self._cycle)
+
+
+def _has_user_agent(headers: Optional[Dict[str, str]]) -> bool:
+    return any(name.lower() == 'user-agent' for name in (headers or {}))
+
+
+class RotatingSession(requests.Session):
+    """
+    Сессия requests с новым User-Agent из каталога на каждый запрос
+
+    User-Agent из headers=... запроса имеет приоритет; rotate_user_agent=False - постоянный
+    User-Agent из заголовков сессии
+    """
+
+    def __init__(self, rotate_user_agent: bool = True):
+        super().__init__()
+        self.rotate_user_agent = rotate_user_agent
+
+    def prepare_request(self, request):
+        if self.rotate_user_agent and not _has_user_agent(request.headers):
+            request.headers = dict(request.headers or {})
+            request.headers['User-Agent'] = user_agents().random
+        return super().prepare_request(request)
+
+
+_lock = threading.RLock()
+_catalog: Optional[UserAgentCatalog] = None
+_sessions: Dict[str, requests.Session] = {}
+_scraper = None
+
+
+def user_agents() -> UserAgentCatalog:
+    """Каталог User-Agent'ов процесса (база fake_useragent загружается один раз)"""
+    global _catalog
+    if _catalog is None:
+        with _lock:
+            if _catalog is None:
+                try:
+                    from fake_useragent import UserAgent
+                    ua = UserAgent()
+                    agents = list(dict.fromkeys(ua.random for _ in range(UA_CATALOG_SIZE)))
+                except Exception as e:
+                    logger.warning(f"⚠️ fake_useragent недоступен, используются встроенные User-Agent'ы: {e}")
+                    agents = list(FALLBACK_USER_AGENTS)
+                _catalog = UserAgentCatalog(agents)
+    return _catalog
+
+
+def _mount_pool(session: requests.Session):
+    adapter = HTTPAdapter(pool_connections=SESSION_POOL_SIZE, pool_maxsize=SESSION_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def get_session(key: str, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """
+    Общая сессия requests для ключа (маркетплейс и назначение, например "wildberries-api")
+
+    headers применяются только при создании сессии; если User-Agent в них не задан,
+    он меняется на каждый запрос (см. RotatingSession).
+    """
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = RotatingSession(rotate_user_agent=not _has_user_agent(headers))
+                _mount_pool(session)
+                session.headers.update(headers or {})
+                _sessions[key] = session
+    return session
+
+
+def get_scraper():
+    """
+    Общий cloudscraper процесса (обход защиты Cloudflare) с заголовками браузера
+
+    User-Agent сессии - значение по умолчанию: cookie прохождения проверки Cloudflare привязана
+    к User-Agent, поэтому парсер передает свой в headers=... на все время работы
+    (BaseParser.user_agent), а не меняет его на каждый запрос
+    """
+    global _scraper
+    if _scraper is None:
+        agent = user_agents().random
+        with _lock:
+            if _scraper is None:
+                import cloudscraper
+                scraper = cloudscraper.create_scraper(
+                    browser={
+                        'browser': 'chrome',
+                        'platform': 'windows',
+                        'desktop': True
+                    }
+                )
+                # Свой адаптер cloudscraper (набор шифров TLS) не заменяем
+                scraper.headers.update(BROWSER_HEADERS)
+                scraper.headers['User-Agent'] = agent
+                _scraper = scraper
+    return _scraper
+
+
+def close_sessions():
+    """Закрытие всех сессий (при остановке сервиса)"""
+    global _scraper
+    with _lock:
+        sessions = list(_sessions.values()) + ([_scraper] if _scraper is not None else [])
+        _sessions.clear()
+        _scraper = None
+    for session in sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
@@ -3,16 +3,22 @@
 Использует Playwright для надежной работы в Docker
 Все вызовы Playwright обернуты в ThreadPoolExecutor для работы с asyncio
 """
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from datetime import datetime
 import re
-import json
 import time
-import requests
 from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright, Browser, Page
 import concurrent.futures
-from .base_parser import BaseParser
+from .registry import register_parser
+from .sessions import get_session
+from .replay import attach_page
+from .warm_browser import launch_chromium
+from .scroll import playwright_evaluate
+from .base_parser import BaseParser, NoResult
+from .dates import review_date
+from .wb_feedbacks import WildberriesFeedbacksClient
+from .async_http import async_http
 
 
 def _run_playwright_in_thread(func):
@@ -29,8 +35,7 @@ class SimpleWildberriesParser(BaseParser):
     
     def __init__(self):
         super().__init__()
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = get_session("wildberries-api", headers={
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'application/json',
         })
@@ -48,7 +53,7 @@ class SimpleWildberriesParser(BaseParser):
         except:
             return None
     
-    def parse_reviews(self, url: str) -> List[Dict]:
+    def parse_reviews(self, url: str, since: Optional[datetime] = None) -> List[Dict]:
         article = self._extract_article(url)
         if not article:
             print(f"❌ Не удалось извлечь артикул из URL: {url}")
@@ -56,96 +61,107 @@ class SimpleWildberriesParser(BaseParser):
         
         print(f"🔍 Извлечен артикул: {article}")
         
-        # API метод
+        reviews = self.parse_reviews_api(url, since)
+        if reviews is not None:
+            return reviews
+        return self.parse_reviews_browser(url, since)
+    
+    def parse_reviews_api(self, url: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Отзывы через API (постраничный обход); None - API не сработал и нужен браузер"""
         try:
-            print(f"🌐 Пробую API метод для артикула {article}...")
-            api_url = f"https://feedbacks1.wildberries.ru/api/v1/summary/full"
-            headers = {
-                'Referer': f'https://www.wildberries.ru/catalog/{article}/detail.aspx',
-                'Accept': 'application/json',
-            }
-            r = self.session.get(api_url, params={'nmId': article}, headers=headers, timeout=15)
-            print(f"📡 API ответ: статус {r.status_code}")
-            
-            if r.status_code == 200:
-                try:
-                    data = r.json()
-                    print(f"📊 API вернул данные, ключи: {list(data.keys())}")
-                    feedbacks = data.get('feedbacks', [])
-                    print(f"📝 Найдено отзывов в API: {len(feedbacks)}")
-                    
-                    reviews = []
-                    for fb in feedbacks:
-                        text = fb.get('text', '').strip()
-                        if text and len(text) > 10:
-                            date_str = fb.get('createdDate', '')
-                            date = datetime.now()
-                            try:
-                                if date_str:
-                                    date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                            except:
-                                pass
-                            
-                            reviews.append({
-                                "author": fb.get('wbUserDetails', {}).get('name', 'Аноним'),
-                                "rating": fb.get('productValuation', 0),
-                                "text": text,
-                                "date": date
-                            })
-                    
-                    if reviews:
-                        print(f"✅ API вернул {len(reviews)} отзывов")
-                        return reviews
-                    else:
-                        print(f"⚠️ API вернул 0 отзывов, пробую Playwright...")
-                except json.JSONDecodeError as e:
-                    print(f"❌ Ошибка парсинга JSON: {e}")
-                    print(f"Ответ API: {r.text[:500]}")
-            else:
-                print(f"❌ API вернул статус {r.status_code}: {r.text[:200]}")
+            reviews = []
+            # Страницы копятся в памяти и не подтверждаются - курсор обхода не используется
+            for page in self.iter_reviews_api(url, since, resume=False):
+                reviews.extend(page)
+            if self._cancelled():
+                return None
+            return reviews
+        except NoResult as e:
+            print(f"⚠️ {e}, нужен Playwright")
         except Exception as e:
             print(f"❌ Ошибка API метода: {e}")
             import traceback
             print(traceback.format_exc())
+        return None
+    
+    def iter_reviews_api(self, url: str, since: Optional[datetime] = None, resume: bool = True) -> Iterator[List[Dict]]:
+        """
+        Отзывы через API постранично, по пачке на страницу (ошибки API - исключения)
+        
+        resume - продолжать прерванный полный обход с курсора; курсор сдвигается по page.ack()
+        после записи страницы в БД (см. store_review_batches), поэтому только для такого потребителя
+        """
+        article = self._extract_article(url)
+        if not article:
+            raise NoResult(f"Не удалось извлечь артикул из URL: {url}")
+        
+        print(f"🌐 Пробую API метод для артикула {article}...")
+        client = WildberriesFeedbacksClient()
+        # Карточка товара (название, цена, рейтинг) запрашивается параллельно с отзывами
+        card = async_http.submit(client.fetch_product(article))
+        found = 0
+        pages = 0
+        # Полный обход продолжается с курсора, если прошлый был прерван
+        for page in client.iter_pages(article, resume=resume and since is None, since=since):
+            found += len(page)
+            pages += 1
+            self._report_progress(strategy="api", pages=pages, reviews=found)
+            if card is not None and card.done():
+                self._report_product(card.result())
+                card = None
+            print(f"📄 Получена страница API, всего отзывов: {found}")
+            if page:
+                yield page
+            if self._cancelled():
+                print("⏹️ Парсинг отменен")
+                return
         
-        # Fallback на Playwright (надежнее чем Selenium)
-        print("🔄 Переключаюсь на Playwright парсинг...")
+        if card is not None:
+            try:
+                self._report_product(card.result(timeout=client.timeout))
+            except Exception as e:
+                card.cancel()
+                print(f"⚠️ Карточка товара не получена: {e}")
+        
+        if found:
+            print(f"✅ API вернул {found} отзывов")
+        elif since:
+            # API отработал - новых отзывов с прошлого парсинга просто нет
+            print(f"✅ Новых отзывов с {since.isoformat()} нет")
+        else:
+            raise NoResult("API вернул 0 отзывов")
+    
+    def parse_reviews_browser(self, url: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Отзывы со страницы товара через Playwright; None - отзывы не получены"""
+        article = self._extract_article(url)
+        if not article:
+            return None
+        
+        # Playwright надежнее чем Selenium
+        print("🔄 Запускаю Playwright парсинг...")
         try:
             def _playwright_parse():
                 with sync_playwright() as p:
                     print("🚀 Запускаю браузер Playwright...")
-                    browser = p.chromium.launch(
-                        headless=True,
-                        args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
-                    )
+                    browser = launch_chromium(p)
                     page = browser.new_page()
+                    attach_page(page)
                     page.set_viewport_size({"width": 1920, "height": 1080})
                     
                     feedback_url = f"https://www.wildberries.ru/catalog/{article}/feedbacks"
                     print(f"🌐 Открываю страницу отзывов: {feedback_url}")
                     page.goto(feedback_url, wait_until="networkidle", timeout=30000)
                     time.sleep(3)
+                    # Название, цена и рейтинг - с той же страницы, без отдельного запуска браузера
+                    self._capture_product(playwright_evaluate(page))
                     
                     # Прокручиваем для загрузки
                     print("📜 Прокручиваю страницу...")
-                    for i in range(15):
-                        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        time.sleep(2)
-                        
-                        # Ищем кнопки "Показать еще"
-                        try:
-                            buttons = page.query_selector_all("button")
-                            for btn in buttons:
-                                try:
-                                    text = btn.inner_text().lower()
-                                    if any(word in text for word in ["показать", "еще", "загрузить"]):
-                                        btn.click()
-                                        print(f"✅ Кликнул кнопку")
-                                        time.sleep(3)
-                                except:
-                                    continue
-                        except:
-                            pass
+                    loaded = self._load_reviews(playwright_evaluate(page), "wildberries", "playwright", since)
+                    if loaded.reason == "cancelled":
+                        print("⏹️ Парсинг отменен")
+                    elif loaded.reason == "since":
+                        print("✅ Дошли до уже загруженных отзывов")
                     
                     # Извлекаем через JS
                     print("🔍 Извлекаю отзывы через JavaScript...")
@@ -176,12 +192,15 @@ class SimpleWildberriesParser(BaseParser):
                         
                         const author = item.querySelector('strong, b, [class*="author"]')?.innerText?.trim() || 'Аноним';
                         const stars = item.querySelectorAll('[class*="star"][class*="fill"], [class*="star"].active, .star-fill').length || 0;
+                        const dateEl = item.querySelector('time, [class*="date"], [datetime]');
                         
                         if (text.length > 20) {
                             reviews.push({
                                 author: author.length > 50 ? 'Аноним' : author,
                                 rating: stars,
-                                text: text
+                                text: text,
+                                date: dateEl ? (dateEl.innerText || '').trim() : '',
+                                datetime: dateEl ? dateEl.getAttribute('datetime') : null
                             });
                         }
                     });
@@ -209,33 +228,31 @@ class SimpleWildberriesParser(BaseParser):
                             "author": item.get('author', 'Аноним'),
                             "rating": item.get('rating', 0),
                             "text": text,
-                            "date": datetime.now()
+                            # Дата со страницы (текст, затем атрибут datetime); None - не найдена
+                            "date": review_date(item.get('date'), item.get('datetime'))
                         })
                     
                     browser.close()
                     return reviews
             
             # Запускаем в отдельном потоке
-            print("📝 Запускаю ThreadPoolExecutor для Wildberries...")
             with concurrent.futures.ThreadPoolExecutor() as executor:
-                print("📝 Отправляю задачу в поток...")
                 future = executor.submit(_playwright_parse)
-                print("📝 Ожидаю результат (таймаут 300 сек)...")
                 reviews = future.result(timeout=300)  # 5 минут таймаут
-                print(f"📝 Получен результат: {len(reviews) if reviews else 0} отзывов")
                 
+                reviews = self._browser_result(reviews, since)
                 if reviews:
                     print(f"✅ Playwright нашел {len(reviews)} отзывов")
-                    return reviews
-                else:
+                elif reviews is None:
                     print(f"❌ Playwright не нашел отзывов")
+                return reviews
                     
         except Exception as e:
             print(f"❌ Ошибка Playwright: {e}")
             import traceback
             print(traceback.format_exc())
         
-        return []
+        return None
 
 
 class SimpleOzonParser(BaseParser):
@@ -255,11 +272,9 @@ class SimpleOzonParser(BaseParser):
         try:
             def _get_name():
                 with sync_playwright() as p:
-                    browser = p.chromium.launch(
-                        headless=True,
-                        args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
-                    )
+                    browser = launch_chromium(p)
                     page = browser.new_page()
+                    attach_page(page)
                     page.goto(url, wait_until="networkidle", timeout=30000)
                     time.sleep(2)
                     h1 = page.query_selector('h1')
@@ -272,59 +287,39 @@ class SimpleOzonParser(BaseParser):
         except:
             return None
     
-    def parse_reviews(self, url: str) -> List[Dict]:
+    def parse_reviews(self, url: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Отзывы через Playwright; None - отзывы не получены (ошибка, таймаут, пустая страница)"""
         product_id = self._extract_product_id(url)
         if not product_id:
             print(f"❌ Не удалось извлечь ID товара из URL: {url}")
-            return []
+            return None
         
         print(f"🔍 Извлечен ID товара: {product_id}")
         print("🚀 Запускаю Playwright для Ozon...")
-        print("📝 [MAIN] Перед запуском ThreadPoolExecutor...")
         
         reviews = []
         try:
             def _playwright_parse():
-                print("📝 [THREAD] Начало выполнения в отдельном потоке для Ozon...")
-                import sys
-                sys.stdout.flush()
                 try:
-                    print("📝 [THREAD] Инициализация Playwright...")
-                    sys.stdout.flush()
                     with sync_playwright() as p:
-                        print("📝 [THREAD] Playwright инициализирован, запускаю браузер...")
-                        browser = p.chromium.launch(
-                            headless=True,
-                            args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
-                        )
-                        print("📝 [THREAD] Браузер запущен, создаю страницу...")
+                        browser = launch_chromium(p)
                         page = browser.new_page()
+                        attach_page(page)
                         page.set_viewport_size({"width": 1920, "height": 1080})
                         
                         review_url = f"https://www.ozon.ru/product/{product_id}/reviews/"
                         print(f"🌐 Открываю страницу отзывов: {review_url}")
                         page.goto(review_url, wait_until="networkidle", timeout=30000)
                         time.sleep(3)
+                        # Название, цена и рейтинг - с той же страницы, без отдельного запуска браузера
+                        self._capture_product(playwright_evaluate(page))
                         
                         print("📜 Прокручиваю страницу...")
-                        for i in range(15):
-                            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                            time.sleep(2)
-                            
-                            # Ищем кнопки "Показать еще"
-                            try:
-                                buttons = page.query_selector_all("button")
-                                for btn in buttons:
-                                    try:
-                                        text = btn.inner_text().lower()
-                                        if any(word in text for word in ["показать", "еще", "загрузить"]):
-                                            btn.click()
-                                            print(f"✅ Кликнул кнопку")
-                                            time.sleep(3)
-                                    except:
-                                        continue
-                            except:
-                                pass
+                        loaded = self._load_reviews(playwright_evaluate(page), "ozon", "playwright", since)
+                        if loaded.reason == "cancelled":
+                            print("⏹️ Парсинг отменен")
+                        elif loaded.reason == "since":
+                            print("✅ Дошли до уже загруженных отзывов")
                         
                         # Извлекаем через JS
                         print("🔍 Извлекаю отзывы через JavaScript...")
@@ -349,9 +344,14 @@ class SimpleOzonParser(BaseParser):
                             
                             const author = item.querySelector('strong, b, [class*="author"]')?.innerText?.trim() || 'Аноним';
                             const stars = item.querySelectorAll('[class*="star"][class*="fill"], [class*="star"].active').length || 0;
+                            const dateEl = item.querySelector('time, [class*="date"], [datetime]');
                             
                             if (text.length > 20) {
-                                reviews.push({author: author.length > 50 ? 'Аноним' : author, rating: stars, text: text});
+                                reviews.push({
+                                    author: author.length > 50 ? 'Аноним' : author, rating: stars, text: text,
+                                    date: dateEl ? (dateEl.innerText || '').trim() : '',
+                                    datetime: dateEl ? dateEl.getAttribute('datetime') : null
+                                });
                             }
                         });
                         return reviews;
@@ -377,39 +377,27 @@ class SimpleOzonParser(BaseParser):
                                 "author": item.get('author', 'Аноним'),
                                 "rating": item.get('rating', 0),
                                 "text": text,
-                                "date": datetime.now()
+                                "date": review_date(item.get('date'), item.get('datetime'))
                             })
                         
                         browser.close()
-                        print("📝 [THREAD] Браузер закрыт, возвращаю результаты...")
                         return reviews_list
                 except Exception as e:
-                    print(f"📝 [THREAD] Ошибка в потоке Ozon: {e}")
+                    print(f"❌ Ошибка Playwright Ozon: {e}")
                     import traceback
                     print(traceback.format_exc())
-                    return []
+                    return None
             
-            print("📝 [MAIN] Запускаю ThreadPoolExecutor для Ozon...")
-            import sys
-            sys.stdout.flush()
             with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                print("📝 [MAIN] Отправляю задачу в поток...")
-                sys.stdout.flush()
                 future = executor.submit(_playwright_parse)
-                print("📝 [MAIN] Ожидаю результат (таймаут 300 сек)...")
-                sys.stdout.flush()
                 try:
                     reviews = future.result(timeout=300)
-                    print(f"📝 [MAIN] Получен результат: {len(reviews) if reviews else 0} отзывов")
-                    sys.stdout.flush()
                 except concurrent.futures.TimeoutError:
-                    print("❌ [MAIN] Таймаут при ожидании результата!")
-                    sys.stdout.flush()
-                    reviews = []
+                    print("❌ Таймаут Playwright Ozon (300 сек)")
+                    return None
                 except Exception as e:
-                    print(f"❌ [MAIN] Ошибка при получении результата: {e}")
-                    sys.stdout.flush()
-                    reviews = []
+                    print(f"❌ Ошибка при получении результата Ozon: {e}")
+                    return None
                 
                 if reviews:
                     print(f"✅ Найдено {len(reviews)} отзывов")
@@ -417,8 +405,9 @@ class SimpleOzonParser(BaseParser):
             print(f"❌ Ошибка Ozon: {e}")
             import traceback
             print(traceback.format_exc())
+            return None
         
-        return reviews
+        return self._browser_result(reviews, since)
 
 
 class SimpleYandexMarketParser(BaseParser):
@@ -438,11 +427,9 @@ class SimpleYandexMarketParser(BaseParser):
         try:
             def _get_name():
                 with sync_playwright() as p:
-                    browser = p.chromium.launch(
-                        headless=True,
-                        args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
-                    )
+                    browser = launch_chromium(p)
                     page = browser.new_page()
+                    attach_page(page)
                     page.goto(url, wait_until="networkidle", timeout=30000)
                     time.sleep(2)
                     h1 = page.query_selector('h1')
@@ -455,11 +442,12 @@ class SimpleYandexMarketParser(BaseParser):
         except:
             return None
     
-    def parse_reviews(self, url: str) -> List[Dict]:
+    def parse_reviews(self, url: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Отзывы через Playwright; None - отзывы не получены (ошибка, таймаут, пустая страница)"""
         product_id = self._extract_product_id(url)
         if not product_id:
             print(f"❌ Не удалось извлечь ID товара из URL: {url}")
-            return []
+            return None
         
         print(f"🔍 Извлечен ID товара: {product_id}")
         print("🚀 Запускаю Playwright для Яндекс.Маркет...")
@@ -468,11 +456,9 @@ class SimpleYandexMarketParser(BaseParser):
         try:
             def _playwright_parse():
                 with sync_playwright() as p:
-                    browser = p.chromium.launch(
-                        headless=True,
-                        args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
-                    )
+                    browser = launch_chromium(p)
                     page = browser.new_page()
+                    attach_page(page)
                     page.set_viewport_size({"width": 1920, "height": 1080})
                     
                     # Пробуем найти slug из URL
@@ -487,26 +473,15 @@ class SimpleYandexMarketParser(BaseParser):
                     print(f"🌐 Открываю страницу отзывов: {review_url}")
                     page.goto(review_url, wait_until="networkidle", timeout=30000)
                     time.sleep(3)
+                    # Название, цена и рейтинг - с той же страницы, без отдельного запуска браузера
+                    self._capture_product(playwright_evaluate(page))
                     
                     print("📜 Прокручиваю страницу...")
-                    for i in range(15):
-                        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        time.sleep(2)
-                        
-                        # Ищем кнопки "Показать еще"
-                        try:
-                            buttons = page.query_selector_all("button")
-                            for btn in buttons:
-                                try:
-                                    text = btn.inner_text().lower()
-                                    if any(word in text for word in ["показать", "еще", "загрузить"]):
-                                        btn.click()
-                                        print(f"✅ Кликнул кнопку")
-                                        time.sleep(3)
-                                except:
-                                    continue
-                        except:
-                            pass
+                    loaded = self._load_reviews(playwright_evaluate(page), "yandex-market", "playwright", since)
+                    if loaded.reason == "cancelled":
+                        print("⏹️ Парсинг отменен")
+                    elif loaded.reason == "since":
+                        print("✅ Дошли до уже загруженных отзывов")
                     
                     # Извлекаем через JS
                     print("🔍 Извлекаю отзывы через JavaScript...")
@@ -531,9 +506,14 @@ class SimpleYandexMarketParser(BaseParser):
                         
                         const author = item.querySelector('strong, b, [class*="author"]')?.innerText?.trim() || 'Аноним';
                         const stars = item.querySelectorAll('[class*="star"][class*="fill"], [class*="star"].active').length || 0;
+                        const dateEl = item.querySelector('time, [class*="date"], [datetime]');
                         
                         if (text.length > 20) {
-                            reviews.push({author: author.length > 50 ? 'Аноним' : author, rating: stars, text: text});
+                            reviews.push({
+                                author: author.length > 50 ? 'Аноним' : author, rating: stars, text: text,
+                                date: dateEl ? (dateEl.innerText || '').trim() : '',
+                                datetime: dateEl ? dateEl.getAttribute('datetime') : null
+                            });
                         }
                     });
                     return reviews;
@@ -559,7 +539,8 @@ class SimpleYandexMarketParser(BaseParser):
                             "author": item.get('author', 'Аноним'),
                             "rating": item.get('rating', 0),
                             "text": text,
-                            "date": datetime.now()
+                            # Дата со страницы (текст, затем атрибут datetime); None - не найдена
+                            "date": review_date(item.get('date'), item.get('datetime'))
                         })
                     
                     browser.close()
@@ -575,5 +556,12 @@ class SimpleYandexMarketParser(BaseParser):
             print(f"❌ Ошибка Яндекс.Маркет: {e}")
             import traceback
             print(traceback.format_exc())
+            return None
         
-        return reviews
+        return self._browser_result(reviews, since)
+
+
+register_parser("wildberries", "api", SimpleWildberriesParser, "parse_reviews_api")
+register_parser("wildberries", "playwright", SimpleWildberriesParser, "parse_reviews_browser")
+register_parser("ozon", "playwright", SimpleOzonParser, name_order=0)
+register_parser("yandex-market", "playwright", SimpleYandexMarketParser, name_order=0)
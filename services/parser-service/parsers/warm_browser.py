@@ -0,0 +1,79 @@
+"""
+Прогретый Chromium в браузерном воркере
+Воркер пула (см. browser_pool.py) при старте запускает Chromium один раз и держит его открытым
+с локальным портом CDP. Парсеры Playwright вместо запуска нового браузера подключаются к нему
+(connect_over_cdp) и работают в отдельном контексте: холодный старт Chrome (секунды) не входит
+во время гонки с API. Закрытие подключенного браузера закрывает только созданные контексты
+и отключается, сам Chromium остается жить до перезапуска воркера.
+
+Вне воркера (пул отключен) и пока браузер не готов - обычный запуск, как раньше.
+"""
+from typing import Optional
+import logging
+import os
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+BROWSER_WARM_START = os.getenv("BROWSER_WARM_START", "true").lower() in ("1", "true", "yes")
+# Сколько ждать подключения к прогретому браузеру, прежде чем запустить новый (мс)
+WARM_CONNECT_TIMEOUT_MS = 5000
+
+CHROMIUM_ARGS = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
+
+_endpoint: Optional[str] = None
+_stop = threading.Event()
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve():
+    """Поток прогретого браузера: sync API Playwright привязан к потоку, поэтому браузер живет здесь"""
+    global _endpoint
+    try:
+        from playwright.sync_api import sync_playwright
+        port = _free_port()
+        with sync_playwright() as p:
+            browser = p.chromium.launch(
+                headless=True,
+                args=CHROMIUM_ARGS + [f"--remote-debugging-port={port}", "--remote-debugging-address=127.0.0.1"]
+            )
+            _endpoint = f"http://127.0.0.1:{port}"
+            logger.info(f"🔥 Прогретый Chromium готов ({_endpoint})")
+            _stop.wait()
+            _endpoint = None
+            browser.close()
+    except Exception as e:
+        _endpoint = None
+        logger.warning(f"⚠️ Не удалось запустить прогретый Chromium: {e}")
+
+
+def start():
+    """Запуск прогретого браузера в фоне (вызывается в процессе воркера)"""
+    if BROWSER_WARM_START:
+        threading.Thread(target=_serve, name="warm-chromium", daemon=True).start()
+
+
+def stop():
+    _stop.set()
+
+
+def launch_chromium(p, **kwargs):
+    """
+    Браузер для задачи: подключение к прогретому Chromium или обычный запуск p.chromium.launch(**kwargs)
+    Вызывающий код закрывает браузер как обычно (browser.close())
+    """
+    endpoint = _endpoint
+    if endpoint:
+        try:
+            return p.chromium.connect_over_cdp(endpoint, timeout=WARM_CONNECT_TIMEOUT_MS)
+        except Exception as e:
+            logger.warning(f"⚠️ Прогретый Chromium недоступен, запускаю новый: {e}")
+    kwargs.setdefault("headless", True)
+    kwargs.setdefault("args", CHROMIUM_ARGS)
+    return p.chromium.launch(**kwargs)
@@ -0,0 +1,342 @@
+"""
+Постраничный клиент API отзывов Wildberries
+Обходит все страницы параллельно (с ограничением числа запросов в полете),
+отдает отзывы по мере прихода страниц и сохраняет курсор для продолжения обхода.
+Курсор сдвигается только по подтверждению записи страницы в БД (ReviewPage.ack).
+Страницы загружаются общим асинхронным клиентом (см. async_http.py), а не потоком на запрос
+"""
+from typing import Callable, List, Dict, Optional, Iterator
+from concurrent.futures import wait, FIRST_COMPLETED
+from datetime import datetime
+import asyncio
+import os
+import json
+import threading
+import httpx
+from .async_http import async_http
+from .http_cache import http_cache, json_object
+from .base_parser import to_naive_utc, clean_product_info
+
+
+FEEDBACKS_API_URL = "https://feedbacks1.wildberries.ru/api/v1/summary/full"
+# Карточка товара: название, цена, рейтинг и число отзывов
+CARD_API_URL = "https://card.wb.ru/cards/v2/detail"
+PAGE_SIZE = int(os.getenv("WB_FEEDBACKS_PAGE_SIZE", "100"))
+MAX_IN_FLIGHT = int(os.getenv("WB_FEEDBACKS_MAX_IN_FLIGHT", "4"))
+STATE_DIR = os.getenv("PARSER_STATE_DIR", "/tmp/parser-state")
+
+
+class FeedbacksApiError(Exception):
+    """Страница API отзывов не получена после всех повторов"""
+
+
+class ReviewPage(list):
+    """
+    Отзывы одной страницы API; ack() вызывается после фиксации страницы в БД
+
+    Только тогда курсор обхода может сдвинуться за эту страницу: пачка, которая еще ждет
+    в очереди гонки стратегий или отброшена вместе с проигравшей стратегией, не подтверждается
+    и при продолжении обхода загружается снова. ack - None, если курсор не ведется.
+    """
+
+    def __init__(self, reviews: List[Dict], ack: Optional[Callable[[], None]] = None):
+        super().__init__(reviews)
+        self.ack = ack
+
+
+def feedback_to_review(feedback: Dict) -> Optional[Dict]:
+    """Преобразование отзыва из API в общий формат парсеров"""
+    text = (feedback.get('text') or '').strip()
+    if not text or len(text) < 10:
+        return None
+
+    date = None
+    date_str = feedback.get('createdDate', '')
+    if date_str:
+        try:
+            date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+        except ValueError:
+            pass
+
+    return {
+        "author": (feedback.get('wbUserDetails') or {}).get('name', 'Аноним'),
+        "rating": feedback.get('productValuation', 0),
+        "text": text,
+        "date": date
+    }
+
+
+class CursorStore:
+    """Хранение курсоров постраничного обхода в JSON-файлах"""
+
+    def __init__(self, directory: str = STATE_DIR):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, state: Dict):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(key) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path(key))
+
+    def clear(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class WildberriesFeedbacksClient:
+    """Клиент API отзывов Wildberries с параллельной постраничной загрузкой"""
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        page_size: int = PAGE_SIZE,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        cursor_store: Optional[CursorStore] = None,
+        timeout: int = 15,
+        retries: int = 3
+    ):
+        self.client = client  # None - общий клиент async_http
+        self.page_size = page_size
+        self.max_in_flight = max(1, max_in_flight)
+        self.cursor_store = cursor_store or CursorStore()
+        self.timeout = timeout
+        self.retries = retries
+
+    def _cursor_key(self, article: str) -> str:
+        return f"wb-feedbacks-{article}"
+
+    async def _fetch_page(self, article: str, skip: int) -> Dict:
+        """Загрузка одной страницы отзывов с повторными попытками"""
+        params = {
+            'nmId': article,
+            'skip': skip,
+            'take': self.page_size
+        }
+        headers = {
+            'Referer': f'https://www.wildberries.ru/catalog/{article}/detail.aspx',
+            'Accept': 'application/json',
+        }
+
+        client = self.client or async_http.client
+        last_error = None
+        for attempt in range(self.retries):
+            try:
+                response = await http_cache.aget(
+                    client, FEEDBACKS_API_URL, params=params, headers=headers, timeout=self.timeout,
+                    validate=json_object
+                )
+                response.raise_for_status()
+                data = response.json()
+                return {
+                    'skip': skip,
+                    'feedbacks': data.get('feedbacks') or [],
+                    'total': data.get('feedbackCount')
+                }
+            except (httpx.HTTPError, ValueError) as e:
+                last_error = e
+                if attempt < self.retries - 1:
+                    await asyncio.sleep(2 ** attempt)  # Экспоненциальная задержка
+
+        raise FeedbacksApiError(f"Страница skip={skip} не получена: {last_error}")
+
+    async def fetch_product(self, article: str) -> Dict:
+        """Метаданные товара из API карточки (пустой словарь, если карточка не получена)"""
+        params = {'appType': 1, 'curr': 'rub', 'dest': -1257786, 'nm': article}
+        client = self.client or async_http.client
+        try:
+            response = await http_cache.aget(
+                client, CARD_API_URL, params=params, timeout=self.timeout, validate=json_object
+            )
+            response.raise_for_status()
+            products = (response.json().get('data') or {}).get('products') or []
+        except Exception as e:
+            print(f"⚠️ Карточка товара {article} не получена: {e}")
+            return {}
+        if not products:
+            return {}
+        card = products[0]
+        # Цены в копейках: в v2 - у размеров, в старом формате - salePriceU
+        price = next((size['price'].get('product') for size in card.get('sizes') or [] if size.get('price')), None)
+        price = price or card.get('salePriceU')
+        name = card.get('name') or ''
+        if card.get('brand') and name and not name.startswith(card['brand']):
+            name = f"{card['brand']} / {name}"
+        return clean_product_info({
+            'name': name,
+            'price': price / 100 if price else None,
+            'rating': card.get('reviewRating') or card.get('rating'),
+            'reviews_count': card.get('feedbacks'),
+        })
+
+    def iter_pages(
+        self,
+        article: str,
+        resume: bool = False,
+        since: Optional[datetime] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Постраничный обход отзывов товара
+
+        Страницы запрашиваются параллельно (не более max_in_flight одновременно)
+        и отдаются в порядке прихода. При resume=True обход начинается с
+        сохраненного курсора, а курсор сдвигается только после page.ack() - страница
+        записана в БД (см. ReviewPage); потребитель, который копит страницы в памяти,
+        resume не включает.
+        API отдает отзывы от новых к старым, поэтому при указанном since
+        новые страницы перестают запрашиваться после первой страницы,
+        где встретился отзыв старше since.
+
+        Пока прерванный обход стоял, сверху могли появиться новые отзывы: при продолжении
+        сначала читаются страницы с начала до отзывов старше начала прерванного обхода,
+        затем обход идет с сохраненной позиции (сдвинутые вниз отзывы отсекает дедупликация).
+
+        Yields:
+            Список отзывов одной страницы в формате parse_reviews
+        """
+        key = self._cursor_key(article)
+        since = to_naive_utc(since) if since else None
+        start = 0
+        crawl_started = datetime.utcnow()
+        if resume:
+            state = self.cursor_store.load(key)
+            if state:
+                start = int(state.get('next_skip', 0))
+                try:
+                    crawl_started = datetime.fromisoformat(state['started_at'])
+                except (KeyError, TypeError, ValueError):
+                    pass
+            if start:
+                print(f"↩️ Продолжаю обход отзывов {article} с позиции {start}")
+                yield from self._iter_from(article, 0, crawl_started)
+
+        if not resume:
+            yield from self._iter_from(article, start, since)
+            return
+
+        # Подтверждения приходят из потока записи в БД, страницы отдаются из потока обхода
+        lock = threading.Lock()
+        acked = set()
+        acked_until = start  # Все страницы до этой позиции записаны
+        outstanding = set()  # Отданные, но еще не записанные страницы
+        finished = False
+
+        def ack(skip: int):
+            nonlocal acked_until
+            with lock:
+                outstanding.discard(skip)
+                acked.add(skip)
+                while acked_until in acked:
+                    acked.discard(acked_until)
+                    acked_until += self.page_size
+                if finished and not outstanding:
+                    # Обход закончен и все страницы записаны - продолжать нечего
+                    self.cursor_store.clear(key)
+                    return
+                self.cursor_store.save(key, {
+                    'next_skip': acked_until,
+                    'started_at': crawl_started.isoformat(),
+                    'updated_at': datetime.utcnow().isoformat()
+                })
+
+        def track(skip: int):
+            with lock:
+                outstanding.add(skip)
+
+        yield from self._iter_from(article, start, since, ack, track)
+        with lock:
+            finished = True
+            if not outstanding:
+                self.cursor_store.clear(key)
+
+    def _iter_from(
+        self,
+        article: str,
+        start: int,
+        since: Optional[datetime] = None,
+        ack: Optional[Callable[[int], None]] = None,
+        track: Optional[Callable[[int], None]] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Обход страниц начиная с позиции start
+        ack(skip) - страница записана (пустые подтверждаются сразу), track(skip) - страница отдана
+        """
+        next_skip = start
+        limit = None  # Граница, за которой страниц уже нет
+        seen_ids = set()
+
+        in_flight = {}
+        try:
+            while True:
+                while len(in_flight) < self.max_in_flight and (limit is None or next_skip < limit):
+                    future = async_http.submit(self._fetch_page(article, next_skip))
+                    in_flight[future] = next_skip
+                    next_skip += self.page_size
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    skip = in_flight.pop(future)
+                    page = future.result()
+
+                    feedbacks = page['feedbacks']
+                    if page['total'] is not None:
+                        limit = page['total'] if limit is None else min(limit, page['total'])
+                    if len(feedbacks) < self.page_size:
+                        end = skip + len(feedbacks)
+                        limit = end if limit is None else min(limit, end)
+
+                    # API может игнорировать skip/take и отдавать одно и то же -
+                    # страница без новых отзывов означает конец обхода
+                    fresh = []
+                    for fb in feedbacks:
+                        fb_id = fb.get('id')
+                        if fb_id is not None:
+                            if fb_id in seen_ids:
+                                continue
+                            seen_ids.add(fb_id)
+                        fresh.append(fb)
+                    if feedbacks and not fresh:
+                        limit = skip if limit is None else min(limit, skip)
+
+                    reviews = [r for r in (feedback_to_review(fb) for fb in fresh) if r]
+                    if since:
+                        newer = [r for r in reviews if r["date"] is None or to_naive_utc(r["date"]) >= since]
+                        if len(newer) < len(reviews):
+                            end = skip + self.page_size
+                            limit = end if limit is None else min(limit, end)
+                        reviews = newer
+                    if not reviews:
+                        if ack:
+                            ack(skip)
+                        continue
+                    if ack:
+                        track(skip)
+                        yield ReviewPage(reviews, lambda skip=skip: ack(skip))
+                    else:
+                        yield ReviewPage(reviews)
+        finally:
+            # Потребитель остановил обход - запросы в полете больше не нужны
+            for future in in_flight:
+                future.cancel()
+
+    def fetch_all(self, article: str, since: Optional[datetime] = None) -> List[Dict]:
+        """Загрузка всех отзывов товара (или только новее since) одним списком"""
+        reviews = []
+        for page in self.iter_pages(article, since=since):
+            reviews.extend(page)
+        return reviews
@@ -4,7 +4,6 @@
 from typing import List, Dict, Optional
 from datetime import datetime
 import re
-import json
 import time
 import requests
 from bs4 import BeautifulSoup
@@ -15,7 +14,14 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import undetected_chromedriver as uc
+from .html_backend import parse_html
+from .html_reviews import extract_reviews
+from .dates import review_date
+from .registry import register_parser
+from .sessions import get_session
 from .base_parser import BaseParser
+from .scroll import selenium_evaluate
+from .wb_feedbacks import WildberriesFeedbacksClient
 
 
 class WildberriesParser(BaseParser):
@@ -26,13 +32,11 @@ class WildberriesParser(BaseParser):
         self.driver = None
         self.session = None
         if requests:
-            self.session = requests.Session()
-            self.session.headers.update({
-                'User-Agent': self.ua.random,
+            self.session = get_session("wildberries", headers={
                 'Accept': 'application/json, text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
                 'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
             })
-        self._init_driver()
+        self._start_driver()
     
     def _init_driver(self):
         """Инициализация браузера с обходом детекции"""
@@ -128,7 +132,7 @@ class WildberriesParser(BaseParser):
             print(f"Ошибка получения названия товара: {e}")
             return None
     
-    def parse_reviews(self, url: str) -> List[Dict]:
+    def parse_reviews(self, url: str, since: Optional[datetime] = None) -> List[Dict]:
         """Парсинг отзывов - сначала пробуем API, потом Selenium"""
         article = self._extract_article(url)
         if not article:
@@ -136,77 +140,45 @@ class WildberriesParser(BaseParser):
             return []
         
         # Пробуем через API отзывов
-        api_reviews = self._try_api_method(article)
-        if api_reviews and len(api_reviews) > 0:
+        api_reviews = self._try_api_method(article, since)
+        if api_reviews:
             print(f"✅ API метод вернул {len(api_reviews)} отзывов")
             return api_reviews
+        if api_reviews is not None and since:
+            print(f"✅ Новых отзывов с {since.isoformat()} нет")
+            return []
         
         # Если API не сработал, используем Selenium
         print("🔄 API не сработал, переключаюсь на Selenium...")
-        return self._parse_with_selenium(url, article)
+        return self._parse_with_selenium(url, article, since)
+    
+    def parse_reviews_browser(self, url: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Парсинг только через Selenium, без попытки API; None - отзывы не получены"""
+        article = self._extract_article(url)
+        if not article:
+            return None
+        return self._parse_with_selenium(url, article, since)
     
-    def _try_api_method(self, article: str) -> List[Dict]:
-        """Попытка получить отзывы через API"""
+    def _try_api_method(self, article: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Попытка получить отзывы через API (None - API недоступен)"""
         reviews = []
-        
-        if not self.session or not requests:
-            return reviews
-        
         try:
-            # Пробуем получить отзывы через неофициальный API
-            api_url = "https://feedbacks1.wildberries.ru/api/v1/summary/full"
-            
-            params = {
-                'nmId': article,
-                'skip': 0,
-                'take': 100
-            }
-            
-            headers = {
-                'Referer': f'https://www.wildberries.ru/catalog/{article}/detail.aspx'
-            }
-            
-            response = self.session.get(api_url, params=params, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    if 'feedbacks' in data:
-                        for feedback in data['feedbacks']:
-                            try:
-                                review_text = feedback.get('text', '')
-                                if not review_text or len(review_text) < 10:
-                                    continue
-                                
-                                # Парсим дату
-                                date_str = feedback.get('createdDate', '')
-                                date = datetime.now()
-                                if date_str:
-                                    try:
-                                        date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                                    except:
-                                        pass
-                                
-                                reviews.append({
-                                    "author": feedback.get('wbUserDetails', {}).get('name', 'Аноним'),
-                                    "rating": feedback.get('productValuation', 0),
-                                    "text": review_text,
-                                    "date": date
-                                })
-                            except Exception as e:
-                                print(f"⚠️ Ошибка парсинга отзыва из API: {e}")
-                                continue
-                except json.JSONDecodeError:
-                    pass
+            # Обходим все страницы неофициального API отзывов
+            client = WildberriesFeedbacksClient(timeout=10)
+            # Страницы копятся в памяти до конца парсинга - курсор обхода не используется
+            for pages, page in enumerate(client.iter_pages(article, since=since), 1):
+                reviews.extend(page)
+                self._report_progress(strategy="api", pages=pages, reviews=len(reviews))
         except Exception as e:
             print(f"⚠️ API метод не сработал: {e}")
+            return reviews or None
         
         return reviews
     
-    def _parse_with_selenium(self, url: str, article: str) -> List[Dict]:
-        """Парсинг через Selenium"""
+    def _parse_with_selenium(self, url: str, article: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Парсинг через Selenium; None - браузер не запустился или отзывы не получены"""
         if not self.driver:
-            return []
+            return None
         
         reviews = []
         
@@ -219,143 +191,48 @@ class WildberriesParser(BaseParser):
             self._wait_for_page_load()
             time.sleep(5)
             
+            # Название, цена и рейтинг - с той же страницы, без отдельного запуска браузера
+            self._capture_product(selenium_evaluate(self.driver))
+            
             # Прокручиваем страницу
             print("📜 Прокручиваю страницу...")
-            for i in range(10):
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
-                
-                # Ищем кнопки "Показать еще"
-                try:
-                    buttons = self.driver.find_elements(By.TAG_NAME, "button")
-                    for btn in buttons:
-                        try:
-                            if not btn.is_displayed():
-                                continue
-                            btn_text = btn.text.lower()
-                            if any(word in btn_text for word in ["показать", "загрузить", "еще", "ещё"]):
-                                self.driver.execute_script("arguments[0].click();", btn)
-                                print(f"✅ Кликнул: {btn.text}")
-                                time.sleep(3)
-                        except:
-                            continue
-                except:
-                    pass
+            loaded = self._load_reviews(selenium_evaluate(self.driver), "wildberries", "selenium", since)
+            if loaded.reason == "cancelled":
+                print("⏹️ Парсинг отменен")
+            elif loaded.reason == "since":
+                print("✅ Дошли до уже загруженных отзывов")
+            else:
+                print(f"✅ Загрузка завершена: {loaded.count} элементов отзывов")
             
             # Парсим HTML
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            reviews = self._parse_html_reviews(soup)
+            document = parse_html(self.driver.page_source)
+            reviews = self._browser_result(self._parse_html_reviews(document), since)
             
-            print(f"✅ Найдено отзывов: {len(reviews)}")
+            print(f"✅ Найдено отзывов: {len(reviews or [])}")
             
         except Exception as e:
             print(f"❌ Ошибка парсинга через Selenium: {e}")
             import traceback
             print(traceback.format_exc())
+            return None
         
         return reviews
     
-    def _parse_html_reviews(self, soup: BeautifulSoup) -> List[Dict]:
+    def _parse_html_reviews(self, document) -> List[Dict]:
         """Парсинг отзывов из HTML"""
-        reviews = []
-        seen_texts = set()
-        
-        # Ищем все возможные контейнеры отзывов
-        selectors = [
-            'div[class*="feedback"]',
-            'div[class*="review"]',
-            'div[class*="comment"]',
-            '[data-feedback-id]',
-            'article',
-            '.feedback-item',
-            '.review-item'
-        ]
-        
-        containers = []
-        for selector in selectors:
-            try:
-                elements = soup.select(selector)
-                containers.extend(elements)
-            except:
-                continue
-        
-        print(f"🔍 Найдено {len(containers)} потенциальных контейнеров")
-        
-        for container in containers:
-            try:
-                text = container.get_text(separator=' ', strip=True)
-                
-                if len(text) < 30:
-                    continue
-                
-                # Очищаем от служебной информации
-                lines = text.split('\n')
-                clean_lines = []
-                for line in lines:
-                    line = line.strip()
-                    if len(line) > 15 and not any(skip in line.lower() for skip in 
-                        ['отзыв', 'оценка', 'рейтинг', 'cookie', 'политика', 'согласие']):
-                        clean_lines.append(line)
-                
-                review_text = ' '.join(clean_lines)
-                
-                if len(review_text) < 20:
-                    continue
-                
-                # Проверяем дубликаты
-                text_hash = hash(review_text[:100])
-                if text_hash in seen_texts:
-                    continue
-                seen_texts.add(text_hash)
-                
-                # Автор
-                author = "Аноним"
-                author_elem = container.find(['strong', 'b', 'span'], 
-                    class_=lambda x: x and ('author' in str(x).lower() or 'user' in str(x).lower()))
-                if not author_elem:
-                    author_elem = container.find(['strong', 'b'])
-                if author_elem:
-                    author = author_elem.get_text(strip=True)
-                    if len(author) > 50:
-                        author = "Аноним"
-                
-                # Рейтинг
-                rating = 0
-                stars = container.find_all(['span', 'div', 'i'], 
-                    class_=lambda x: x and 'star' in str(x).lower())
-                if stars:
-                    filled = [s for s in stars if 'fill' in str(s.get('class', [])).lower() 
-                             or 'active' in str(s.get('class', [])).lower()]
-                    rating = len(filled)
-                
-                if not rating:
-                    rating_match = re.search(r'(\d+)\s*(звезд|star|⭐)', container.get_text(), re.IGNORECASE)
-                    if rating_match:
-                        rating = int(rating_match.group(1))
-                
-                # Дата
-                date = datetime.now()
-                date_elem = container.find(['time', 'span', 'div'], 
-                    class_=lambda x: x and 'date' in str(x).lower())
-                if not date_elem:
-                    date_elem = container.find('time')
-                if date_elem:
-                    date_text = date_elem.get_text(strip=True) or date_elem.get('datetime', '')
-                    if date_text:
-                        date = self._parse_date(date_text)
-                
-                reviews.append({
-                    "author": author,
-                    "rating": rating,
-                    "text": review_text,
-                    "date": date
-                })
-                
-            except Exception as e:
-                print(f"⚠️ Ошибка парсинга контейнера: {e}")
-                continue
-        
-        return reviews
+        return extract_reviews(
+            document,
+            [
+                'div[class*="feedback"]',
+                'div[class*="review"]',
+                'div[class*="comment"]',
+                '[data-feedback-id]',
+                'article',
+                '.feedback-item',
+                '.review-item'
+            ],
+            skip_words=['отзыв', 'оценка', 'рейтинг', 'cookie', 'политика', 'согласие']
+        )
     
     def parse_reviews_old(self, url: str) -> List[Dict]:
         """Парсинг отзывов с Wildberries напрямую со страницы"""
@@ -528,13 +405,13 @@ class WildberriesParser(BaseParser):
                 print(f"📊 Содержит 'отзыв': {'отзыв' in page_source.lower()}")
                 print(f"📊 Содержит 'feedback': {'feedback' in page_source.lower()}")
                 
-                soup = BeautifulSoup(page_source, 'html.parser')
-                reviews = self._parse_from_html_improved(soup)
+                document = parse_html(page_source)
+                reviews = self._parse_from_html_improved(document)
                 
                 # Если не нашли, пробуем альтернативный метод
                 if len(reviews) == 0:
                     print("🔄 Пробую альтернативный метод парсинга...")
-                    reviews = self._parse_alternative_method(soup)
+                    reviews = self._parse_alternative_method(BeautifulSoup(page_source, 'html.parser'))
             
             print(f"✅ Итого найдено отзывов: {len(reviews)}")
             
@@ -546,18 +423,10 @@ class WildberriesParser(BaseParser):
         return reviews
     
     
-    def _parse_from_html_improved(self, soup: BeautifulSoup) -> List[Dict]:
+    def _parse_from_html_improved(self, document) -> List[Dict]:
         """Улучшенный парсинг отзывов - ищет по всем возможным признакам"""
-        reviews = []
-        
-        # Ищем все элементы, которые могут содержать отзывы
-        # Пробуем найти по классам, data-атрибутам, структуре
-        
-        # 1. Ищем по известным классам WB
-        review_containers = []
-        
-        # Различные селекторы для контейнеров отзывов
-        container_selectors = [
+        # 1. Различные селекторы для контейнеров отзывов (один проход по дереву)
+        review_containers = document.select([
             'div[class*="feedback"]',
             'div[class*="review"]',
             'div[class*="comment"]',
@@ -565,118 +434,30 @@ class WildberriesParser(BaseParser):
             '[data-feedback-id]',
             '[id*="feedback"]',
             '[id*="review"]'
-        ]
-        
-        for selector in container_selectors:
-            try:
-                elements = soup.select(selector)
-                review_containers.extend(elements)
-            except:
-                continue
-        
-        print(f"🔍 Найдено {len(review_containers)} потенциальных контейнеров отзывов")
+        ])
         
         # 2. Если не нашли по селекторам, ищем по структуре - ищем div с текстом похожим на отзыв
         if not review_containers:
             print("🔍 Ищу отзывы по структуре текста...")
-            all_divs = soup.find_all('div')
-            for div in all_divs:
-                text = div.get_text(strip=True)
+            for div in document.find_all(['div']):
+                text = div.text(separator='')
                 # Отзыв обычно содержит несколько предложений
                 if len(text) > 50 and text.count('.') >= 1:
                     # Проверяем, нет ли рядом элементов, указывающих на отзыв
-                    parent = div.parent
+                    parent = div.parent()
                     if parent:
-                        parent_text = parent.get_text(strip=True).lower()
+                        parent_text = parent.text(separator='').lower()
                         if any(word in parent_text for word in ['отзыв', 'feedback', 'оценка', 'рейтинг']):
                             review_containers.append(div)
         
-        print(f"📦 Всего найдено {len(review_containers)} потенциальных контейнеров")
-        
         # 3. Парсим каждый контейнер
-        seen_texts = set()
-        for container in review_containers:
-            try:
-                # Извлекаем текст
-                full_text = container.get_text(separator=' ', strip=True)
-                
-                # Ищем основной текст отзыва (самый длинный параграф)
-                paragraphs = container.find_all(['p', 'div', 'span'])
-                review_text = ""
-                for p in paragraphs:
-                    p_text = p.get_text(strip=True)
-                    if len(p_text) > len(review_text) and len(p_text) > 30:
-                        review_text = p_text
-                
-                if not review_text or len(review_text) < 20:
-                    review_text = full_text
-                
-                # Убираем служебную информацию
-                lines = review_text.split('\n')
-                clean_lines = []
-                for line in lines:
-                    line = line.strip()
-                    # Пропускаем короткие строки и служебные
-                    if len(line) > 15 and not any(skip in line.lower() for skip in ['отзыв', 'оценка', 'рейтинг', 'звезд', '⭐']):
-                        clean_lines.append(line)
-                
-                review_text = ' '.join(clean_lines)
-                
-                if len(review_text) < 20:
-                    continue
-                
-                # Проверяем на дубликаты
-                text_hash = hash(review_text[:100])
-                if text_hash in seen_texts:
-                    continue
-                seen_texts.add(text_hash)
-                
-                # Извлекаем автора
-                author = "Аноним"
-                author_elem = container.find(['strong', 'b', 'span'], class_=lambda x: x and ('author' in str(x).lower() or 'user' in str(x).lower()))
-                if not author_elem:
-                    author_elem = container.find(['strong', 'b'])
-                if author_elem:
-                    author = author_elem.get_text(strip=True)
-                    if len(author) > 50:  # Слишком длинное - не имя
-                        author = "Аноним"
-                
-                # Извлекаем рейтинг
-                rating = 0
-                # Ищем звезды
-                stars = container.find_all(['span', 'div', 'i'], class_=lambda x: x and 'star' in str(x).lower())
-                if stars:
-                    rating = len([s for s in stars if 'fill' in str(s.get('class', [])).lower() or 'active' in str(s.get('class', [])).lower()])
-                
-                # Ищем число рейтинга
-                if not rating:
-                    rating_match = re.search(r'(\d+)\s*(звезд|star|⭐)', container.get_text(), re.IGNORECASE)
-                    if rating_match:
-                        rating = int(rating_match.group(1))
-                
-                # Извлекаем дату
-                date = datetime.now()
-                date_elem = container.find(['time', 'span', 'div'], class_=lambda x: x and 'date' in str(x).lower())
-                if not date_elem:
-                    date_elem = container.find('time')
-                if date_elem:
-                    date_text = date_elem.get_text(strip=True) or date_elem.get('datetime', '')
-                    if date_text:
-                        date = self._parse_date(date_text)
-                
-                reviews.append({
-                    "author": author,
-                    "rating": rating,
-                    "text": review_text,
-                    "date": date
-                })
-                
-            except Exception as e:
-                print(f"⚠️ Ошибка парсинга контейнера: {e}")
-                continue
-        
-        print(f"✅ Распарсено {len(reviews)} уникальных отзывов")
-        return reviews
+        return extract_reviews(
+            document,
+            [],
+            skip_words=['отзыв', 'оценка', 'рейтинг', 'звезд', '⭐'],
+            longest_paragraph=True,
+            containers=review_containers
+        )
     
     def _parse_alternative_method(self, soup: BeautifulSoup) -> List[Dict]:
         """Альтернативный метод - ищем любой текст, похожий на отзыв"""
@@ -713,7 +494,7 @@ class WildberriesParser(BaseParser):
                         # Извлекаем данные
                         author = "Аноним"
                         rating = 0
-                        date = datetime.now()
+                        date = None
                         
                         # Ищем автора в родительском элементе
                         author_elem = parent.find(['strong', 'b', 'span'], string=re.compile(r'[А-ЯЁ][а-яё]+'))
@@ -854,14 +635,10 @@ class WildberriesParser(BaseParser):
                             rating = int(rating_match.group(1))
                 
                 # Дата
-                date = datetime.now()
+                date = None
                 date_elem = element.select_one('time, [class*="date"], [datetime]')
                 if date_elem:
-                    date_text = date_elem.get_text(strip=True)
-                    if not date_text:
-                        date_text = date_elem.get('datetime', '')
-                    if date_text:
-                        date = self._parse_date(date_text)
+                    date = review_date(date_elem.get_text(strip=True), date_elem.get('datetime'))
                 
                 reviews.append({
                     "author": author,
@@ -970,7 +747,7 @@ class WildberriesParser(BaseParser):
                                 author: author,
                                 rating: rating,
                                 text: cleanText,
-                                date: dateText || new Date().toISOString()
+                                date: dateText
                             });
                         }
                     } catch(e) {
@@ -986,9 +763,7 @@ class WildberriesParser(BaseParser):
             if result:
                 for item in result:
                     try:
-                        date = datetime.now()
-                        if item.get('date'):
-                            date = self._parse_date(item['date'])
+                        date = review_date(item.get('date'))
                         
                         reviews.append({
                             "author": item.get('author', 'Аноним'),
@@ -1003,41 +778,6 @@ class WildberriesParser(BaseParser):
         
         return reviews
     
-    def _parse_date(self, date_text: str) -> datetime:
-        """Парсинг даты из текста"""
-        try:
-            # Различные форматы дат
-            patterns = [
-                r'(\d{1,2})\.(\d{1,2})\.(\d{4})',  # 26.11.2024
-                r'(\d{4})-(\d{2})-(\d{2})',  # 2024-11-26
-                r'(\d{1,2})\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\s+(\d{4})',  # 26 ноября 2024
-            ]
-            
-            months = {
-                'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
-                'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
-                'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
-            }
-            
-            for pattern in patterns:
-                match = re.search(pattern, date_text.lower())
-                if match:
-                    if len(match.groups()) == 3:
-                        if match.group(2) in months:
-                            day, month_name, year = match.groups()
-                            month = months[month_name]
-                            return datetime(int(year), month, int(day))
-                        else:
-                            parts = list(match.groups())
-                            if len(parts[0]) == 4:  # YYYY-MM-DD
-                                return datetime(int(parts[0]), int(parts[1]), int(parts[2]))
-                            else:  # DD.MM.YYYY
-                                return datetime(int(parts[2]), int(parts[1]), int(parts[0]))
-        except:
-            pass
-        
-        return datetime.now()
-    
     def __del__(self):
         """Закрытие браузера при удалении объекта"""
         if self.driver:
@@ -1046,3 +786,5 @@ class WildberriesParser(BaseParser):
             except:
                 pass
 
+
+register_parser("wildberries", "selenium", WildberriesParser, "parse_reviews_browser", hedge=False, name_order=0)
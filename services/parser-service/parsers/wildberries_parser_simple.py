@@ -60,7 +60,7 @@ class WildberriesParserSimple(BaseParser):
             pass
         return None
     
-    def parse_reviews(self, url: str) -> List[Dict]:
+    def parse_reviews(self, url: str, since: Optional[datetime] = None) -> List[Dict]:
         """Парсинг отзывов через API"""
         article = self._extract_article(url)
         if not article:
@@ -98,6 +98,7 @@ class WildberriesParserSimple(BaseParser):
                             "date": date
                         })
                     
+                    reviews = self._filter_since(reviews, since)
                     if reviews:
                         print(f"✅ API вернул {len(reviews)} отзывов")
                         return reviews
@@ -151,7 +152,7 @@ class WildberriesParserSimple(BaseParser):
                 except:
                     pass
         
-        return reviews
+        return self._filter_since(reviews, since)
     
     def __del__(self):
         if self.driver:
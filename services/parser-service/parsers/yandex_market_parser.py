@@ -4,7 +4,6 @@
 from typing import List, Dict, Optional
 from datetime import datetime
 import re
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -14,7 +13,12 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import undetected_chromedriver as uc
 import time
 import random
+from .html_backend import parse_html
+from .html_reviews import extract_reviews
+from .dates import review_date
+from .registry import register_parser
 from .base_parser import BaseParser
+from .scroll import selenium_evaluate
 
 
 class YandexMarketParser(BaseParser):
@@ -23,7 +27,7 @@ class YandexMarketParser(BaseParser):
     def __init__(self):
         super().__init__()
         self.driver = None
-        self._init_driver()
+        self._start_driver()
     
     def _init_driver(self):
         """Инициализация браузера с обходом детекции"""
@@ -126,10 +130,10 @@ class YandexMarketParser(BaseParser):
             print(f"Ошибка получения названия товара: {e}")
             return None
     
-    def parse_reviews(self, url: str) -> List[Dict]:
-        """Парсинг отзывов с Яндекс.Маркета"""
+    def parse_reviews(self, url: str, since: Optional[datetime] = None) -> Optional[List[Dict]]:
+        """Парсинг отзывов с Яндекс.Маркета; None - браузер не запустился или отзывы не получены"""
         if not self.driver:
-            return []
+            return None
         
         reviews = []
         
@@ -204,72 +208,38 @@ class YandexMarketParser(BaseParser):
                         except:
                             continue
             
+            # Название, цена и рейтинг - с той же страницы, без отдельного запуска браузера
+            self._capture_product(selenium_evaluate(self.driver))
+            
             # Прокручиваем и загружаем отзывы
             print("📜 Прокручиваю страницу для загрузки отзывов...")
-            last_review_count = 0
-            no_change_iterations = 0
-            
-            for i in range(20):
-                # Прокручиваем вниз
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
-                
-                # Ждем загрузки
-                time.sleep(1)
-                
-                # Проверяем количество отзывов
-                current_count = self.driver.execute_script("""
-                    return document.querySelectorAll('[class*="review"], [class*="отзыв"], [data-auto*="review"]').length;
-                """)
-                
-                if current_count > last_review_count:
-                    last_review_count = current_count
-                    no_change_iterations = 0
-                    print(f"📊 Найдено элементов отзывов: {current_count}")
-                else:
-                    no_change_iterations += 1
-                
-                # Ищем кнопки "Показать еще"
-                try:
-                    buttons = self.driver.find_elements(By.TAG_NAME, "button")
-                    for btn in buttons:
-                        try:
-                            if not btn.is_displayed():
-                                continue
-                            btn_text = btn.text.lower()
-                            if any(word in btn_text for word in ["показать", "загрузить", "еще", "more", "ещё"]):
-                                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", btn)
-                                time.sleep(0.5)
-                                self.driver.execute_script("arguments[0].click();", btn)
-                                print(f"✅ Кликнул: {btn.text}")
-                                time.sleep(4)
-                                no_change_iterations = 0
-                        except:
-                            continue
-                except:
-                    pass
-                
-                if no_change_iterations >= 5:
-                    print("✅ Загрузка завершена")
-                    break
+            loaded = self._load_reviews(selenium_evaluate(self.driver), "yandex-market", "selenium", since)
+            if loaded.reason == "cancelled":
+                print("⏹️ Парсинг отменен")
+            elif loaded.reason == "since":
+                print("✅ Дошли до уже загруженных отзывов")
+            else:
+                print(f"✅ Загрузка завершена: {loaded.count} элементов отзывов")
             
             # Парсим отзывы
             print("🔍 Парсю отзывы из HTML...")
             page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
-            reviews = self._parse_from_html(soup)
+            document = parse_html(page_source)
+            reviews = self._parse_from_html(document)
             
             # Если не нашли, пробуем через JavaScript
             if len(reviews) == 0:
                 print("🔄 Пробую извлечь через JavaScript...")
                 reviews = self._extract_reviews_via_js()
             
-            print(f"✅ Итого найдено отзывов: {len(reviews)}")
+            reviews = self._browser_result(reviews, since)
+            print(f"✅ Итого найдено отзывов: {len(reviews or [])}")
             
         except Exception as e:
             print(f"❌ Ошибка парсинга отзывов Яндекс.Маркета: {e}")
             import traceback
             print(traceback.format_exc())
+            return None
         
         return reviews
     
@@ -340,7 +310,7 @@ class YandexMarketParser(BaseParser):
                                 author: author,
                                 rating: rating,
                                 text: cleanText,
-                                date: dateText || new Date().toISOString()
+                                date: dateText
                             });
                         }
                     } catch(e) {}
@@ -354,9 +324,7 @@ class YandexMarketParser(BaseParser):
             if result:
                 for item in result:
                     try:
-                        date = datetime.now()
-                        if item.get('date'):
-                            date = self._parse_date(item['date'])
+                        date = review_date(item.get('date'))
                         
                         reviews.append({
                             "author": item.get('author', 'Аноним'),
@@ -371,134 +339,18 @@ class YandexMarketParser(BaseParser):
         
         return reviews
     
-    def _parse_from_html(self, soup: BeautifulSoup) -> List[Dict]:
+    def _parse_from_html(self, document) -> List[Dict]:
         """Парсинг отзывов из HTML"""
-        reviews = []
-        
-        # Селекторы для Яндекс.Маркета
-        review_selectors = [
-            '[class*="review"]',
-            '[data-auto*="review"]',
-            '[class*="отзыв"]',
-            'article[class*="review"]',
-            '[data-zone-name*="review"]'
-        ]
-        
-        review_containers = []
-        for selector in review_selectors:
-            try:
-                elements = soup.select(selector)
-                review_containers.extend(elements)
-            except:
-                continue
-        
-        print(f"🔍 Найдено {len(review_containers)} потенциальных контейнеров отзывов")
-        
-        seen_texts = set()
-        for container in review_containers:
-            try:
-                text = container.get_text(separator=' ', strip=True)
-                
-                if len(text) < 30:
-                    continue
-                
-                # Очищаем текст
-                lines = text.split('\n')
-                clean_lines = []
-                for line in lines:
-                    line = line.strip()
-                    if len(line) > 15 and not any(skip in line.lower() for skip in ['отзыв', 'оценка', 'рейтинг', 'cookie']):
-                        clean_lines.append(line)
-                
-                review_text = ' '.join(clean_lines)
-                
-                if len(review_text) < 20:
-                    continue
-                
-                # Проверяем дубликаты
-                text_hash = hash(review_text[:100])
-                if text_hash in seen_texts:
-                    continue
-                seen_texts.add(text_hash)
-                
-                # Автор
-                author = "Аноним"
-                author_elem = container.find(['strong', 'b', 'span'], class_=lambda x: x and ('author' in str(x).lower() or 'user' in str(x).lower()))
-                if not author_elem:
-                    author_elem = container.find(['strong', 'b'])
-                if author_elem:
-                    author = author_elem.get_text(strip=True)
-                    if len(author) > 50:
-                        author = "Аноним"
-                
-                # Рейтинг
-                rating = 0
-                stars = container.find_all(['span', 'div', 'i'], class_=lambda x: x and 'star' in str(x).lower())
-                if stars:
-                    rating = len([s for s in stars if 'fill' in str(s.get('class', [])).lower() or 'active' in str(s.get('class', [])).lower()])
-                
-                if not rating:
-                    rating_match = re.search(r'(\d+)\s*(звезд|star|⭐)', container.get_text(), re.IGNORECASE)
-                    if rating_match:
-                        rating = int(rating_match.group(1))
-                
-                # Дата
-                date = datetime.now()
-                date_elem = container.find(['time', 'span', 'div'], class_=lambda x: x and 'date' in str(x).lower())
-                if not date_elem:
-                    date_elem = container.find('time')
-                if date_elem:
-                    date_text = date_elem.get_text(strip=True) or date_elem.get('datetime', '')
-                    if date_text:
-                        date = self._parse_date(date_text)
-                
-                reviews.append({
-                    "author": author,
-                    "rating": rating,
-                    "text": review_text,
-                    "date": date
-                })
-                
-            except Exception as e:
-                print(f"⚠️ Ошибка парсинга контейнера: {e}")
-                continue
-        
-        print(f"✅ Распарсено {len(reviews)} уникальных отзывов")
-        return reviews
-    
-    def _parse_date(self, date_text: str) -> datetime:
-        """Парсинг даты из текста"""
-        try:
-            patterns = [
-                r'(\d{1,2})\.(\d{1,2})\.(\d{4})',  # 26.11.2024
-                r'(\d{4})-(\d{2})-(\d{2})',  # 2024-11-26
-                r'(\d{1,2})\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\s+(\d{4})',
+        return extract_reviews(
+            document,
+            [
+                '[class*="review"]',
+                '[data-auto*="review"]',
+                '[class*="отзыв"]',
+                'article[class*="review"]',
+                '[data-zone-name*="review"]'
             ]
-            
-            months = {
-                'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
-                'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
-                'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
-            }
-            
-            for pattern in patterns:
-                match = re.search(pattern, date_text.lower())
-                if match:
-                    if len(match.groups()) == 3:
-                        if match.group(2) in months:
-                            day, month_name, year = match.groups()
-                            month = months[month_name]
-                            return datetime(int(year), month, int(day))
-                        else:
-                            parts = list(match.groups())
-                            if len(parts[0]) == 4:  # YYYY-MM-DD
-                                return datetime(int(parts[0]), int(parts[1]), int(parts[2]))
-                            else:  # DD.MM.YYYY
-                                return datetime(int(parts[2]), int(parts[1]), int(parts[0]))
-        except:
-            pass
-        
-        return datetime.now()
+        )
     
     def __del__(self):
         """Закрытие браузера при удалении объекта"""
@@ -508,3 +360,5 @@ class YandexMarketParser(BaseParser):
             except:
                 pass
 
+
+register_parser("yandex-market", "selenium", YandexMarketParser, hedge=False, name_order=1)
@@ -0,0 +1,279 @@
+"""
+Массовый импорт товаров из CSV или NDJSON
+Тело запроса читается потоком и обрабатывается пачками по PRODUCT_IMPORT_BATCH_SIZE строк:
+маркетплейс определяется по URL, повторы внутри файла отсекаются множеством уже встреченных
+URL, а товары пачки вставляются одним INSERT ... ON CONFLICT (url) DO NOTHING RETURNING -
+уже существующие URL отсеиваются той же операцией, без запроса на каждую строку.
+Для новых товаров можно сразу создать задачи парсинга - их выдает планировщик обхода
+с лимитами по маркетплейсам (см. crawl_scheduler.py).
+
+Форматы:
+    CSV:    url[,name[,marketplace]], строка заголовка необязательна
+    NDJSON: {"url": "...", "name": "...", "marketplace": "..."} или просто "url" в строке
+"""
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from datetime import datetime
+from urllib.parse import urlsplit
+import codecs
+import csv
+import json
+import logging
+import os
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database import Product, ParseJob
+from parsers import registry as parser_registry
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк вставляется одним запросом (и фиксируется одной транзакцией)
+PRODUCT_IMPORT_BATCH_SIZE = int(os.getenv("PRODUCT_IMPORT_BATCH_SIZE", "500"))
+# Предельное число строк в одном импорте; остальные строки не читаются
+PRODUCT_IMPORT_MAX_ROWS = int(os.getenv("PRODUCT_IMPORT_MAX_ROWS", "20000"))
+# Сколько ошибок строк возвращается в ответе (считаются все)
+PRODUCT_IMPORT_MAX_ERRORS = 100
+
+IMPORT_FORMATS = ("csv", "ndjson")
+CSV_COLUMNS = ("url", "name", "marketplace")
+
+
+def detect_marketplace(url: str) -> str:
+    """Определение маркетплейса по URL"""
+    url_lower = url.lower()
+    if "wildberries.ru" in url_lower or "wb.ru" in url_lower:
+        return "wildberries"
+    elif "ozon.ru" in url_lower or "ozon.com" in url_lower:
+        return "ozon"
+    elif "yandex.ru/market" in url_lower or "market.yandex.ru" in url_lower or "yandex.ru/market" in url_lower:
+        return "yandex-market"
+    elif "aliexpress.ru" in url_lower or "aliexpress.com" in url_lower:
+        return "aliexpress"
+    else:
+        return "unknown"
+
+
+def import_format(content_type: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """Формат импорта из параметра format или Content-Type (None - определить по первой строке)"""
+    if requested:
+        return requested.lower()
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json-seq" in content_type:
+        return "ndjson"
+    return None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Строки тела запроса по мере чтения (UTF-8, BOM и \\r\\n учитываются)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+class RowParser:
+    """Разбор строк импорта в словари {url, name, marketplace}; ошибки строки - ValueError"""
+
+    def __init__(self, fmt: Optional[str] = None):
+        self.format = fmt
+        self.columns: Optional[List[str]] = None
+
+    def parse(self, line: str) -> Optional[Dict]:
+        """Строка файла -> товар; None для пустых строк и заголовка CSV"""
+        if not line.strip():
+            return None
+        if self.format is None:
+            self.format = "ndjson" if line.lstrip().startswith("{") else "csv"
+        if self.format == "ndjson":
+            return self._parse_json(line)
+        return self._parse_csv(line)
+
+    def _parse_json(self, line: str) -> Dict:
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"некорректный JSON: {e}")
+        if isinstance(value, str):
+            value = {"url": value}
+        if not isinstance(value, dict):
+            raise ValueError("ожидается объект с полем url")
+        return {column: value.get(column) for column in CSV_COLUMNS}
+
+    def _parse_csv(self, line: str) -> Optional[Dict]:
+        cells = [cell.strip() for cell in next(csv.reader([line]))]
+        if self.columns is None:
+            lowered = [cell.lower() for cell in cells]
+            if "url" in lowered:
+                self.columns = lowered
+                return None
+            self.columns = list(CSV_COLUMNS)
+        row = dict(zip(self.columns, cells))
+        return {column: row.get(column) for column in CSV_COLUMNS}
+
+
+def normalize_product_url(url: Optional[str]) -> str:
+    """Проверка URL товара (http/https с хостом); ошибка - ValueError"""
+    url = str(url or "").strip()
+    if not url:
+        raise ValueError("пустой URL")
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+        raise ValueError("URL должен начинаться с http:// или https://")
+    return url
+
+
+class ProductImport:
+    """
+    Импорт товаров пользователя пачками
+
+    schedule(job_id, marketplace, rank) вызывается для каждой созданной задачи парсинга
+    после фиксации пачки (None - задачи не создаются).
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        user_id: int,
+        fmt: Optional[str] = None,
+        schedule: Optional[Callable[[int, str, int], None]] = None,
+        full: bool = False,
+        batch_size: int = PRODUCT_IMPORT_BATCH_SIZE,
+        max_rows: int = PRODUCT_IMPORT_MAX_ROWS
+    ):
+        self.db = db
+        self.user_id = user_id
+        self.parser = RowParser(fmt)
+        self.schedule = schedule
+        self.full = full
+        self.batch_size = max(1, batch_size)
+        self.max_rows = max_rows
+        self.line = 0
+        self.rows = 0
+        self.seen = set()
+        self.batch: List[Dict] = []
+        self.created_ids: List[int] = []
+        self.existing = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.queued = 0
+        self.truncated = False
+        self.errors: List[Dict] = []
+
+    def _error(self, url: Optional[str], message: str):
+        self.invalid += 1
+        if len(self.errors) < PRODUCT_IMPORT_MAX_ERRORS:
+            self.errors.append({"line": self.line, "url": url, "error": message})
+
+    def add_line(self, line: str) -> bool:
+        """Строка файла; False - достигнут предел строк и чтение нужно прекратить"""
+        self.line += 1
+        try:
+            row = self.parser.parse(line)
+        except ValueError as e:
+            self._error(None, str(e))
+            return True
+        except csv.Error as e:
+            self._error(None, f"некорректная строка CSV: {e}")
+            return True
+        if row is None:
+            return True
+        if self.rows >= self.max_rows:
+            self.truncated = True
+            return False
+        self.rows += 1
+
+        try:
+            url = normalize_product_url(row["url"])
+        except ValueError as e:
+            self._error(row.get("url"), str(e))
+            return True
+        if url in self.seen:
+            self.duplicates += 1
+            return True
+        self.seen.add(url)
+
+        marketplace = str(row.get("marketplace") or "").strip().lower() or detect_marketplace(url)
+        if not parser_registry.is_supported(marketplace):
+            self._error(url, f"маркетплейс не поддерживается: {marketplace}")
+            return True
+
+        now = datetime.utcnow()
+        self.batch.append({
+            "user_id": self.user_id,
+            "name": str(row.get("name") or "").strip(),
+            "url": url,
+            "marketplace": marketplace,
+            "parsing_status": "idle",
+            "view_count": 0,
+            "created_at": now,
+            "updated_at": now,
+        })
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        return True
+
+    def add_lines(self, lines: List[str]) -> bool:
+        """
+        Несколько строк подряд (вызывается из пула потоков: add_line при заполнении пачки
+        делает синхронный INSERT); False - как у add_line
+        """
+        for line in lines:
+            if not self.add_line(line):
+                return False
+        return True
+
+    def flush(self):
+        """Вставка накопленной пачки одним запросом; существующие URL пропускаются"""
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        stmt = (
+            insert(Product)
+            .values(batch)
+            .on_conflict_do_nothing(index_elements=["url"])
+            .returning(Product.id, Product.marketplace)
+        )
+        created = self.db.execute(stmt).fetchall()
+        self.existing += len(batch) - len(created)
+        self.created_ids.extend(row.id for row in created)
+
+        jobs = []
+        if self.schedule and created:
+            jobs = self.db.execute(
+                insert(ParseJob)
+                .values([{"product_id": row.id, "full": self.full, "status": "queued"} for row in created])
+                .returning(ParseJob.id, ParseJob.product_id)
+            ).fetchall()
+            self.db.execute(
+                update(Product).where(Product.id.in_([row.id for row in created])).values(parsing_status="parsing")
+            )
+        self.db.commit()
+
+        marketplaces = {row.id: row.marketplace for row in created}
+        for job in jobs:
+            self.schedule(job.id, marketplaces[job.product_id], self.queued)
+            self.queued += 1
+        logger.info(f"📥 Импорт: пачка из {len(batch)} товаров, новых {len(created)}, в очереди {len(jobs)}")
+
+    def result(self) -> Dict:
+        return {
+            "format": self.parser.format,
+            "rows": self.rows,
+            "created": len(self.created_ids),
+            "existing": self.existing,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "queued": self.queued,
+            "truncated": self.truncated,
+            "product_ids": self.created_ids,
+            "errors": self.errors,
+        }
@@ -0,0 +1,179 @@
+"""
+Потоковая выгрузка отзывов товара в NDJSON или CSV
+Строки читаются серверным курсором (stream_results) порциями по REVIEWS_EXPORT_FETCH_SIZE
+и сразу кодируются в ответ - ни сервис, ни шлюз не собирают выгрузку в памяти целиком,
+поэтому товар с миллионом отзывов выгружается с тем же расходом памяти, что и с сотней.
+
+Наборы данных:
+    reviews - отзывы с тональностью и кратким содержанием (поля - как в /products/{id}/reviews)
+    daily   - сводка по дням: число отзывов, средние оценка и тональность, число по меткам
+"""
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence
+from datetime import date, datetime
+import csv
+import io
+import json
+import logging
+import os
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from database import Review
+from reviews_store import REVIEW_FIELDS, filter_reviews
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк серверный курсор отдает за одно обращение к БД
+REVIEWS_EXPORT_FETCH_SIZE = int(os.getenv("REVIEWS_EXPORT_FETCH_SIZE", "2000"))
+# Примерный размер куска ответа: строки копятся в буфере и отдаются кусками такого размера
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+EXPORT_DATASETS = ("reviews", "daily")
+DAILY_FIELDS = (
+    "day", "reviews", "average_rating", "average_sentiment", "positive", "negative", "neutral"
+)
+
+
+def export_filename(product_id: int, dataset: str, fmt: str) -> str:
+    return f"product-{product_id}-{dataset}.{fmt}"
+
+
+def dataset_fields(dataset: str, fields: Optional[Sequence[str]] = None) -> Sequence[str]:
+    """Колонки выгрузки: запрошенные поля отзывов или фиксированный состав сводки"""
+    if dataset == "daily":
+        return DAILY_FIELDS
+    return list(fields or REVIEW_FIELDS)
+
+
+def _reviews_query(db: Session, product_id: int, fields: Sequence[str], filters: Dict):
+    columns = [getattr(Review, field) for field in fields]
+    return filter_reviews(db.query(*columns), product_id, **filters).order_by(
+        Review.date.desc(), Review.id.desc()
+    )
+
+
+def _daily_query(db: Session, product_id: int, filters: Dict):
+    day = func.date(Review.date)
+    labels = [
+        func.sum(case((Review.sentiment_label == label, 1), else_=0)).label(label)
+        for label in ("positive", "negative", "neutral")
+    ]
+    return filter_reviews(
+        db.query(
+            day.label("day"),
+            func.count(Review.id).label("reviews"),
+            func.round(func.avg(Review.rating), 2).label("average_rating"),
+            func.round(func.avg(Review.sentiment), 3).label("average_sentiment"),
+            *labels
+        ),
+        product_id, **filters
+    ).group_by(day).order_by(day)
+
+
+def iter_export_rows(
+    db: Session,
+    product_id: int,
+    dataset: str = "reviews",
+    fields: Optional[Sequence[str]] = None,
+    fetch_size: int = REVIEWS_EXPORT_FETCH_SIZE,
+    **filters
+) -> Iterator[Dict]:
+    """
+    Строки выгрузки серверным курсором
+
+    yield_per включает stream_results: PostgreSQL (psycopg2) отдает строки именованным
+    курсором порциями по fetch_size, а не загружает весь результат в память клиента.
+    filters - ratings, sentiments, date_from, date_to (см. reviews_store.filter_reviews).
+    """
+    if dataset == "daily":
+        query = _daily_query(db, product_id, filters)
+    else:
+        query = _reviews_query(db, product_id, dataset_fields(dataset, fields), filters)
+    for row in query.yield_per(max(1, fetch_size)):
+        yield dict(row._mapping)
+
+
+def _plain(value):
+    """Значение ячейки для JSON/CSV: даты в ISO, Decimal из агрегатов - в float"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is not None and not isinstance(value, (str, int, float, bool)):
+        return float(value)
+    return value
+
+
+def _chunked(lines: Iterable[str]) -> Iterator[bytes]:
+    """Склейка строк в куски около EXPORT_CHUNK_BYTES, чтобы не писать в сокет по строке"""
+    buffer = io.StringIO()
+    for line in lines:
+        buffer.write(line)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_lines(rows: Iterable[Dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({key: _plain(value) for key, value in row.items()}, ensure_ascii=False) + "\n"
+
+
+def csv_lines(rows: Iterable[Dict], fields: Sequence[str]) -> Iterator[str]:
+    """CSV с заголовком; каждая строка проходит через csv.writer (кавычки, переводы строк в тексте)"""
+    line = io.StringIO()
+    writer = csv.writer(line)
+
+    def render(values) -> str:
+        line.seek(0)
+        line.truncate()
+        writer.writerow(values)
+        return line.getvalue()
+
+    yield render(fields)
+    for row in rows:
+        yield render(["" if row.get(field) is None else _plain(row.get(field)) for field in fields])
+
+
+def stream_export(
+    session_factory: Callable[[], Session],
+    product_id: int,
+    fmt: str = "ndjson",
+    dataset: str = "reviews",
+    fields: Optional[Sequence[str]] = None,
+    **filters
+) -> Iterator[bytes]:
+    """
+    Тело ответа выгрузки кусками байт
+
+    Сессия открывается внутри генератора и живет ровно столько, сколько идет передача:
+    ответ отдается уже после завершения обработчика запроса и его зависимостей.
+    """
+    db = session_factory()
+    exported = 0
+    try:
+        rows = iter_export_rows(db, product_id, dataset, fields, **filters)
+
+        def counted():
+            nonlocal exported
+            for row in rows:
+                exported += 1
+                yield row
+
+        if fmt == "csv":
+            lines = csv_lines(counted(), dataset_fields(dataset, fields))
+        else:
+            lines = ndjson_lines(counted())
+        yield from _chunked(lines)
+        logger.info(f"📤 Выгрузка товара {product_id} ({dataset}, {fmt}): {exported} строк")
+    except Exception as e:
+        # Заголовки уже отправлены - статус не изменить, поэтому обрыв виден по неполному телу
+        logger.error(f"❌ Выгрузка товара {product_id} прервана после {exported} строк: {e}")
+        raise
+    finally:
+        db.close()
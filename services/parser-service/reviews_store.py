@@ -0,0 +1,262 @@
+"""
+Сохранение отзывов в БД с дедупликацией по хешу содержимого
+"""
+from typing import Iterator, List, Dict, Optional, Sequence, Tuple
+from datetime import datetime
+import base64
+import logging
+import os
+from sqlalchemy import text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database import Review, normalize_date, review_content_hash
+
+logger = logging.getLogger(__name__)
+
+# Размер пачки для одного INSERT (ограничение на число параметров запроса)
+INSERT_BATCH_SIZE = 1000
+# Сколько отзывов читается за один запрос при обходе отзывов товара
+READ_BATCH_SIZE = int(os.getenv("REVIEWS_READ_BATCH_SIZE", "1000"))
+# Размер страницы отзывов в API: по умолчанию и предельный
+REVIEWS_PAGE_SIZE = int(os.getenv("REVIEWS_PAGE_SIZE", "50"))
+REVIEWS_PAGE_MAX = int(os.getenv("REVIEWS_PAGE_MAX", "200"))
+
+# Поля отзыва, которые можно запросить через fields=
+REVIEW_FIELDS = ("id", "product_id", "author", "rating", "text", "date", "sentiment", "sentiment_label", "summary")
+SENTIMENT_LABELS = ("positive", "negative", "neutral")
+
+
+def review_rows(product_id: int, reviews_data: List[Dict]) -> List[Dict]:
+    """Подготовка строк для вставки: нормализация дат и хеш, дубли внутри пачки отбрасываются"""
+    rows = []
+    seen = set()
+    now = datetime.utcnow()
+    for review_data in reviews_data:
+        # Без даты со страницы хеш считается без нее, а в БД пишется время сохранения
+        date = normalize_date(review_data["date"]) if review_data.get("date") else None
+        content_hash = review_content_hash(product_id, review_data["text"], date)
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        rows.append({
+            "product_id": product_id,
+            "author": review_data.get("author"),
+            "rating": review_data.get("rating"),
+            "text": review_data["text"],
+            "date": date or now.replace(microsecond=0),
+            "content_hash": content_hash,
+            "created_at": now
+        })
+    return rows
+
+
+def save_reviews(db: Session, product_id: int, reviews_data: List[Dict]) -> Tuple[int, int]:
+    """
+    Сохранение отзывов одним INSERT ... ON CONFLICT DO NOTHING на пачку
+
+    Returns:
+        (количество новых отзывов, количество пропущенных дубликатов)
+    """
+    rows = review_rows(product_id, reviews_data)
+    inserted = 0
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[start:start + INSERT_BATCH_SIZE]
+        stmt = (
+            insert(Review)
+            .values(batch)
+            .on_conflict_do_nothing(index_elements=["product_id", "content_hash"])
+            .returning(Review.id)
+        )
+        inserted += len(db.execute(stmt).fetchall())
+    return inserted, len(reviews_data) - inserted
+
+
+def iter_product_reviews(
+    db: Session,
+    product_id: int,
+    since: Optional[datetime] = None,
+    batch_size: int = READ_BATCH_SIZE
+) -> Iterator[List[Dict]]:
+    """
+    Отзывы товара пачками в формате парсеров (author, rating, text, date)
+
+    Пачки читаются по id (keyset), поэтому между ними можно фиксировать транзакцию.
+    """
+    last_id = 0
+    while True:
+        query = db.query(Review.id, Review.author, Review.rating, Review.text, Review.date).filter(
+            Review.product_id == product_id,
+            Review.id > last_id
+        )
+        if since:
+            query = query.filter(Review.date >= since)
+        rows = query.order_by(Review.id).limit(batch_size).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield [
+            {"author": row.author, "rating": row.rating, "text": row.text, "date": row.date}
+            for row in rows
+        ]
+
+
+def encode_cursor(date: datetime, review_id: int) -> str:
+    """Курсор страницы: позиция последнего отданного отзыва (date, id)"""
+    raw = f"{date.isoformat()}|{review_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбор курсора; некорректный курсор - ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date, review_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date), int(review_id)
+    except Exception:
+        raise ValueError("Некорректный курсор")
+
+
+def filter_reviews(
+    query,
+    product_id: int,
+    ratings: Optional[Sequence[int]] = None,
+    sentiments: Optional[Sequence[str]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    """Отзывы товара с фильтрами по оценке, тональности и периоду"""
+    query = query.filter(Review.product_id == product_id)
+    if ratings:
+        query = query.filter(Review.rating.in_(ratings))
+    if sentiments:
+        query = query.filter(Review.sentiment_label.in_(sentiments))
+    if date_from:
+        query = query.filter(Review.date >= date_from)
+    if date_to:
+        query = query.filter(Review.date <= date_to)
+    return query
+
+
+def review_page(
+    db: Session,
+    product_id: int,
+    limit: int = REVIEWS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Sequence[str] = REVIEW_FIELDS,
+    ratings: Optional[Sequence[int]] = None,
+    sentiments: Optional[Sequence[str]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Страница отзывов товара от новых к старым с keyset-пагинацией по (date, id)
+
+    Следующая страница начинается сразу после курсора по индексу (product_id, date, id),
+    поэтому любая страница стоит столько же, сколько первая (без OFFSET).
+
+    Returns:
+        (отзывы с полями fields, курсор следующей страницы или None)
+    """
+    columns = [getattr(Review, field) for field in fields]
+    query = filter_reviews(
+        db.query(Review.id.label("_id"), Review.date.label("_date"), *columns),
+        product_id, ratings, sentiments, date_from, date_to
+    )
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Review.date, Review.id) < tuple_(after_date, after_id))
+
+    rows = query.order_by(Review.date.desc(), Review.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]._date, rows[-1]._id)
+    return [{field: getattr(row, field) for field in fields} for row in rows], next_cursor
+
+
+def migrate_review_pagination(engine):
+    """Миграция: колонки тональности (если сервис анализа еще не создал) и индексы для постраничной выдачи"""
+    with engine.begin() as conn:
+        for column, column_type in (("sentiment", "DOUBLE PRECISION"), ("sentiment_label", "VARCHAR"), ("summary", "TEXT")):
+            conn.execute(text(f"ALTER TABLE reviews ADD COLUMN IF NOT EXISTS {column} {column_type}"))
+    # Индексы строятся без блокировки записи (CONCURRENTLY - вне транзакции)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reviews_product_date_id ON reviews (product_id, date, id)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reviews_product_sentiment_date_id "
+            "ON reviews (product_id, sentiment_label, date, id)"
+        ))
+    logger.info("✓ Индексы постраничной выдачи отзывов на месте")
+
+
+def migrate_content_hash(engine):
+    """
+    Миграция: колонка content_hash, заполнение для старых отзывов и уникальный индекс
+
+    Выполняется один раз: если уникальный индекс уже есть, таблица не сканируется.
+    Колонки анализа (sentiment_label, summary) должны уже существовать - см. migrate_review_pagination.
+    """
+    with engine.begin() as conn:
+        exists = conn.execute(text("""
+            SELECT 1 FROM pg_indexes
+            WHERE tablename = 'reviews' AND indexname = 'uq_reviews_product_content_hash'
+        """)).fetchone()
+        if exists:
+            return
+
+        result = conn.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name='reviews' AND column_name='content_hash'
+        """))
+        if not result.fetchone():
+            logger.info("🔄 Добавление колонки content_hash...")
+            conn.execute(text("ALTER TABLE reviews ADD COLUMN content_hash VARCHAR(64)"))
+            logger.info("✓ Колонка content_hash добавлена")
+
+    # Заполняем хеши для отзывов, сохраненных до появления колонки
+    backfilled = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text("""
+                SELECT id, product_id, text, date FROM reviews
+                WHERE content_hash IS NULL
+                ORDER BY id
+                LIMIT :limit
+            """), {"limit": INSERT_BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+            conn.execute(
+                text("UPDATE reviews SET content_hash = :content_hash WHERE id = :id"),
+                [
+                    {"id": row.id, "content_hash": review_content_hash(row.product_id, row.text, row.date)}
+                    for row in rows
+                ]
+            )
+            backfilled += len(rows)
+    if backfilled:
+        logger.info(f"✓ Хеши посчитаны для {backfilled} отзывов")
+
+    with engine.begin() as conn:
+        # Старые дубликаты не дадут построить уникальный индекс. Из каждой группы остается
+        # отзыв с результатами анализа (тональность, краткое содержание), при равенстве - самый ранний
+        deleted = conn.execute(text("""
+            DELETE FROM reviews r
+            USING (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY product_id, content_hash
+                    ORDER BY (sentiment_label IS NULL), (summary IS NULL), id
+                ) AS position
+                FROM reviews
+            ) ranked
+            WHERE r.id = ranked.id AND ranked.position > 1
+        """)).rowcount
+        if deleted:
+            logger.info(f"✓ Удалено {deleted} дубликатов отзывов")
+        conn.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_reviews_product_content_hash
+            ON reviews (product_id, content_hash)
+        """))
@@ -0,0 +1,113 @@
+"""
+Объединение одновременных парсингов одного и того же товара (singleflight)
+Пока по ключу (нормализованный URL, см. normalize_url) идет парсинг, остальные вызовы не запускают
+второй браузер, а ждут результат первого. Готовый результат еще ttl секунд
+отдается повторным вызовам из памяти.
+"""
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд результат парсинга переиспользуется повторными запросами
+PARSE_RESULT_TTL_SECONDS = int(os.getenv("PARSE_RESULT_TTL_SECONDS", "120"))
+
+
+# Параметры запроса, которые не меняют товар: метки источника перехода и рекламы.
+# Остальные параметры остаются в ключе - они могут задавать вариант товара (sku= у Яндекс.Маркета)
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = frozenset((
+    "at", "from", "clid", "ysclid", "yclid", "gclid", "fbclid", "erid", "srsltid",
+    "_openstat", "asb", "asb2", "avtc", "avte", "avts", "keywords", "sh", "targeturl",
+))
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def normalize_url(url: str) -> str:
+    """
+    URL товара без меток перехода, фрагмента и завершающего слеша, с хостом в нижнем регистре
+    Остальные параметры запроса сохраняются в порядке имен
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(name)
+    ))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.finished_at = 0.0
+
+
+class SingleFlight:
+    """Выполняет fn один раз на ключ среди одновременных вызовов и кеширует результат на ttl"""
+
+    def __init__(self, ttl: float = PARSE_RESULT_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Returns:
+            (результат, shared) - shared=True, если результат получен чужим вызовом
+        """
+        with self._lock:
+            self._evict_expired()
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            # Ошибку не кешируем: следующий вызов попробует заново
+            with self._lock:
+                self._calls.pop(key, None)
+            raise
+        finally:
+            call.finished_at = time.monotonic()
+            call.done.set()
+        if self.ttl <= 0:
+            with self._lock:
+                self._calls.pop(key, None)
+        return call.result, False
+
+    def forget(self, key: Hashable):
+        """Сбросить закешированный результат по ключу"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call and call.done.is_set():
+                self._calls.pop(key, None)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [
+            key for key, call in self._calls.items()
+            if call.done.is_set() and now - call.finished_at >= self.ttl
+        ]
+        for key in expired:
+            del self._calls[key]
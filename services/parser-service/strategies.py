@@ -0,0 +1,311 @@
+"""
+Стратегии получения отзывов и их гонка
+Для каждого маркетплейса есть упорядоченный список стратегий (API, Playwright, Selenium),
+их регистрируют модули парсеров (см. parsers/registry.py).
+Первая запускается сразу; если она не ответила за STRATEGY_HEDGE_DELAY_SECONDS, параллельно
+стартует следующая (hedged request). Отзывы отдаются пачками по мере получения (StrategyRace):
+ведущей становится первая стратегия, выдавшая отзывы, остальным выставляется событие отмены. Стратегии с hedge=False (тяжелый Selenium) запускаются только
+после неудачи всех предыдущих. Стратегии, которые сейчас не работают, отсекаются
+circuit breaker'ами (см. circuit_breaker.py).
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+import logging
+import os
+import queue
+import threading
+import time
+
+from circuit_breaker import BreakerRegistry, CircuitBreaker
+
+from parsers import registry
+from parsers.browser_pool import browser_pool
+from parsers.registry import NoResult
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд без ответа параллельно запускать следующую стратегию
+STRATEGY_HEDGE_DELAY_SECONDS = float(os.getenv("STRATEGY_HEDGE_DELAY_SECONDS", "8"))
+# Сколько пачек отзывов может ждать записи в БД (дальше стратегия ждет потребителя)
+STRATEGY_QUEUE_BATCHES = int(os.getenv("STRATEGY_QUEUE_BATCHES", "4"))
+
+# stream(url, since, progress, cancel_event) -> пачки отзывов; NoResult - стратегия не сработала
+StrategyStream = Callable[
+    [str, Optional[datetime], Optional[Callable[..., None]], threading.Event], Iterator[List[Dict]]
+]
+
+
+class Strategy:
+    """Способ получения отзывов: имя, потоковая функция запуска и можно ли запускать ее параллельно"""
+
+    def __init__(self, name: str, stream: StrategyStream, hedge: bool = True):
+        self.name = name
+        self.stream = stream
+        self.hedge = hedge
+
+    def __repr__(self):
+        return f"Strategy({self.name})"
+
+
+def parser_strategy(name: str, parser_cls, method: str = "parse_reviews", hedge: bool = True) -> Strategy:
+    """
+    Стратегия на основе метода парсера; браузер закрывается после завершения
+    Браузерные стратегии выполняются в воркерах пула (см. parsers/browser_pool.py)
+    """
+    if browser_pool.handles(name):
+        def pooled_stream(url, since, progress, cancel_event):
+            return browser_pool.stream(parser_cls, method, url, since=since, progress=progress, cancel_event=cancel_event)
+        return Strategy(name, pooled_stream, hedge=hedge)
+
+    def stream(url, since, progress, cancel_event):
+        parser = parser_cls()
+        parser.progress_callback = progress
+        parser.cancel_event = cancel_event
+        try:
+            yield from parser.stream_reviews(method, url, since=since)
+        finally:
+            driver = getattr(parser, "driver", None)
+            if driver:
+                try:
+                    logger.info("🔒 Закрытие браузера...")
+                    driver.quit()
+                except Exception as e:
+                    logger.warning(f"⚠️ Ошибка при закрытии браузера: {e}")
+    return Strategy(name, stream, hedge=hedge)
+
+
+def marketplace_strategies(marketplace: str) -> List[Strategy]:
+    """Стратегии маркетплейса в порядке запуска (только доступные в окружении)"""
+    return [
+        parser_strategy(entry.strategy, entry.parser_cls, entry.method, hedge=entry.hedge)
+        for entry in registry.parsers_for(marketplace)
+    ]
+
+
+class StrategyRace:
+    """
+    Гонка стратегий с отложенным параллельным запуском и потоковой выдачей отзывов
+
+    Итерация отдает пачки отзывов по мере их получения. Каждая стратегия работает в своем
+    потоке и передает пачки через очередь ограниченного размера, поэтому в памяти не больше
+    STRATEGY_QUEUE_BATCHES пачек. Первая стратегия, выдавшая отзывы, становится ведущей:
+    остальные отменяются и возвращаются в очередь, новые параллельно не запускаются. Если ведущая
+    падает посреди обхода, уже отданные пачки остаются у потребителя, а следующая стратегия
+    (в том числе отмененная) стартует сразу (повторы отсекает дедупликация при сохранении).
+
+    Если переданы breakers, стратегии с разомкнутым circuit breaker'ом пропускаются, а исход
+    каждого завершившегося запуска учитывается. Если отключены все, пробуются все по порядку.
+
+    После итерации strategy - имя стратегии, завершившей обход, или None, если не сработала
+    ни одна; found - сколько отзывов отдано.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        strategies: List[Strategy],
+        since: Optional[datetime] = None,
+        progress: Optional[Callable[..., None]] = None,
+        hedge_delay: float = STRATEGY_HEDGE_DELAY_SECONDS,
+        marketplace: Optional[str] = None,
+        breakers: Optional[BreakerRegistry] = None
+    ):
+        self.url = url
+        self.strategies = strategies
+        self.since = since
+        self.progress = progress
+        self.hedge_delay = hedge_delay
+        self.marketplace = marketplace
+        self.breakers = breakers
+        self.strategy: Optional[str] = None
+        self.found = 0
+
+    def _breaker(self, strategy: Strategy) -> Optional[CircuitBreaker]:
+        if self.breakers and self.marketplace:
+            return self.breakers.get(self.marketplace, strategy.name)
+        return None
+
+    def _pump(self, strategy: Strategy, cancel_event: threading.Event, events: queue.Queue):
+        """
+        Поток стратегии: пачки в очередь, в конце - итог (число отзывов или исключение)
+        cancel_event в событиях отличает этот запуск от повторного запуска той же стратегии
+        """
+        def put(item) -> bool:
+            while True:
+                try:
+                    events.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    if cancel_event.is_set():
+                        return False
+
+        found = 0
+        try:
+            batches = strategy.stream(self.url, self.since, self.progress, cancel_event)
+            try:
+                for batch in batches:
+                    if cancel_event.is_set():
+                        break
+                    if batch:
+                        found += len(batch)
+                        if not put(("batch", strategy, cancel_event, batch)):
+                            break
+            finally:
+                batches.close()
+        except BaseException as e:
+            put(("done", strategy, cancel_event, found, e))
+            return
+        put(("done", strategy, cancel_event, found, None))
+
+    def __iter__(self) -> Iterator[List[Dict]]:
+        events: queue.Queue = queue.Queue(maxsize=max(1, STRATEGY_QUEUE_BATCHES))
+        pending = list(self.strategies)
+        running: Dict[Strategy, Tuple[threading.Event, float]] = {}
+        leader: Optional[Strategy] = None
+        bypass_breakers = False
+        last_started = 0.0
+
+        def take_next() -> Optional[Strategy]:
+            while pending:
+                strategy = pending.pop(0)
+                breaker = self._breaker(strategy)
+                if breaker is None or bypass_breakers or breaker.allow():
+                    return strategy
+                logger.info(f"🚫 Стратегия {strategy.name} отключена circuit breaker'ом")
+            return None
+
+        def start(strategy: Strategy):
+            nonlocal last_started
+            cancel_event = threading.Event()
+            last_started = time.monotonic()
+            running[strategy] = (cancel_event, last_started)
+            threading.Thread(
+                target=self._pump, args=(strategy, cancel_event, events),
+                name=f"strategy-{strategy.name}", daemon=True
+            ).start()
+            logger.info(f"🏁 Запуск стратегии {strategy.name}")
+
+        def start_next() -> Optional[Strategy]:
+            """
+            Запуск следующей стратегии, пропуская отключенные breaker'ами
+            Тяжелая (hedge=False) стартует, только когда не осталось работающих, иначе
+            возвращается в начало очереди (и освобождает пробу breaker'а)
+            """
+            strategy = take_next()
+            if strategy is None:
+                return None
+            if running and not strategy.hedge:
+                pending.insert(0, strategy)
+                breaker = self._breaker(strategy)
+                if breaker:
+                    breaker.release()
+                return None
+            start(strategy)
+            return strategy
+
+        def current(strategy: Strategy, cancel_event: threading.Event) -> bool:
+            # Поздние пачки и итоги отмененного запуска игнорируются
+            return strategy in running and running[strategy][0] is cancel_event
+
+        def cancel_others(winner: Optional[Strategy] = None, requeue: bool = False):
+            """
+            Отмена всех работающих стратегий, кроме winner
+            requeue - вернуть отмененные в начало очереди: если ведущая упадет посреди обхода,
+            они запустятся снова в прежнем порядке
+            """
+            cancelled = [s for s in running if s is not winner]
+            if requeue:
+                pending[:0] = sorted(cancelled, key=self.strategies.index)
+            for other in cancelled:
+                cancel_event, _ = running.pop(other)
+                logger.info(f"⏹️ Отмена стратегии {other.name}")
+                cancel_event.set()
+                other_breaker = self._breaker(other)
+                if other_breaker:
+                    other_breaker.release()
+
+        try:
+            first = take_next()
+            if first is None and self.strategies:
+                logger.warning("⚠️ Все стратегии отключены circuit breaker'ами, пробую по порядку")
+                bypass_breakers = True
+                pending.extend(self.strategies)
+                first = take_next()
+            if first:
+                start(first)
+            while running:
+                # Пока ведущая стратегия отдает отзывы, параллельно ничего не запускаем
+                can_hedge = leader is None and bool(pending) and pending[0].hedge
+                timeout = max(0.0, last_started + self.hedge_delay - time.monotonic()) if can_hedge else None
+                try:
+                    event = events.get(timeout=timeout)
+                except queue.Empty:
+                    strategy = start_next()
+                    if strategy:
+                        logger.info(f"⏱️ Нет ответа за {self.hedge_delay} с, параллельно запущена {strategy.name}")
+                    continue
+
+                if event[0] == "batch":
+                    _, strategy, cancel_event, batch = event
+                    if not current(strategy, cancel_event):
+                        continue  # пачка отмененной стратегии
+                    if leader is None:
+                        leader = strategy
+                        logger.info(f"📥 Стратегия {strategy.name} отдает отзывы, остальные отменяются")
+                        cancel_others(strategy, requeue=True)
+                    self.found += len(batch)
+                    yield batch
+                    continue
+
+                _, strategy, cancel_event, found, error = event
+                if not current(strategy, cancel_event):
+                    continue
+                _, started = running.pop(strategy)
+                elapsed = time.monotonic() - started
+                breaker = self._breaker(strategy)
+                if error is None and (found or self.since is not None):
+                    if breaker:
+                        breaker.record(True, elapsed)
+                    cancel_others(strategy)
+                    logger.info(f"🏆 Стратегия {strategy.name}: {found} отзывов за {elapsed:.1f} с")
+                    self.strategy = strategy.name
+                    return
+                if error is None or isinstance(error, NoResult):
+                    logger.warning(f"⚠️ Стратегия {strategy.name} не дала результата за {elapsed:.1f} с")
+                    if breaker:
+                        breaker.record(False, elapsed, error="нет результата")
+                else:
+                    logger.warning(f"⚠️ Стратегия {strategy.name} упала за {elapsed:.1f} с "
+                                   f"(отдано отзывов: {found}): {error}")
+                    if breaker:
+                        breaker.record(False, elapsed, error=str(error))
+                if strategy is leader:
+                    leader = None
+
+                # Неудача: следующая стратегия стартует сразу, тяжелая - когда не осталось работающих
+                if pending:
+                    start_next()
+        finally:
+            # Потребитель прервал обход или гонка закончилась: оставшиеся стратегии отменяются
+            # и доработают в фоне до ближайшей проверки отмены
+            cancel_others()
+
+
+def race_strategies(
+    url: str,
+    strategies: List[Strategy],
+    since: Optional[datetime] = None,
+    progress: Optional[Callable[..., None]] = None,
+    hedge_delay: float = STRATEGY_HEDGE_DELAY_SECONDS,
+    marketplace: Optional[str] = None,
+    breakers: Optional[BreakerRegistry] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Гонка стратегий с результатом целиком (см. StrategyRace)
+
+    Returns:
+        (отзывы, имя победившей стратегии или None, если не сработала ни одна)
+    """
+    race = StrategyRace(url, strategies, since, progress, hedge_delay, marketplace, breakers)
+    reviews = [review for batch in race for review in batch]
+    return reviews, race.strategy
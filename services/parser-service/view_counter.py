@@ -0,0 +1,76 @@
+"""
+Счетчик просмотров карточек товаров
+Просмотры копятся в памяти и раз в VIEW_COUNT_FLUSH_SECONDS записываются в products.view_count
+одной транзакцией, поэтому чтение товара (GET /products/{id}, который клиенты опрашивают)
+не пишет в БД и не берет блокировку строки. При падении процесса теряются просмотры
+за последний интервал - для приоритета обхода (crawl order=views) это не важно.
+"""
+from collections import Counter
+from typing import Optional
+import logging
+import os
+import threading
+from sqlalchemy import func
+
+from database import SessionLocal, Product
+
+logger = logging.getLogger(__name__)
+
+VIEW_COUNT_FLUSH_SECONDS = int(os.getenv("VIEW_COUNT_FLUSH_SECONDS", "60"))
+
+
+class ViewCounter:
+    """Накопление просмотров в памяти и периодическая запись в БД"""
+
+    def __init__(self, flush_seconds: int = VIEW_COUNT_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._views: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def hit(self, product_id: int):
+        with self._lock:
+            self._views[product_id] += 1
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="view-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Остановка потока с записью накопленного"""
+        self._stop.set()
+        self.flush()
+
+    def _loop(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def flush(self) -> int:
+        """Запись накопленных просмотров; возвращает число обновленных товаров"""
+        with self._lock:
+            views, self._views = self._views, Counter()
+        if not views:
+            return 0
+        db = SessionLocal()
+        try:
+            # Строки обновляются в порядке id - параллельные записи не ждут друг друга по кругу
+            for product_id in sorted(views):
+                db.query(Product).filter(Product.id == product_id).update(
+                    {Product.view_count: func.coalesce(Product.view_count, 0) + views[product_id]},
+                    synchronize_session=False
+                )
+            db.commit()
+            return len(views)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Не удалось записать просмотры товаров: {e}")
+            # Просмотры возвращаются в счетчик и уйдут со следующей записью
+            with self._lock:
+                self._views.update(views)
+            return 0
+        finally:
+            db.close()